@@ -1,34 +1,182 @@
-from flask import Flask, request, jsonify
-from core.pipeline_runner import PipelineRunner
-from nodes.VictorModel import VictorModel
+import json
+import os
+import threading
+
+from flask import Flask, Response, jsonify, request
+
+from core.event_log import sink
+from core.graph_registry import GraphRegistry, JobManager
+from core.model_registry import ModelBusy, models
+from core.node_cache import NodeCache
 
 app = Flask(__name__)
-runner = None
+# Shared by every loaded graph: after an edit, only the changed node and its
+# downstream nodes miss the cache
+node_cache = NodeCache(disk_dir=os.environ.get("NODE_CACHE_DIR"))
+graphs = GraphRegistry(cache=node_cache)
+jobs = JobManager(graphs, max_workers=int(os.environ.get("PIPELINE_WORKERS", "4")))
+# Seconds to wait for a free model worker
+GENERATE_TIMEOUT = float(os.environ.get("GENERATE_TIMEOUT", "30"))
+DEFAULT_GRAPH = "default"  # used by the single-graph /load_graph, /run and /stop
+
+
+@app.route("/graphs", methods=["GET"])
+def list_graphs():
+    return jsonify(graphs.list())
+
+
+@app.route("/graphs/<graph_id>", methods=["PUT"])
+def put_graph(graph_id):
+    try:
+        graphs.register(graph_id, request.json)
+    except (KeyError, ImportError, ValueError) as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify({"status": "loaded", "graph_id": graph_id})
+
+
+@app.route("/graphs/<graph_id>", methods=["DELETE"])
+def delete_graph(graph_id):
+    try:
+        graphs.remove(graph_id)
+    except KeyError:
+        return jsonify({"error": f"unknown graph '{graph_id}'"}), 404
+    return jsonify({"status": "removed", "graph_id": graph_id})
+
+
+@app.route("/graphs/<graph_id>/run", methods=["POST"])
+def run_graph(graph_id):
+    # ?async=1 queues the run and returns a job id to poll at /jobs/<job_id>
+    input_data = request.json or {}
+    try:
+        if request.args.get("async") in ("1", "true"):
+            job_id = jobs.submit(graph_id, input_data)
+            return jsonify({"job_id": job_id, "status": "QUEUED"}), 202
+        runner = graphs.get(graph_id)
+    except KeyError:
+        return jsonify({"error": f"unknown graph '{graph_id}'"}), 404
+    return jsonify(runner.run_pipeline(input_data))
+
+
+@app.route("/graphs/<graph_id>/stop", methods=["POST"])
+def stop_graph(graph_id):
+    try:
+        graphs.get(graph_id).stop_pipeline()
+    except KeyError:
+        return jsonify({"error": f"unknown graph '{graph_id}'"}), 404
+    return jsonify({"status": "stopped"})
+
+
+@app.route("/jobs/<job_id>", methods=["GET"])
+def get_job(job_id):
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": f"unknown job '{job_id}'"}), 404
+    return jsonify(job)
+
+
+@app.route("/events", methods=["GET"])
+def get_events():
+    # Recent node events; poll with ?since=<last_seq> to get only newer ones
+    since = request.args.get("since", 0, type=int)
+    events = sink.recent(
+        since, request.args.get("node_id"), request.args.get("limit", 500, type=int)
+    )
+    return jsonify(
+        {
+            "events": events,
+            "last_seq": events[-1]["seq"] if events else since,
+            "dropped": sink.dropped,
+        }
+    )
+
+
+@app.route("/events/stream", methods=["GET"])
+def stream_events():
+    # Server-sent events: one "data:" line per node event, starting after ?since=
+    since = request.args.get("since", 0, type=int)
+    node_id = request.args.get("node_id")
+
+    def generate():
+        last = since
+        while True:
+            latest = sink.wait(last, timeout=15)
+            if latest == last:
+                yield ": keep-alive\n\n"
+                continue
+            for event in sink.recent(last, node_id):
+                if event["seq"] <= latest:
+                    yield f"id: {event['seq']}\ndata: {json.dumps(event)}\n\n"
+            last = latest
+
+    return Response(
+        generate(), mimetype="text/event-stream", headers={"Cache-Control": "no-cache"}
+    )
+
 
 @app.route("/load_graph", methods=["POST"])
 def load_graph():
-    global runner
-    graph_config = request.json
-    runner = PipelineRunner(graph_config)
+    graphs.register(DEFAULT_GRAPH, request.json)
     return jsonify({"status": "loaded"})
 
+
 @app.route("/run", methods=["POST"])
 def run():
-    result = runner.run_pipeline(request.json)
-    return jsonify(result)
+    return run_graph(DEFAULT_GRAPH)
+
 
 @app.route("/stop", methods=["POST"])
 def stop():
-    runner.stop_pipeline()
-    return jsonify({"status": "stopped"})
+    return stop_graph(DEFAULT_GRAPH)
+
 
-@app.route('/victor/generate', methods=['POST'])
+@app.route("/victor/generate", methods=["POST"])
 def victor_generate():
     data = request.json
-    prompt = data.get('prompt', '')
-    # Assume VictorModel node class or logic here
-    output = VictorModel(node_id="victor", config={}).run({'prompt': prompt})
-    return jsonify(output)
+    prompt = data.get("prompt", "")
+    try:
+        with models.lease("victor", timeout=GENERATE_TIMEOUT) as victor:
+            output = victor.generate(prompt)
+    except ModelBusy as e:
+        return jsonify({"error": str(e)}), 503
+    return jsonify({"text": output})
+
+
+@app.route("/health", methods=["GET"])
+def health():
+    # Liveness: the server answers; model states are informational
+    return jsonify({"status": "ok", "models": models.status()})
+
+
+@app.route("/ready", methods=["GET"])
+def ready():
+    # Readiness: 503 until every registered model has loaded in all of its workers
+    ok = models.is_ready()
+    return jsonify({"ready": ok, "models": models.status()}), 200 if ok else 503
+
+
+def boot_models():
+    # VICTOR_MODEL / LANGUAGE_MODEL name a "module:callable" that builds the model;
+    # the callable runs once in each worker process
+    workers = int(os.environ.get("MODEL_WORKERS", "1"))
+    models.register(
+        "victor",
+        os.environ.get("VICTOR_MODEL", "core.model_registry:EchoModel"),
+        workers=workers,
+        prefix="Victor Echo: ",
+    )
+    models.register(
+        "language_model",
+        os.environ.get("LANGUAGE_MODEL", "core.model_registry:EchoModel"),
+        workers=workers,
+        prefix="Echo: ",
+    )
+    # Warm up in the background so /health answers while weights load
+    threading.Thread(target=models.warm_up, name="model-warm-up", daemon=True).start()
+
+
+# Booted on import, so /ready works however the app is served (python, flask run, gunicorn)
+boot_models()
 
 if __name__ == "__main__":
-    app.run(port=8000)
+    # threaded: concurrent requests run their pipelines in parallel
+    app.run(port=8000, threaded=True)
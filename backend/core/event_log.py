@@ -0,0 +1,97 @@
+import json
+import os
+import queue
+import sys
+import threading
+import time
+from collections import deque
+
+
+class EventSink:
+    # Structured node events, written out in batches by a background thread so a
+    # node never blocks on stdout. The most recent `history` events are also kept
+    # in memory with increasing sequence numbers, for the API's /events endpoints.
+    def __init__(
+        self,
+        stream=None,
+        fmt="text",
+        history=10000,
+        max_pending=100000,
+        flush_interval=0.1,
+    ):
+        self.stream = stream or sys.stdout
+        self.fmt = fmt  # "text" or "json" (one object per line)
+        self.flush_interval = flush_interval
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._recent = deque(maxlen=history)
+        self._seq = 0
+        self._cond = threading.Condition()
+        self._thread = None
+        self._pid = None
+
+    def emit(self, event):
+        # Never blocks: when the writer falls behind, events are counted and dropped
+        with self._cond:
+            self._seq += 1
+            event["seq"] = self._seq
+            self._recent.append(event)
+            self._cond.notify_all()
+        self._ensure_writer()
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            self.dropped += 1
+
+    def recent(self, since=0, node_id=None, limit=None):
+        with self._cond:
+            events = [
+                e
+                for e in self._recent
+                if e["seq"] > since and (node_id is None or e["node_id"] == node_id)
+            ]
+        return events[-limit:] if limit else events
+
+    def wait(self, since, timeout=None):
+        # Blocks until an event newer than `since` exists; returns the latest seq
+        with self._cond:
+            self._cond.wait_for(lambda: self._seq > since, timeout=timeout)
+            return self._seq
+
+    def _ensure_writer(self):
+        # Started lazily, and again after a fork, since threads do not survive one
+        if self._pid != os.getpid():
+            with self._cond:
+                if self._pid != os.getpid():
+                    self._queue = queue.Queue(maxsize=self._queue.maxsize)
+                    self._thread = threading.Thread(
+                        target=self._write_loop, name="event-sink", daemon=True
+                    )
+                    self._pid = os.getpid()
+                    self._thread.start()
+
+    def _write_loop(self):
+        while True:
+            batch = [self._queue.get()]
+            time.sleep(self.flush_interval)
+            try:
+                while True:
+                    batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                pass
+            self.stream.write("".join(self._format(e) for e in batch))
+            self.stream.flush()
+
+    def _format(self, event):
+        if self.fmt == "json":
+            return json.dumps(event, default=str) + "\n"
+        duration = (
+            f" ({event['duration'] * 1000:.1f} ms)"
+            if event.get("duration") is not None
+            else ""
+        )
+        level = "" if event["level"] == "INFO" else f"{event['level']} "
+        return f"[{event['node_id']}] {level}{event['msg']}{duration}\n"
+
+
+sink = EventSink(fmt=os.environ.get("NODE_LOG_FORMAT", "text"))
@@ -0,0 +1,114 @@
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from core.pipeline_runner import PipelineRunner
+
+log = logging.getLogger(__name__)
+
+
+class GraphRegistry:
+    # Loaded graphs by id. Each holds a compiled PipelineRunner that any number of
+    # runs can use at once, since every run builds its own node instances.
+    def __init__(self, cache=None):
+        self.cache = cache
+        self._runners = {}
+        self._lock = threading.Lock()
+
+    def register(self, graph_id, graph_config):
+        # Compiling first means an invalid graph never replaces a working one
+        runner = PipelineRunner(graph_config, cache=self.cache)
+        with self._lock:
+            old = self._runners.get(graph_id)
+            self._runners[graph_id] = runner
+        if old is not None:
+            old.shutdown()
+        return runner
+
+    def get(self, graph_id):
+        with self._lock:
+            runner = self._runners.get(graph_id)
+        if runner is None:
+            raise KeyError(graph_id)
+        return runner
+
+    def remove(self, graph_id):
+        with self._lock:
+            runner = self._runners.pop(graph_id)
+        runner.stop_pipeline()
+        runner.shutdown()
+
+    def list(self):
+        with self._lock:
+            return {
+                gid: {"nodes": len(r.nodes), "edges": len(r.edges), "state": r.state}
+                for gid, r in self._runners.items()
+            }
+
+
+class JobManager:
+    # Background pipeline runs on a shared worker pool, tracked by job id. Only the
+    # most recent max_jobs jobs are kept; older finished ones are forgotten.
+    def __init__(self, registry, max_workers=4, max_jobs=1000):
+        self.registry = registry
+        self.max_jobs = max_jobs
+        self._pool = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="pipeline-job"
+        )
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(self, graph_id, input_data):
+        # Unknown graphs fail here, not in the worker
+        runner = self.registry.get(graph_id)
+        job_id = uuid.uuid4().hex
+        job = {
+            "id": job_id,
+            "graph_id": graph_id,
+            "state": "QUEUED",
+            "result": None,
+            "error": None,
+            "created": time.time(),
+            "started": None,
+            "finished": None,
+        }
+        with self._lock:
+            self._jobs[job_id] = job
+            self._trim()
+        self._pool.submit(self._run, job, runner, input_data)
+        return job_id
+
+    def get(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job is not None else None
+
+    def _run(self, job, runner, input_data):
+        job["state"] = "RUNNING"
+        job["started"] = time.time()
+        try:
+            job["result"] = runner.run_pipeline(input_data)
+            job["state"] = "DONE"
+        except Exception as e:
+            # Any node failure fails the job; the traceback goes to the log
+            log.exception("job %s failed", job["id"])
+            job["error"] = f"{type(e).__name__}: {e}"
+            job["state"] = "FAILED"
+        finally:
+            job["finished"] = time.time()
+
+    def _trim(self):
+        # Drop the oldest finished jobs beyond max_jobs; running ones are kept
+        excess = len(self._jobs) - self.max_jobs
+        for job_id in list(self._jobs):
+            if excess <= 0:
+                break
+            if self._jobs[job_id]["state"] in ("DONE", "FAILED"):
+                del self._jobs[job_id]
+                excess -= 1
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False)
@@ -0,0 +1,247 @@
+import importlib
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+log = logging.getLogger(__name__)
+REBUILD_TIMEOUT = 600  # seconds a rebuilt pool may take to load the model everywhere
+
+# Models loaded inside the current worker process, by name. Each worker loads its
+# models once, in the pool initializer, and keeps them for its whole life.
+_worker_models = {}
+# Per model, a barrier shared by all of its pool workers, used by warm-up pings
+_worker_barriers = {}
+
+
+def _resolve(spec):
+    # "package.module:attr" -> the object it names
+    module, _, attr = spec.partition(":")
+    return getattr(importlib.import_module(module), attr)
+
+
+def _load_model(name, spec, kwargs):
+    _worker_models[name] = _resolve(spec)(**kwargs)
+
+
+def _init_worker(name, spec, kwargs, barrier):
+    _worker_barriers[name] = barrier
+    _load_model(name, spec, kwargs)
+
+
+def _invoke(name, method, args, kwargs):
+    return getattr(_worker_models[name], method)(*args, **kwargs)
+
+
+_local_lock = threading.Lock()
+
+
+def _ping(name, timeout):
+    # A worker blocks here until every worker of the pool has taken a ping, so
+    # each ping is answered by a different process
+    _worker_barriers[name].wait(timeout)
+    return os.getpid(), name in _worker_models
+
+
+class ModelBusy(Exception):
+    pass
+
+
+class EchoModel:
+    # Placeholder until real weights are wired in; any class with generate(prompt) works
+    def __init__(self, prefix=""):
+        self.prefix = prefix
+
+    def generate(self, prompt, **kwargs):
+        return f"{self.prefix}{prompt}"
+
+
+class _Lease:
+    # Proxy for one borrowed worker slot: attribute calls run in a worker process
+    def __init__(self, entry):
+        self._entry = entry
+
+    def __getattr__(self, method):
+        def call(*args, **kwargs):
+            return self._entry.call(method, args, kwargs)
+
+        return call
+
+
+class _LeaseContext:
+    def __init__(self, entry, timeout):
+        self._entry = entry
+        self._timeout = timeout
+
+    def __enter__(self):
+        if not self._entry.slots.acquire(timeout=self._timeout):
+            raise ModelBusy(
+                f"no free worker for model '{self._entry.name}' after {self._timeout}s"
+            )
+        return _Lease(self._entry)
+
+    def __exit__(self, *exc):
+        self._entry.slots.release()
+
+
+class _ModelEntry:
+    def __init__(self, name, spec, workers, kwargs):
+        self.name = name
+        self.spec = spec
+        self.workers = workers
+        self.kwargs = kwargs
+        self.slots = threading.BoundedSemaphore(workers)
+        self.state = "REGISTERED"  # -> LOADING -> READY, or FAILED
+        self.error = None
+        self.loaded_at = None
+        self._pool = None
+        self._owner_pid = os.getpid()
+        self._lock = threading.Lock()
+
+    def pool(self):
+        with self._lock:
+            if self._pool is None:
+                # Synchronization primitives must reach workers at process creation, so
+                # the barrier travels with the initializer arguments
+                context = multiprocessing.get_context()
+                barrier = context.Barrier(self.workers)
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=context,
+                    initializer=_init_worker,
+                    initargs=(self.name, self.spec, self.kwargs, barrier),
+                )
+            return self._pool
+
+    def warm_up(self, timeout):
+        self.state = "LOADING"
+        pool = None
+        try:
+            pool = self.pool()
+            futures = [
+                pool.submit(_ping, self.name, timeout) for _ in range(self.workers)
+            ]
+            results = [f.result() for f in futures]
+            if not all(loaded for _, loaded in results):
+                raise RuntimeError("worker started without the model")
+            if len({pid for pid, _ in results}) != self.workers:
+                raise RuntimeError("not every worker answered")
+        except Exception as e:
+            log.exception("model '%s' failed to warm up", self.name)
+            with self._lock:
+                if isinstance(e, BrokenProcessPool) and self._pool is pool:
+                    self._pool = None  # so that a retry starts a fresh pool
+            self.state = "FAILED"
+            self.error = f"{type(e).__name__}: {e}"
+        else:
+            self.state = "READY"
+            self.error = None
+            self.loaded_at = time.time()
+
+    def call(self, method, args, kwargs):
+        if os.getpid() == self._owner_pid:
+            pool = self.pool()
+            try:
+                return pool.submit(_invoke, self.name, method, args, kwargs).result()
+            except BrokenProcessPool as e:
+                self._replace_broken_pool(pool, e)
+                raise
+        # In a forked child (e.g. a "process" pipeline worker) the parent's pool is
+        # unusable and a nested pool would outlive the child, so load the model
+        # here instead, once per process
+        with _local_lock:
+            if self.name not in _worker_models:
+                _load_model(self.name, self.spec, self.kwargs)
+        return _invoke(self.name, method, args, kwargs)
+
+    def _replace_broken_pool(self, pool, e):
+        # A worker died and the pool refuses all further work: report FAILED, then
+        # build and warm a fresh pool in the background, which turns READY again
+        with self._lock:
+            if self._pool is not pool:
+                return  # another caller already replaced it
+            self._pool = None
+            self.state = "FAILED"
+            self.error = f"{type(e).__name__}: {e}"
+        pool.shutdown(wait=False)
+        threading.Thread(
+            target=self.warm_up,
+            args=(REBUILD_TIMEOUT,),
+            name=f"model-rebuild-{self.name}",
+            daemon=True,
+        ).start()
+
+    def shutdown(self):
+        with self._lock:
+            if self._pool is not None and os.getpid() == self._owner_pid:
+                self._pool.shutdown(wait=False)
+            self._pool = None
+
+
+class ModelRegistry:
+    # Process-wide registry: each model gets a pool of worker processes that load it
+    # once, and callers borrow a worker with lease(). At most `workers` leases per
+    # model are out at a time; further callers wait up to `timeout` seconds.
+    def __init__(self):
+        self._models = {}
+        self._lock = threading.Lock()
+
+    def register(self, name, spec, workers=1, **kwargs):
+        entry = _ModelEntry(name, spec, workers, kwargs)
+        with self._lock:
+            old = self._models.get(name)
+            self._models[name] = entry
+        if old is not None:
+            old.shutdown()
+        return entry
+
+    def lease(self, name, timeout=None):
+        # with models.lease("victor") as victor: victor.generate(prompt)
+        return _LeaseContext(self._entry(name), timeout)
+
+    def warm_up(self, names=None, timeout=600):
+        # Starts every worker of the given models (all by default) so they load
+        # their weights now, not on the first request. Blocks until done, or until
+        # `timeout` seconds pass without every worker answering.
+        for name in names or list(self._models):
+            self._entry(name).warm_up(timeout)
+
+    def is_ready(self):
+        with self._lock:
+            entries = list(self._models.values())
+        return bool(entries) and all(e.state == "READY" for e in entries)
+
+    def status(self):
+        with self._lock:
+            entries = list(self._models.values())
+        return {
+            e.name: {
+                "state": e.state,
+                "workers": e.workers,
+                "error": e.error,
+                "loaded_at": e.loaded_at,
+            }
+            for e in entries
+        }
+
+    def shutdown(self):
+        with self._lock:
+            entries = list(self._models.values())
+        for entry in entries:
+            entry.shutdown()
+
+    def _entry(self, name):
+        with self._lock:
+            entry = self._models.get(name)
+        if entry is None:
+            raise KeyError(f"model '{name}' is not registered")
+        return entry
+
+
+models = ModelRegistry()
+# Defaults used by the built-in nodes; the API server re-registers them from its environment
+models.register("victor", "core.model_registry:EchoModel", prefix="Victor Echo: ")
+models.register("language_model", "core.model_registry:EchoModel", prefix="Echo: ")
@@ -1,11 +1,22 @@
+import time
+from collections import deque
+from core.event_log import sink
+
+LOG_SIZE = 200  # events kept per node; older ones stay only in the sink's history
+
 class NodeBase:
+    # Outputs depend only on type, config and inputs, so PipelineRunner may reuse
+    # them from its node cache. Non-deterministic nodes set this to False
+    # (a single node can also opt out with "cache": false in its config).
+    cacheable = True
+
     def __init__(self, node_id, config):
         self.node_id = node_id
         self.config = config
         self.inputs = {}
         self.outputs = {}
         self.state = "IDLE"
-        self.log = []
+        self.log = deque(maxlen=config.get("log_size", LOG_SIZE))
 
     def run(self, input_data=None):
         raise NotImplementedError
@@ -13,9 +24,10 @@ class NodeBase:
     def stop(self):
         self.state = "IDLE"
 
-    def log_event(self, msg):
-        self.log.append(msg)
-        print(f"[{self.node_id}] {msg}")
+    def log_event(self, msg, level="INFO", duration=None):
+        event = {"ts": time.time(), "node_id": self.node_id, "level": level, "msg": msg, "duration": duration}
+        self.log.append(event)
+        sink.emit(event)
 
     def get_output(self):
         return self.outputs
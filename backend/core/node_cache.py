@@ -0,0 +1,98 @@
+import hashlib
+import json
+import os
+import pickle
+import threading
+from collections import OrderedDict
+
+class Uncacheable(Exception):
+    pass
+
+def _digest(data):
+    return hashlib.sha256(data).hexdigest()
+
+def _encode(obj):
+    # json.dumps fallback for values that are not plain JSON
+    if hasattr(obj, "tobytes") and hasattr(obj, "dtype"):
+        return {"__array__": _digest(obj.tobytes()), "dtype": str(obj.dtype), "shape": list(getattr(obj, "shape", ()))}
+    try:
+        return {"__pickle__": _digest(pickle.dumps(obj))}
+    except Exception as e:
+        raise Uncacheable(f"cannot hash {type(obj).__name__}") from e
+
+def cache_key(node_type, config, inputs):
+    # Content address of one node execution: same type, config and resolved inputs
+    # give the same key, in any process and across restarts
+    try:
+        payload = json.dumps([node_type, config, inputs], sort_keys=True, default=_encode)
+    except (TypeError, ValueError) as e:
+        raise Uncacheable(str(e)) from e
+    return _digest(payload.encode("utf-8"))
+
+class NodeCache:
+    # Node outputs by cache_key: an in-memory LRU of pickled outputs, plus an
+    # optional directory of pickle files that survives restarts. Outputs are
+    # stored pickled so a caller mutating a returned dict cannot corrupt the cache.
+    def __init__(self, max_entries=256, disk_dir=None):
+        self.max_entries = max_entries
+        self.disk_dir = disk_dir
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+    def get(self, key):
+        # Returns (True, output) on a hit, (False, None) on a miss
+        with self._lock:
+            blob = self._memory.get(key)
+            if blob is not None:
+                self._memory.move_to_end(key)
+        if blob is None and self.disk_dir:
+            path = self._path(key)
+            if os.path.exists(path):
+                with open(path, "rb") as f:
+                    blob = f.read()
+                self._remember(key, blob)
+        with self._lock:
+            if blob is None:
+                self.misses += 1
+                return False, None
+            self.hits += 1
+        return True, pickle.loads(blob)
+
+    def put(self, key, output):
+        try:
+            blob = pickle.dumps(output)
+        except Exception:
+            return
+        self._remember(key, blob)
+        if self.disk_dir:
+            path = self._path(key)
+            tmp = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp, "wb") as f:
+                f.write(blob)
+            os.replace(tmp, path)
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+        if self.disk_dir:
+            for name in os.listdir(self.disk_dir):
+                if name.endswith(".pkl"):
+                    os.remove(os.path.join(self.disk_dir, name))
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "hit_rate": self.hits / total if total else 0.0, "entries": len(self._memory)}
+
+    def _remember(self, key, blob):
+        with self._lock:
+            self._memory[key] = blob
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+
+    def _path(self, key):
+        return os.path.join(self.disk_dir, f"{key}.pkl")
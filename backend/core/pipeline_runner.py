@@ -1,44 +1,214 @@
+import threading
+import time
+from collections import defaultdict, deque
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    Future,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    wait,
+)
+
 from core.node_base import NodeBase
+from core.node_cache import NodeCache, Uncacheable, cache_key
+
+# "sequential" runs nodes inline in topological order; the pooled modes start
+# every node as soon as all of its predecessors have finished.
+EXECUTORS = {
+    "thread": ThreadPoolExecutor,
+    "process": ProcessPoolExecutor,
+}
+
+
+def _run_node(node, inputs):
+    # Module-level so that process pools can pickle it
+    start = time.perf_counter()
+    try:
+        out = node.run(inputs)
+    except Exception as e:
+        node.log_event(
+            f"failed: {type(e).__name__}: {e}",
+            level="ERROR",
+            duration=time.perf_counter() - start,
+        )
+        raise
+    node.log_event("finished", duration=time.perf_counter() - start)
+    return out
+
 
 class PipelineRunner:
-    def __init__(self, graph_config):
-        self.nodes = {}        # id -> NodeBase instance
-        self.edges = []        # (from_id, to_id)
+    # A compiled graph: node classes, edges and execution order are resolved once in
+    # load_graph. Every run_pipeline call instantiates its own nodes, so concurrent
+    # runs of the same runner never share node state or outputs.
+    def __init__(self, graph_config, executor=None, max_workers=None, cache=None):
+        self.nodes = {}  # id -> NodeBase instance (template; runs use their own copies)
+        self.node_types = {}  # id -> node type name
+        self.node_defs = {}  # id -> (node class, config)
+        self.edges = []  # (from_id, to_id)
         self.state = "IDLE"
         self.log = []
+        self.executor = executor or graph_config.get("executor", "sequential")
+        self.max_workers = max_workers or graph_config.get("max_workers")
+        if self.executor != "sequential" and self.executor not in EXECUTORS:
+            raise ValueError(f"Unknown executor '{self.executor}'")
+        self._pool = None
+        self._pool_lock = threading.Lock()
+        self._active = []  # node dicts of the runs in progress, for stop_pipeline
+        self._active_lock = threading.Lock()
+        # Node outputs are memoized by (type, config, inputs); pass a shared NodeCache
+        # so results survive reloading an edited graph
+        self.cache = cache if cache is not None else NodeCache()
         self.load_graph(graph_config)
 
     def load_graph(self, graph_config):
         # graph_config: Dict with nodes/edges, loaded from GUI export/import
         for node_def in graph_config["nodes"]:
             node_class = self._import_node(node_def["type"])
-            node = node_class(node_def["id"], node_def.get("config", {}))
-            self.nodes[node_def["id"]] = node
+            config = node_def.get("config", {})
+            self.nodes[node_def["id"]] = node_class(node_def["id"], config)
+            self.node_types[node_def["id"]] = node_def["type"]
+            self.node_defs[node_def["id"]] = (node_class, config)
         self.edges = graph_config["edges"]
+        # Compiled once, shared read-only by every run
+        self.order = self._topo_sort()
+        self.predecessors = self._predecessors()
+        self.successors = defaultdict(list)
+        for src, dst in self.edges:
+            self.successors[src].append(dst)
 
     def _import_node(self, node_type):
         # Dynamic import for built-in/custom/plugin nodes
         import importlib
+
         return getattr(importlib.import_module(f"nodes.{node_type}"), node_type)
 
     def run_pipeline(self, input_data={}):
-        self.state = "RUNNING"
-        # Topological sort: determine execution order from edges
-        ordered_nodes = self._topo_sort()
+        # Safe to call from several threads at once
+        nodes = self._instantiate()
+        with self._active_lock:
+            self._active.append(nodes)
+            self.state = "RUNNING"
+        try:
+            if self.executor == "sequential":
+                return self._run_sequential(nodes, input_data)
+            return self._run_parallel(nodes, input_data)
+        finally:
+            with self._active_lock:
+                self._active.remove(nodes)
+                if not self._active:
+                    self.state = "IDLE"
+
+    def _instantiate(self):
+        # Fresh node objects for one run: the execution context of that run
+        return {
+            nid: node_class(nid, dict(config))
+            for nid, (node_class, config) in self.node_defs.items()
+        }
+
+    def _run_sequential(self, nodes, input_data):
         node_outputs = {}
-        for node_id in ordered_nodes:
-            node = self.nodes[node_id]
-            inputs = {k: node_outputs.get(k) for k in node.inputs.keys()}
-            node.state = "RUNNING"
-            out = node.run(inputs)
+        for node_id in self.order:
+            node = nodes[node_id]
+            inputs = self._resolve_inputs(node_id, node_outputs, input_data)
+            key = self._cache_key(node, inputs)
+            hit, out = self._cached(node, key)
+            if not hit:
+                node.state = "RUNNING"
+                out = _run_node(node, inputs)
+                node.state = "IDLE"
+                self._store(key, out)
             node_outputs[node_id] = out
-            node.state = "IDLE"
-        self.state = "IDLE"
         return node_outputs
 
+    def _run_parallel(self, nodes, input_data):
+        remaining = {nid: len(self.predecessors[nid]) for nid in nodes}
+        node_outputs = {}
+        pending = {}
+        pool = self._get_pool()
+
+        keys = {}
+
+        def submit(node_id):
+            node = nodes[node_id]
+            inputs = self._resolve_inputs(node_id, node_outputs, input_data)
+            keys[node_id] = self._cache_key(node, inputs)
+            hit, out = self._cached(node, keys[node_id])
+            if hit:
+                # Completed future, so successors are released by the same loop
+                future = Future()
+                future.set_result(out)
+                pending[future] = node_id
+                return
+            node.state = "RUNNING"
+            pending[pool.submit(_run_node, node, inputs)] = node_id
+
+        for node_id, count in remaining.items():
+            if count == 0:
+                submit(node_id)
+
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                node_id = pending.pop(future)
+                node = nodes[node_id]
+                out = future.result()
+                # Process workers mutate a copy of the node, so record the outputs here
+                node.outputs = out
+                if node.state == "RUNNING":
+                    node.state = "IDLE"
+                    self._store(keys[node_id], out)
+                node_outputs[node_id] = out
+                for nbr in self.successors[node_id]:
+                    remaining[nbr] -= 1
+                    if remaining[nbr] == 0:
+                        submit(nbr)
+        return node_outputs
+
+    def _get_pool(self):
+        # Kept across runs so process workers are not re-spawned for every /run
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = EXECUTORS[self.executor](max_workers=self.max_workers)
+            return self._pool
+
+    def _cache_key(self, node, inputs):
+        # None when the node opted out or its inputs cannot be hashed
+        if not node.cacheable or not node.config.get("cache", True):
+            return None
+        try:
+            return cache_key(self.node_types[node.node_id], node.config, inputs)
+        except Uncacheable:
+            return None
+
+    def _cached(self, node, key):
+        if key is None:
+            return False, None
+        hit, out = self.cache.get(key)
+        if hit:
+            node.outputs = out
+            node.log_event("served from cache", level="DEBUG")
+        return hit, out
+
+    def _store(self, key, out):
+        if key is not None:
+            self.cache.put(key, out)
+
+    def _predecessors(self):
+        predecessors = {nid: [] for nid in self.nodes}
+        for src, dst in self.edges:
+            predecessors[dst].append(src)
+        return predecessors
+
+    def _resolve_inputs(self, node_id, node_outputs, input_data):
+        # Every node sees the pipeline input, plus the outputs of the nodes that
+        # feed it, keyed by source node id
+        inputs = dict(input_data)
+        for src in self.predecessors[node_id]:
+            inputs[src] = node_outputs.get(src)
+        return inputs
+
     def _topo_sort(self):
         # (implement basic DAG topo sort)
-        from collections import defaultdict, deque
         in_degree = defaultdict(int)
         graph = defaultdict(list)
         for src, dst in self.edges:
@@ -53,9 +223,19 @@ class PipelineRunner:
                 in_degree[nbr] -= 1
                 if in_degree[nbr] == 0:
                     queue.append(nbr)
+        if len(ordered) != len(self.nodes):
+            raise ValueError("Pipeline graph contains a cycle")
         return ordered
 
     def stop_pipeline(self):
-        for node in self.nodes.values():
-            node.stop()
-        self.state = "IDLE"
+        # Stops the nodes of every run in progress
+        with self._active_lock:
+            runs = list(self._active)
+        for nodes in [self.nodes] + runs:
+            for node in nodes.values():
+                node.stop()
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
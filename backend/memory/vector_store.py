@@ -1,27 +1,210 @@
-import numpy as np
+import json
+import os
 import pickle
+import shutil
+import numpy as np
+
+# Persisted layout (a directory): each save writes a new generation of files,
+# vectors-<gen>.npy, norms-<gen>.npy and ids-<gen>.npy for the live rows and
+# meta-<gen>.json for their metadata in the same order, then points MANIFEST_FILE
+# at that generation with one atomic rename. A crash mid-save therefore leaves the
+# previous generation whole. load() memory-maps the arrays.
+MANIFEST_FILE = "manifest.json"
+LEGACY_SUFFIX = ".legacy"  # an old pickle file, moved aside when save() migrates it
+
+def _generation_files(generation):
+    return {
+        "vectors": f"vectors-{generation}.npy",
+        "norms": f"norms-{generation}.npy",
+        "ids": f"ids-{generation}.npy",
+        "meta": f"meta-{generation}.json",
+    }
 
 class VectorStore:
-    def __init__(self, dim=1536):
-        self.vectors = []
-        self.meta = []
+    # Each vector gets an id from add()/add_batch() that stays valid for its whole
+    # life, across delete(), compact(), save() and load().
+    def __init__(self, dim=1536, capacity=1024):
         self.dim = dim
+        self._vectors = np.empty((capacity, dim), dtype=np.float32)
+        self._norms = np.empty(capacity, dtype=np.float32)
+        self._alive = np.zeros(capacity, dtype=bool)
+        self._ids = np.empty(capacity, dtype=np.int64)
+        self._rows = {}     # id -> current row
+        self._next_id = 0
+        self.meta = []
+        self.size = 0       # rows in use, including deleted ones
+        self.n_deleted = 0
+
+    def __len__(self):
+        return self.size - self.n_deleted
+
+    @property
+    def vectors(self):
+        return self._vectors[:self.size][self._alive[:self.size]]
 
     def add(self, vector, meta=None):
-        assert len(vector) == self.dim
-        self.vectors.append(vector)
-        self.meta.append(meta)
+        vector = np.asarray(vector, dtype=np.float32)
+        assert vector.shape == (self.dim,)
+        return self.add_batch(vector[None], [meta])[0]
+
+    def add_batch(self, vectors, metas=None):
+        # Returns the ids of the new vectors
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(-1, self.dim)
+        n = len(vectors)
+        self._reserve(self.size + n)
+        rows = np.arange(self.size, self.size + n)
+        ids = np.arange(self._next_id, self._next_id + n)
+        self._vectors[rows] = vectors
+        self._norms[rows] = np.linalg.norm(vectors, axis=1)
+        self._alive[rows] = True
+        self._ids[rows] = ids
+        self._rows.update(zip(ids.tolist(), rows.tolist()))
+        self.meta.extend(metas if metas is not None else [None] * n)
+        self.size += n
+        self._next_id += n
+        return ids.tolist()
+
+    def delete(self, vector_id):
+        # Tombstones the vector; it is skipped by searches and its row is reclaimed
+        # by the next compact()
+        row = self._rows.pop(vector_id, None)
+        if row is not None:
+            self._alive[row] = False
+            self.meta[row] = None
+            self.n_deleted += 1
+
+    def compact(self):
+        # Rewrites the live rows contiguously. Only rows move; ids stay the same.
+        self._reserve(self.size)
+        alive = self._alive[:self.size].copy()
+        n = int(alive.sum())
+        self._vectors[:n] = self._vectors[:self.size][alive]
+        self._norms[:n] = self._norms[:self.size][alive]
+        self._ids[:n] = self._ids[:self.size][alive]
+        self._alive[:n] = True
+        self._alive[n:self.size] = False
+        self.meta = [m for m, keep in zip(self.meta, alive) if keep]
+        self._rows = dict(zip(self._ids[:n].tolist(), range(n)))
+        self.size = n
+        self.n_deleted = 0
 
     def search(self, query_vector, top_k=5):
-        arr = np.array(self.vectors)
-        sims = arr @ query_vector / (np.linalg.norm(arr, axis=1) * np.linalg.norm(query_vector))
-        idx = np.argsort(sims)[::-1][:top_k]
-        return [(self.meta[i], float(sims[i])) for i in idx]
+        return self.search_batch(np.asarray(query_vector)[None], top_k)[0]
+
+    def search_batch(self, queries, top_k=5, chunk_elements=1 << 24):
+        # Cosine similarity of every query against every row with one GEMM per
+        # chunk of queries, then argpartition for the top_k of each
+        queries = np.asarray(queries, dtype=np.float32).reshape(-1, self.dim)
+        k = min(top_k, len(self))
+        if k == 0:
+            return [[] for _ in queries]
+        vectors = self._vectors[:self.size]
+        norms = np.maximum(self._norms[:self.size], 1e-12)
+        dead = ~self._alive[:self.size]
+        query_norms = np.maximum(np.linalg.norm(queries, axis=1), 1e-12)
+
+        results = []
+        chunk = max(1, chunk_elements // max(self.size, 1))
+        for start in range(0, len(queries), chunk):
+            q = queries[start:start + chunk]
+            sims = (q @ vectors.T) / (query_norms[start:start + chunk, None] * norms)
+            sims[:, dead] = -np.inf
+            top = np.argpartition(-sims, k - 1, axis=1)[:, :k]
+            top_sims = np.take_along_axis(sims, top, axis=1)
+            order = np.argsort(-top_sims, axis=1)
+            top = np.take_along_axis(top, order, axis=1)
+            top_sims = np.take_along_axis(top_sims, order, axis=1)
+            for idx, scores in zip(top, top_sims):
+                results.append([(self.meta[i], float(s)) for i, s in zip(idx, scores)])
+        return results
 
     def save(self, path):
-        with open(path, "wb") as f:
-            pickle.dump((self.vectors, self.meta), f)
+        # Saves the live rows only
+        if os.path.isfile(path):
+            # A pickle written by the old store: build the directory beside it, then
+            # move the pickle aside and the directory into its place
+            tmp_dir = path + ".tmp"
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            self._save_dir(tmp_dir)
+            os.replace(path, path + LEGACY_SUFFIX)
+            os.replace(tmp_dir, path)
+            return
+        self._save_dir(path)
+
+    def _save_dir(self, path):
+        os.makedirs(path, exist_ok=True)
+        manifest = self._read_manifest(path)
+        generation = manifest["generation"] + 1 if manifest else 0
+        alive = self._alive[:self.size]
+        files = _generation_files(generation)
+        for key, array in (("vectors", self._vectors[:self.size][alive]), ("norms", self._norms[:self.size][alive]), ("ids", self._ids[:self.size][alive])):
+            with open(os.path.join(path, files[key]), "wb") as f:
+                np.save(f, array)
+                f.flush()
+                os.fsync(f.fileno())
+        with open(os.path.join(path, files["meta"]), "w") as f:
+            json.dump([m for m, keep in zip(self.meta, alive) if keep], f)
+            f.flush()
+            os.fsync(f.fileno())
+
+        tmp = os.path.join(path, MANIFEST_FILE + ".tmp")
+        with open(tmp, "w") as f:
+            json.dump({"generation": generation, "next_id": self._next_id}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, os.path.join(path, MANIFEST_FILE))
 
-    def load(self, path):
+        # Files of older generations, and of saves that crashed before their manifest
+        keep = set(files.values()) | {MANIFEST_FILE}
+        for name in os.listdir(path):
+            if name not in keep:
+                os.remove(os.path.join(path, name))
+
+    def load(self, path, mmap=True):
+        if not os.path.exists(path) and os.path.isfile(path + LEGACY_SUFFIX):
+            path += LEGACY_SUFFIX  # a migrating save() stopped between its two renames
+        if os.path.isfile(path):
+            return self._load_pickle(path)
+        manifest = self._read_manifest(path)
+        if manifest is None:
+            raise FileNotFoundError(f"no vector store at {path}")
+        files = _generation_files(manifest["generation"])
+        mode = "r" if mmap else None
+        self._vectors = np.load(os.path.join(path, files["vectors"]), mmap_mode=mode)
+        self._norms = np.load(os.path.join(path, files["norms"]), mmap_mode=mode)
+        self._ids = np.load(os.path.join(path, files["ids"]), mmap_mode=mode)
+        with open(os.path.join(path, files["meta"])) as f:
+            self.meta = json.load(f)
+        self.dim = self._vectors.shape[1]
+        self.size = len(self._vectors)
+        self._alive = np.ones(self.size, dtype=bool)
+        self._rows = dict(zip(self._ids.tolist(), range(self.size)))
+        self._next_id = manifest["next_id"]
+        self.n_deleted = 0
+
+    def _read_manifest(self, path):
+        manifest_path = os.path.join(path, MANIFEST_FILE)
+        if not os.path.exists(manifest_path):
+            return None
+        with open(manifest_path) as f:
+            return json.load(f)
+
+    def _load_pickle(self, path):
+        # Files written by the old list-based store
         with open(path, "rb") as f:
-            self.vectors, self.meta = pickle.load(f)
+            vectors, meta = pickle.load(f)
+        self.__init__(self.dim, max(len(vectors), 1))
+        if len(vectors):
+            self.add_batch(np.asarray(vectors), meta)
+
+    def _reserve(self, needed):
+        # Grows by doubling; also turns read-only memory-mapped arrays into private copies
+        capacity = len(self._vectors)
+        if needed <= capacity and self._vectors.flags.writeable:
+            return
+        capacity = max(needed, 2 * capacity, 16)
+        for name in ("_vectors", "_norms", "_alive", "_ids"):
+            old = getattr(self, name)
+            grown = np.zeros((capacity,) + old.shape[1:], dtype=old.dtype)
+            grown[:self.size] = old[:self.size]
+            setattr(self, name, grown)
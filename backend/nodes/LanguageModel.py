@@ -1,10 +1,16 @@
 from core.node_base import NodeBase
+from core.model_registry import models
 
 class LanguageModel(NodeBase):
+    # Generations depend on whichever model is registered under the name, which
+    # the node cache key cannot see, and may be sampled
+    cacheable = False
+
     def run(self, input_data):
         prompt = input_data.get("prompt", "Say something!")
-        # You’d plug in your GPT, LLama, or Victor model here
-        output = f"Echo: {prompt}"  # replace with actual model call
+        # Any model registered in core.model_registry can back this node via config "model"
+        with models.lease(self.config.get("model", "language_model"), timeout=self.config.get("timeout")) as model:
+            output = model.generate(prompt)
         self.outputs = {"text": output}
         self.log_event(f"Generated output: {output}")
         return self.outputs
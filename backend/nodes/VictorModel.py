@@ -1,12 +1,16 @@
 from core.node_base import NodeBase
-# from victor_core import Victor  # Your homebuilt AGI
+from core.model_registry import models
 
 class VictorModel(NodeBase):
+    # Generations depend on whichever model is registered under the name, which
+    # the node cache key cannot see, and may be sampled
+    cacheable = False
+
     def run(self, input_data):
         prompt = input_data.get("prompt", "")
-        # victor = Victor()  # Instantiate, or use singleton if loaded at boot
-        # output = victor.generate(prompt)
-        output = f"Victor Echo: {prompt}"
+        # The model is loaded once per worker process by the registry; a node only borrows one
+        with models.lease(self.config.get("model", "victor"), timeout=self.config.get("timeout")) as victor:
+            output = victor.generate(prompt)
         self.outputs = {"text": output}
         self.log_event(f"Victor output: {output}")
         return self.outputs
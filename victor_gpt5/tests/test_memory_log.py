@@ -0,0 +1,121 @@
+import os
+import pickle
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from victor_memory import MemoryLog, VictorMemory, _append_fsync
+
+DIM = 4
+
+
+def _fill(log, start, count):
+    for i in range(start, start + count):
+        log.append({'id': f"m{i}"}, np.full(DIM, i, dtype=np.float32))
+    log.flush()
+
+
+def _ids(log):
+    vectors, records, edges = log.load()
+    assert len(vectors) == len(records)
+    return [r['id'] for r in records]
+
+
+def _crash_during_compaction(path, monkeypatch):
+    log = MemoryLog(path, DIM, segment_max_rows=2, max_segments=2)
+    _fill(log, 0, 2)
+    _fill(log, 2, 2)
+
+    # Crash after compaction wrote the new segment but before the manifest points at it
+    write_manifest = MemoryLog._write_manifest
+    def crash_in_compaction(self):
+        if len(self.segments) == 1:
+            raise RuntimeError("simulated crash")
+        write_manifest(self)
+    monkeypatch.setattr(MemoryLog, '_write_manifest', crash_in_compaction)
+    with pytest.raises(RuntimeError):
+        _fill(log, 4, 2)
+    monkeypatch.undo()
+
+    log = MemoryLog(path, DIM, segment_max_rows=2, max_segments=2)
+    assert _ids(log) == [f"m{i}" for i in range(6)]
+    assert os.path.exists(log._file('records', log.segments[-1] + 1))
+    return log
+
+
+def test_roll_after_crashed_compaction_leaves_no_duplicates(tmp_path, monkeypatch):
+    path = str(tmp_path / 'memory')
+    log = _crash_during_compaction(path, monkeypatch)
+    log.max_segments = 8
+    _fill(log, 6, 2)  # rolls into the segment number the crashed compaction used
+    assert _ids(MemoryLog(path, DIM)) == [f"m{i}" for i in range(8)]
+
+
+def test_compaction_after_crashed_compaction_leaves_no_duplicates(tmp_path, monkeypatch):
+    path = str(tmp_path / 'memory')
+    log = _crash_during_compaction(path, monkeypatch)
+    log.compact()
+    assert _ids(MemoryLog(path, DIM)) == [f"m{i}" for i in range(6)]
+    assert not [name for name in os.listdir(path) if name.endswith('.tmp')]
+
+
+def test_load_assigns_graph_nodes_by_row(tmp_path):
+    path = str(tmp_path / 'memory')
+    log = MemoryLog(path, DIM)
+    for i, memory_id in enumerate(['a', 'b', 'a', 'c']):
+        log.append({'id': memory_id}, np.full(DIM, i, dtype=np.float32))
+    log.append_edge('b', 'c')
+    log.flush()
+
+    config = {'memory': {'short_term_max_size': 8, 'vector_dim': DIM, 'long_term_db_path': path}}
+    memory = VictorMemory(config, privacy_core=None)
+    ids = [entry['id'] for entry in memory.vector_store.metadata]
+    for memory_id, node in memory._node_ids.items():
+        assert node < len(ids)
+        assert ids[node] == memory_id
+    assert memory._node_ids == {'a': 2, 'b': 1, 'c': 3}
+
+
+def test_failed_flush_rolls_back_and_requeues(tmp_path, monkeypatch):
+    path = str(tmp_path / 'memory')
+    log = MemoryLog(path, DIM)
+    _fill(log, 0, 1)
+
+    # The vectors append lands, the records append fails (e.g. ENOSPC)
+    def fail_on_records(file_path, data):
+        if os.path.basename(file_path).startswith('records'):
+            raise OSError(28, "No space left on device")
+        _append_fsync(file_path, data)
+    monkeypatch.setattr('victor_memory._append_fsync', fail_on_records)
+    with pytest.raises(OSError):
+        _fill(log, 1, 1)
+    monkeypatch.undo()
+    assert log.pending == 1
+
+    _fill(log, 2, 1)
+    vectors, records, _ = MemoryLog(path, DIM).load()
+    assert [r['id'] for r in records] == ['m0', 'm1', 'm2']
+    assert vectors[:, 0].tolist() == [0, 1, 2]
+
+
+def test_failed_migration_keeps_the_pickle(tmp_path, monkeypatch):
+    path = str(tmp_path / 'memory.pkl')
+    entries = [{'id': f"m{i}", 'embedding': np.full(DIM, i, dtype=np.float32)} for i in range(3)]
+    with open(path, 'wb') as f:
+        pickle.dump({'vector_store_metadata': entries, 'graph': {'m0': {'connections': ['m1']}}}, f)
+    config = {'memory': {'short_term_max_size': 8, 'vector_dim': DIM, 'long_term_db_path': path}}
+
+    def crash(self):
+        raise OSError(28, "No space left on device")
+    monkeypatch.setattr(MemoryLog, 'flush', crash)
+    with pytest.raises(OSError):
+        VictorMemory(config, privacy_core=None)
+    monkeypatch.undo()
+    assert os.path.isfile(path)
+
+    memory = VictorMemory(config, privacy_core=None)
+    assert [entry['id'] for entry in memory.vector_store.metadata] == ['m0', 'm1', 'm2']
+    assert os.path.isdir(path) and os.path.isfile(path + '.legacy')
@@ -1,10 +1,12 @@
 import numpy as np
 import re
-from typing import Dict, Any
+from typing import Dict, Any, Iterator, List, Optional, Tuple
 
-from victor_transformer import VictorFractalTransformer
-from victor_tokenizer import VictorTokenizer
-from victor_memory import VictorMemory
+from victor_kernel import no_grad, set_default_dtype
+from victor_transformer import VictorFractalTransformer, KVCache
+from victor_tokenizer import VictorTokenizer, IncrementalDecoder
+from victor_memory import VictorMemory, EmbeddingCache
+from victor_prefix_cache import PrefixCache
 from victor_privacy import VictorPrivacyCore
 from victor_multimodal import ImageEncoder, AudioEncoder
 
@@ -16,6 +18,8 @@ class VictorAGIRouter:
     def __init__(self, config: Dict[str, Any]):
         print("[AGI] GODCORE consciousness booting up...")
         self.config = config
+        # Every tensor created from here on uses the configured storage precision
+        set_default_dtype(config.get('kernel', {}).get('tensor_precision', 'float32'))
 
         # 1. Initialize Core Components
         self.privacy_core = VictorPrivacyCore(config, "./victor_gpt5/bloodline.txt")
@@ -28,6 +32,7 @@ class VictorAGIRouter:
 
         self.model = VictorFractalTransformer(config, self.tokenizer.vocab_size)
         self.model.load_weights("./victor_gpt5/data/victor_gpt5_godcore.weights")
+        self.model.eval()
 
         # 2. Initialize Multimodal Encoders (Simulated)
         d_model = config['transformer']['d_model']
@@ -41,88 +46,169 @@ class VictorAGIRouter:
             # 'coding_assistant': self._load_agent_model('coding_assistant_weights.pkl')
         }
 
+        # 4. Generation Settings
+        self.max_new_tokens = config['agi_router'].get('max_new_tokens', 150)
+        self.eos_token_id = self.tokenizer.token_to_id.get('[SEP]')
+
+        # 5. Embeddings of recently seen texts, keyed by their token ids
+        self.embedding_cache = EmbeddingCache(config['memory'].get('embedding_cache_size', 1024))
+
+        # 6. Prompt prefix KV cache, shared by every request (0 disables it)
+        prefix_cache_mb = config['agi_router'].get('prefix_cache_mb', 256)
+        self.prefix_cache: Optional[PrefixCache] = None
+        if prefix_cache_mb:
+            self.prefix_cache = PrefixCache(len(self.model.layers), int(prefix_cache_mb * 2**20))
+
         print("[AGI] All systems online. Victor-GPT5 is ready.")
 
     def route(self, user_input: str) -> str:
+        """Runs the thought-loop to completion and returns the full response (see `stream`)."""
+        try:
+            return "".join(self._thought_loop(user_input))
+        except Exception as e:
+            # A failure mid-generation discards the partial answer
+            return self.error_response(e)
+
+    def stream(self, user_input: str) -> Iterator[str]:
         """
-        The main thought-loop of the AGI.
+        The main thought-loop of the AGI, yielding response text as it is decoded.
         1. Scan for threats.
         2. Understand the prompt (modality, intent).
         3. Retrieve relevant memories.
         4. Construct the final prompt.
         5. Select agent and generate response.
         6. Store the new interaction in memory.
+        Text already yielded stays with the caller, so a failure mid-stream ends
+        the stream with the error reply.
         """
         try:
-            # --- Step 1: Security & Privacy Scan ---
-            self.privacy_core.scan_prompt(user_input)
-
-            # --- Step 2: Prompt Analysis & Multimodal Handling ---
-            final_token_ids = []
-
-            # Simple regex to find modal blocks like [IMG_START]path/to/img.png[IMG_END]
-            img_pattern = r'(\[IMG_START\](.*?)\[IMG_END\])'
-
-            text_parts = re.split(img_pattern, user_input)
-
-            for part in text_parts:
-                if part is None or part == '':
-                    continue
-                if part.startswith('[IMG_START]'):
-                    img_path = part.replace('[IMG_START]','').replace('[IMG_END]','').strip()
-                    # For now, we just insert the tokens; embedding would happen in the model
-                    final_token_ids.extend(self.tokenizer.encode(part))
-                else:
-                    final_token_ids.extend(self.tokenizer.encode(part))
-
-            # --- Step 3: Memory Retrieval ---
-            # Create a query embedding from the input text
-            query_embedding = self.model(np.array([final_token_ids])).data.mean(axis=1)
-            relevant_memories = self.memory.retrieve_relevant_memories(query_embedding, k=3)
-
-            # --- Step 4: Construct Final Context ---
-            short_term_context = self.memory.get_short_term_context(num_recent=3)
-            long_term_context = "\n".join([f"Recalled Memory: {mem['user_input']} -> {mem['ai_response']}" for mem in relevant_memories])
-
-            # Prepend context to the user input
-            full_prompt_text = f"--- Long Term Memory ---\n{long_term_context}\n\n--- Recent Conversation ---\n{short_term_context}\n\n--- Current Task ---\nUser: {user_input}\nVictor:"
-            full_prompt_ids = self.tokenizer.encode(full_prompt_text)
-
-            # --- Step 5: Agent Selection & Generation ---
-            # For now, always use the general purpose agent
-            active_agent = self.agents['general_purpose']
-
-            # Generate response token by token (autoregressive decoding)
-            max_new_tokens = 150
-            generated_ids = full_prompt_ids
-
-            for _ in range(max_new_tokens):
-                input_ids = np.array([generated_ids])
-                logits = active_agent(input_ids)
-
-                # Greedy decoding
-                next_token_id = np.argmax(logits.data[0, -1, :])
-
-                # Check for end-of-sequence token (conceptual)
-                if next_token_id == self.tokenizer.token_to_id.get('[SEP]'):
-                    break
+            yield from self._thought_loop(user_input)
+        except Exception as e:
+            yield self.error_response(e)
+
+    def _thought_loop(self, user_input: str) -> Iterator[str]:
+        full_prompt_ids = self.prepare_prompt(user_input)
+
+        # --- Step 5: Agent Selection & Generation ---
+        decoder = IncrementalDecoder(self.tokenizer)
+        response_ids = []
+        for token_id in self.generate_tokens(full_prompt_ids):
+            response_ids.append(token_id)
+            piece = decoder.push(token_id)
+            if piece:
+                yield piece
+        tail = decoder.flush()
+        if tail:
+            yield tail
+
+        # --- Step 6: Memory Storage ---
+        self.finish_response(user_input, response_ids)
+
+    def generate_tokens(self, prompt_ids: List[int]) -> Iterator[int]:
+        """
+        Greedy autoregressive decoding, yielding each new token id. The prompt is
+        prefilled once; each further step only runs the newest token against the
+        per-layer key/value cache.
+        """
+        # For now, always use the general purpose agent
+        active_agent = self.agents['general_purpose']
 
-                generated_ids.append(next_token_id)
+        # no_grad is entered per step: holding it across a yield would leak it into the caller
+        with no_grad():
+            cache, logits = self.prefill(prompt_ids)
 
-            response_ids = generated_ids[len(full_prompt_ids):]
-            response_text = self.tokenizer.decode(response_ids)
+        for _ in range(self.max_new_tokens):
+            # Greedy decoding
+            next_token_id = int(np.argmax(logits.data[0, -1, :]))
 
-            # --- Step 6: Memory Storage ---
-            response_embedding = self.model(np.array([response_ids])).data.mean(axis=1)
-            self.memory.add_interaction(user_input, response_text, response_embedding)
+            # Check for end-of-sequence token (conceptual)
+            if next_token_id == self.eos_token_id:
+                return
 
-            return response_text
+            yield next_token_id
+            if cache.seq_len >= active_agent.context_window:
+                return
+            with no_grad():
+                logits = active_agent.decode_step(np.array([[next_token_id]]), cache)
 
-        except PermissionError as e:
+    def prefill(self, prompt_ids: List[int]) -> Tuple[KVCache, Any]:
+        """
+        Runs the prompt through the model and returns its KV cache and logits. The
+        longest prefix already seen in an earlier prompt is taken from the prefix
+        cache, so only the new suffix is computed.
+        """
+        active_agent = self.agents['general_purpose']
+        if self.prefix_cache is None:
+            cache = active_agent.init_cache()
+            return cache, active_agent.decode_step(np.array([prompt_ids]), cache)
+
+        cache, n_cached = self.prefix_cache.lookup(prompt_ids)
+        logits = active_agent.decode_step(np.array([prompt_ids[n_cached:]]), cache)
+        self.prefix_cache.insert(prompt_ids, cache)
+        return cache, logits
+
+    def prepare_prompt(self, user_input: str) -> List[int]:
+        """Steps 1-4 of the thought-loop: returns the token ids of the full, memory-augmented prompt."""
+        # --- Step 1: Security & Privacy Scan ---
+        self.privacy_core.scan_prompt(user_input)
+
+        # --- Step 2: Prompt Analysis & Multimodal Handling ---
+        final_token_ids = []
+
+        # Simple regex to find modal blocks like [IMG_START]path/to/img.png[IMG_END]
+        img_pattern = r'(\[IMG_START\](.*?)\[IMG_END\])'
+
+        text_parts = re.split(img_pattern, user_input)
+
+        for part in text_parts:
+            if part is None or part == '':
+                continue
+            if part.startswith('[IMG_START]'):
+                img_path = part.replace('[IMG_START]','').replace('[IMG_END]','').strip()
+                # For now, we just insert the tokens; embedding would happen in the model
+                final_token_ids.extend(self.tokenizer.encode(part))
+            else:
+                final_token_ids.extend(self.tokenizer.encode(part))
+
+        # --- Step 3: Memory Retrieval ---
+        # Create a query embedding from the input text
+        query_embedding = self.embed(final_token_ids)
+        relevant_memories = self.memory.retrieve_relevant_memories(query_embedding, k=3)
+
+        # --- Step 4: Construct Final Context ---
+        short_term_context = self.memory.get_short_term_context(num_recent=3)
+        long_term_context = "\n".join([f"Recalled Memory: {mem['user_input']} -> {mem['ai_response']}" for mem in relevant_memories])
+
+        # Prepend context to the user input
+        full_prompt_text = f"--- Long Term Memory ---\n{long_term_context}\n\n--- Recent Conversation ---\n{short_term_context}\n\n--- Current Task ---\nUser: {user_input}\nVictor:"
+        return self.tokenizer.encode(full_prompt_text)
+
+    def embed(self, token_ids: List[int]) -> np.ndarray:
+        """(1, d_model) embedding of a token sequence, served from the embedding cache when possible."""
+        if not token_ids:
+            return np.zeros((1, self.model.config['d_model']), dtype=np.float32)
+        embedding = self.embedding_cache.get(token_ids)
+        if embedding is None:
+            with no_grad():
+                embedding = self.model.embed(np.array([token_ids])).data
+            self.embedding_cache.put(token_ids, embedding)
+        return embedding
+
+    def finish_response(self, user_input: str, response_ids: List[int]) -> str:
+        """Step 6 of the thought-loop: decodes the response and stores the interaction in memory."""
+        response_text = self.tokenizer.decode(response_ids)
+
+        response_embedding = self.embed(response_ids)
+        self.memory.add_interaction(user_input, response_text, response_embedding)
+
+        return response_text
+
+    def error_response(self, e: Exception) -> str:
+        """Turns a failure anywhere in the thought-loop into the user-facing reply."""
+        if isinstance(e, PermissionError):
             print(f"[AGI] Operation blocked by Privacy Core: {e}")
             return f"ACCESS DENIED. REASON: {e}"
-        except Exception as e:
-            print(f"[AGI] CRITICAL ERROR in thought loop: {e}")
-            import traceback
-            traceback.print_exc()
-            return "SYSTEM ERROR: My consciousness stream encountered an anomaly. Please check logs."
+        print(f"[AGI] CRITICAL ERROR in thought loop: {e}")
+        import traceback
+        traceback.print_exception(type(e), e, e.__traceback__)
+        return "SYSTEM ERROR: My consciousness stream encountered an anomaly. Please check logs."
@@ -0,0 +1,468 @@
+"""
+Micro-benchmarks for the Victor-GPT5 inference stack.
+Models are built with random weights, so no tokenizer or weight file is needed.
+
+Usage:
+    python victor_gpt5/victor_bench.py decode --prompt-len 128 --new-tokens 32
+    python victor_gpt5/victor_bench.py vector-index --sizes 10000 100000 1000000
+    python victor_gpt5/victor_bench.py moe --tokens 1024
+    python victor_gpt5/victor_bench.py attention --seq-lens 512 2048 8192
+    python victor_gpt5/victor_bench.py fused --rows 4096 --width 512
+    python victor_gpt5/victor_bench.py profile --seq-len 128 --trace trace.json
+    python victor_gpt5/victor_bench.py capture --d-model 64
+"""
+import argparse
+import time
+import tracemalloc
+import numpy as np
+from typing import Dict, Any, List, Optional, Callable
+
+from victor_kernel import OmegaTensor, Op, BlockedAttention, Profiler, softmax, layer_norm, cross_entropy_loss, no_grad, get_default_dtype, set_default_dtype
+from victor_transformer import VictorFractalTransformer, MoeLayer, causal_mask
+from victor_memory import FlatIndex, IVFIndex
+
+def small_config(d_model: int = 128, n_layers: int = 2, n_heads: int = 4, context_window: int = 1024) -> Dict[str, Any]:
+    """A reduced transformer config so benchmarks finish in seconds on a laptop CPU."""
+    return {
+        'transformer': {
+            'd_model': d_model,
+            'n_heads': n_heads,
+            'n_layers': n_layers,
+            'd_ff': d_model * 4,
+            'dropout': 0.0,
+            'fractal_depth': 3,
+            'moe_experts': 4,
+            'context_window': context_window,
+        }
+    }
+
+def bench_decode(config: Dict[str, Any], vocab_size: int = 1000, prompt_len: int = 128, new_tokens: int = 32) -> Dict[str, float]:
+    """
+    Greedy-decodes `new_tokens` tokens twice: once re-running the full sequence every
+    step (the old `route` loop) and once through the KV cache (`decode_step`).
+    """
+    model = VictorFractalTransformer(config, vocab_size).eval()
+    prompt = np.random.randint(0, vocab_size, size=prompt_len).tolist()
+
+    # --- Full recompute ---
+    ids = list(prompt)
+    full_logits = []
+    start = time.perf_counter()
+    for _ in range(new_tokens):
+        logits = model(np.array([ids]), causal_mask(len(ids))).data[0, -1]
+        full_logits.append(logits)
+        ids.append(int(np.argmax(logits)))
+    full_time = time.perf_counter() - start
+
+    # --- KV cache ---
+    ids = list(prompt)
+    cached_logits = []
+    cache = model.init_cache()
+    start = time.perf_counter()
+    logits = model.decode_step(np.array([ids]), cache).data[0, -1]
+    for _ in range(new_tokens):
+        cached_logits.append(logits)
+        ids.append(int(np.argmax(logits)))
+        logits = model.decode_step(np.array([[ids[-1]]]), cache).data[0, -1]
+    cached_time = time.perf_counter() - start
+
+    max_diff = float(np.max(np.abs(np.array(full_logits) - np.array(cached_logits))))
+    results = {
+        'full_tokens_per_sec': new_tokens / full_time,
+        'cached_tokens_per_sec': new_tokens / cached_time,
+        'speedup': full_time / cached_time,
+        'max_logit_diff': max_diff,
+    }
+    print(f"[Bench] decode prompt_len={prompt_len} new_tokens={new_tokens}")
+    print(f"  full recompute: {results['full_tokens_per_sec']:.2f} tok/s")
+    print(f"  kv cache:       {results['cached_tokens_per_sec']:.2f} tok/s ({results['speedup']:.1f}x)")
+    print(f"  max |logit diff|: {max_diff:.2e}")
+    return results
+
+def _clustered_vectors(rng: np.random.Generator, centers: np.ndarray, n: int) -> np.ndarray:
+    """Synthetic embeddings drawn around topic centers, closer to real memories than pure noise."""
+    labels = rng.integers(0, len(centers), size=n)
+    noise = rng.standard_normal((n, centers.shape[1]), dtype=np.float32)
+    return centers[labels] + 0.5 * noise
+
+def bench_vector_index(sizes: List[int], dim: int = 512, n_queries: int = 100, k: int = 5, nlist: int = 1024, nprobe: int = 16) -> List[Dict[str, float]]:
+    """Insert throughput, query latency and recall@k of IVFIndex against the exact FlatIndex."""
+    rng = np.random.default_rng(0)
+    centers = rng.standard_normal((4096, dim), dtype=np.float32)
+    chunk = 10000
+    rows = []
+    for size in sizes:
+        flat, ivf = FlatIndex(dim), IVFIndex(dim, nlist=nlist, nprobe=nprobe)
+        flat_insert = ivf_insert = 0.0
+        for start in range(0, size, chunk):
+            batch = _clustered_vectors(rng, centers, min(chunk, size - start))
+            t0 = time.perf_counter()
+            flat.add(batch)
+            t1 = time.perf_counter()
+            ivf.add(batch)
+            flat_insert += t1 - t0
+            ivf_insert += time.perf_counter() - t1
+
+        queries = _clustered_vectors(rng, centers, n_queries)
+        flat_time = ivf_time = 0.0
+        hits = 0
+        for q in queries:
+            t0 = time.perf_counter()
+            exact, _ = flat.search(q, k)
+            t1 = time.perf_counter()
+            approx, _ = ivf.search(q, k)
+            flat_time += t1 - t0
+            ivf_time += time.perf_counter() - t1
+            hits += len(set(exact.tolist()) & set(approx.tolist()))
+
+        row = {
+            'size': size,
+            'flat_insert_per_sec': size / flat_insert,
+            'ivf_insert_per_sec': size / ivf_insert,
+            'flat_query_ms': 1000 * flat_time / n_queries,
+            'ivf_query_ms': 1000 * ivf_time / n_queries,
+            'ivf_recall': hits / (n_queries * k),
+        }
+        rows.append(row)
+        print(f"[Bench] vector-index size={size} dim={dim} k={k} (ivf nlist={nlist} nprobe={nprobe}, trained={ivf.is_trained})")
+        print(f"  flat: {row['flat_insert_per_sec']:.0f} inserts/s, {row['flat_query_ms']:.2f} ms/query, recall 1.000")
+        print(f"  ivf:  {row['ivf_insert_per_sec']:.0f} inserts/s, {row['ivf_query_ms']:.2f} ms/query, recall {row['ivf_recall']:.3f}")
+        del flat, ivf
+    return rows
+
+def bench_moe(d_model: int = 512, d_ff: int = 2048, n_experts: int = 4, n_tokens: int = 1024, repeats: int = 3) -> Dict[str, Dict[str, float]]:
+    """Dense mixture vs top-1/top-2 routing: estimated FLOPs and wall time for one MoE forward."""
+    x = OmegaTensor(np.random.randn(1, n_tokens, d_model).astype(np.float32))
+    dense = MoeLayer(d_model, d_ff, n_experts).eval()
+    results = {}
+    print(f"[Bench] moe tokens={n_tokens} d_model={d_model} d_ff={d_ff} experts={n_experts}")
+    for name, top_k in (('dense', None), ('top1', 1), ('top2', 2)):
+        layer = MoeLayer(d_model, d_ff, n_experts, top_k=top_k).eval()
+        for p, q in zip(layer.parameters(), dense.parameters()):
+            p.data = q.data
+
+        start = time.perf_counter()
+        for _ in range(repeats):
+            layer(x)
+        elapsed = (time.perf_counter() - start) / repeats
+
+        expert_tokens = n_tokens * n_experts if top_k is None else n_tokens * top_k
+        flops = 2 * n_tokens * d_model * n_experts + expert_tokens * 4 * d_model * d_ff
+        results[name] = {'gflops': flops / 1e9, 'ms': 1000 * elapsed, 'aux_loss': layer.last_aux_loss}
+        print(f"  {name:5s}: {flops / 1e9:7.2f} GFLOP  {1000 * elapsed:8.1f} ms  balance={layer.last_aux_loss:.3f}")
+    return results
+
+def bench_attention(seq_lens: List[int], n_heads: int = 4, d_head: int = 32, block_size: int = 128) -> List[Dict[str, float]]:
+    """Dense vs blocked causal attention for one batch row: wall time, peak allocation and max output difference."""
+    rows = []
+    for n in seq_lens:
+        q, k, v = (OmegaTensor(np.random.randn(n_heads, n, d_head).astype(np.float32)) for _ in range(3))
+        scale = d_head ** -0.5
+
+        def dense():
+            scores = q.matmul(k.transpose(0, 2, 1)) * scale
+            scores.data[np.broadcast_to(causal_mask(n)[0] == 0, scores.shape)] = -1e9
+            return softmax(scores, axis=-1).matmul(v)
+
+        def blocked():
+            return BlockedAttention(scale, block_size, n_heads, causal=True)(q, k, v)
+
+        row = {'seq_len': n}
+        outputs = {}
+        for name, fn in (('dense', dense), ('blocked', blocked)):
+            tracemalloc.start()
+            start = time.perf_counter()
+            outputs[name] = fn().data
+            row[f'{name}_ms'] = 1000 * (time.perf_counter() - start)
+            row[f'{name}_peak_mb'] = tracemalloc.get_traced_memory()[1] / 2**20
+            tracemalloc.stop()
+        row['max_diff'] = float(np.max(np.abs(outputs['dense'] - outputs['blocked'])))
+        rows.append(row)
+        print(f"[Bench] attention seq_len={n} heads={n_heads} d_head={d_head} block={block_size}")
+        print(f"  dense:   {row['dense_ms']:8.1f} ms  peak {row['dense_peak_mb']:8.1f} MB")
+        print(f"  blocked: {row['blocked_ms']:8.1f} ms  peak {row['blocked_peak_mb']:8.1f} MB")
+        print(f"  max |output diff|: {row['max_diff']:.2e}")
+    return rows
+
+# --- Fused Ops: references, gradient checks and timing ---
+def composite_layer_norm(x: OmegaTensor, gamma: OmegaTensor, beta: OmegaTensor, eps: float = 1e-5) -> OmegaTensor:
+    """The pre-fusion LayerNorm: mean and variance enter as constants, so their gradient paths are missing."""
+    mean = x.data.mean(axis=-1, keepdims=True)
+    var = x.data.var(axis=-1, keepdims=True)
+    return gamma * ((x - OmegaTensor(mean)) * OmegaTensor((var + eps) ** -0.5)) + beta
+
+def exact_composite_layer_norm(x: OmegaTensor, gamma: OmegaTensor, beta: OmegaTensor, eps: float = 1e-5) -> OmegaTensor:
+    """LayerNorm from elementwise ops with the statistics inside the graph: the exact reference."""
+    n = x.shape[-1]
+    centered = x - x.sum(axis=-1, keepdims=True) * (1.0 / n)
+    var = (centered * centered).sum(axis=-1, keepdims=True) * (1.0 / n)
+    return gamma * (centered * (var + eps) ** -0.5) + beta
+
+class CompositeSoftmax(Op):
+    """The pre-fusion softmax: separate exp and normalization buffers, and a full-size product in backward."""
+    def __call__(self, a: OmegaTensor) -> OmegaTensor:
+        e_x = np.exp(a.data - a.data.max(axis=-1, keepdims=True))
+        out = OmegaTensor(e_x / e_x.sum(axis=-1, keepdims=True), a.requires_grad)
+        if a.requires_grad:
+            out.set_creator(self, a)
+            self.out_data = out.data
+        return out
+
+    def backward(self, grad_out: np.ndarray):
+        s = self.out_data
+        return (s * (grad_out - (grad_out * s).sum(axis=-1, keepdims=True)),)
+
+class CompositeCrossEntropy(Op):
+    """The pre-fusion cross-entropy: the full log-probability matrix is kept and exponentiated again in backward."""
+    def __init__(self, targets: np.ndarray):
+        self.targets = targets
+
+    def __call__(self, logits: OmegaTensor) -> OmegaTensor:
+        log_probs = logits.data - logits.data.max(axis=1, keepdims=True)
+        log_probs -= np.log(np.exp(log_probs).sum(axis=1, keepdims=True))
+        out = OmegaTensor(-log_probs[np.arange(len(self.targets)), self.targets].mean(), logits.requires_grad)
+        if logits.requires_grad:
+            out.set_creator(self, logits)
+            self.log_probs = log_probs
+        return out
+
+    def backward(self, grad_out: np.ndarray):
+        grad = np.exp(self.log_probs)
+        grad[np.arange(len(self.targets)), self.targets] -= 1
+        return (grad * grad_out / len(self.targets),)
+
+def _gradients(fn: Callable, inputs: List[OmegaTensor], weights: Optional[np.ndarray]) -> List[np.ndarray]:
+    """Gradients of sum(fn(*inputs) * weights) (or of fn itself for a scalar output)."""
+    for t in inputs:
+        t.zero_grad()
+    out = fn(*inputs)
+    out.backward(None if weights is None else weights)
+    return [t.grad.copy() for t in inputs]
+
+def grad_check(fn: Callable, inputs: List[OmegaTensor], n_checks: int = 20, eps: float = 1e-6, seed: int = 0) -> float:
+    """
+    Largest relative error between the analytic gradients of `fn` and central
+    finite differences, at `n_checks` random entries of every input. A random
+    projection of the output stands in for an upstream gradient. Run in float64.
+    """
+    rng = np.random.default_rng(seed)
+    out = fn(*inputs)
+    weights = None if out.shape == () else rng.standard_normal(out.shape)
+
+    def objective() -> float:
+        with no_grad():
+            value = fn(*inputs).data
+        return float(value if weights is None else (value * weights).sum())
+
+    analytic = _gradients(fn, inputs, weights)
+    worst = 0.0
+    for t, grad in zip(inputs, analytic):
+        for _ in range(n_checks):
+            i = tuple(rng.integers(0, d) for d in t.shape)
+            original = t.data[i]
+            t.data[i] = original + eps
+            plus = objective()
+            t.data[i] = original - eps
+            minus = objective()
+            t.data[i] = original
+            numeric = (plus - minus) / (2 * eps)
+            worst = max(worst, abs(numeric - grad[i]) / max(1.0, abs(numeric), abs(grad[i])))
+    return worst
+
+def _time_forward_backward(fn: Callable, inputs: List[OmegaTensor], weights: Optional[np.ndarray], repeats: int) -> float:
+    _gradients(fn, inputs, weights)
+    start = time.perf_counter()
+    for _ in range(repeats):
+        _gradients(fn, inputs, weights)
+    return 1000 * (time.perf_counter() - start) / repeats
+
+def bench_fused(rows: int = 4096, width: int = 512, n_classes: int = 1000, repeats: int = 5) -> Dict[str, Dict[str, float]]:
+    """
+    Fused LayerNorm, softmax and log-softmax+NLL against the composite versions they
+    replace: finite-difference gradient checks (float64, small shapes), agreement of
+    outputs and gradients with the reference, and forward+backward time at (rows, width).
+    """
+    previous = get_default_dtype()
+    rng = np.random.default_rng(0)
+    results = {}
+    try:
+        set_default_dtype('float64')
+        targets_small = rng.integers(0, 7, size=6)
+
+        def cases(n: int, c: int, k: int):
+            x = OmegaTensor(rng.standard_normal((n, c)) * 3 + 1, requires_grad=True)
+            gamma = OmegaTensor(rng.standard_normal(c), requires_grad=True)
+            beta = OmegaTensor(rng.standard_normal(c), requires_grad=True)
+            logits = OmegaTensor(rng.standard_normal((n, k)) * 2, requires_grad=True)
+            targets = rng.integers(0, k, size=n)
+            return {
+                'layer_norm': (layer_norm, exact_composite_layer_norm, [x, gamma, beta]),
+                'softmax': (softmax, lambda a: CompositeSoftmax()(a), [x]),
+                'cross_entropy': (lambda a: cross_entropy_loss(a, targets), lambda a: CompositeCrossEntropy(targets)(a), [logits]),
+            }
+
+        small = cases(6, 7, 7)
+        big = cases(rows, width, n_classes)
+        x_small, gamma_small, beta_small = small['layer_norm'][2]
+        legacy_error = grad_check(composite_layer_norm, [x_small, gamma_small, beta_small])
+
+        print(f"[Bench] fused ops rows={rows} width={width} classes={n_classes}")
+        for name in ('layer_norm', 'softmax', 'cross_entropy'):
+            fused, reference, inputs = small[name]
+            row = {'fused_grad_error': grad_check(fused, inputs), 'reference_grad_error': grad_check(reference, inputs)}
+            out = fused(*inputs)
+            weights = None if out.shape == () else rng.standard_normal(out.shape)
+            row['output_diff'] = float(np.max(np.abs(out.data - reference(*inputs).data)))
+            row['grad_diff'] = max(float(np.max(np.abs(a - b))) for a, b in zip(_gradients(fused, inputs, weights), _gradients(reference, inputs, weights)))
+
+            fused, reference, inputs = big[name]
+            out = fused(*inputs)
+            weights = None if out.shape == () else rng.standard_normal(out.shape)
+            row['fused_ms'] = _time_forward_backward(fused, inputs, weights, repeats)
+            row['reference_ms'] = _time_forward_backward(reference, inputs, weights, repeats)
+            results[name] = row
+            print(f"  {name:13s} grad check {row['fused_grad_error']:.1e} (reference {row['reference_grad_error']:.1e})  "
+                  f"|diff| out {row['output_diff']:.1e} grad {row['grad_diff']:.1e}  "
+                  f"fwd+bwd {row['fused_ms']:7.1f} ms vs {row['reference_ms']:7.1f} ms ({row['reference_ms'] / row['fused_ms']:.1f}x)")
+        results['layer_norm']['constant_stats_grad_error'] = legacy_error
+        print(f"  pre-fusion LayerNorm (statistics as constants) grad check: {legacy_error:.1e}")
+    finally:
+        set_default_dtype(previous)
+    return results
+
+def bench_capture(config: Dict[str, Any], vocab_size: int = 1000, prompt_len: int = 32, steps: int = 50,
+                  embed_len: int = 32, repeats: int = 5) -> Dict[str, Dict[str, float]]:
+    """Eager vs captured-graph replay for decode steps and memory embeddings, with dense and top-2 MoE."""
+    results = {}
+    print(f"[Bench] capture d_model={config['transformer']['d_model']} prompt_len={prompt_len} embed_len={embed_len}")
+    for moe in ('dense', 'top2'):
+        config['transformer']['moe_top_k'] = 2 if moe == 'top2' else None
+        np.random.seed(0)
+        model = VictorFractalTransformer(config, vocab_size).eval()
+        prompt = np.random.randint(0, vocab_size, (1, prompt_len))
+        text = np.random.randint(0, vocab_size, (1, embed_len))
+
+        def decode():
+            cache = model.init_cache()
+            model.decode_step(prompt, cache)
+            token = np.array([[1]])
+            start = time.perf_counter()
+            for _ in range(steps):
+                logits = model.decode_step(token, cache)
+            return (time.perf_counter() - start) / steps, logits.data
+
+        def embed():
+            start = time.perf_counter()
+            for _ in range(steps):
+                embedding = model.embed(text)
+            return (time.perf_counter() - start) / steps, embedding.data
+
+        row = {}
+        for name, run in (('decode', decode), ('embed', embed)):
+            limit = model.graph_capture_max_tokens
+            model.graph_capture_max_tokens = 0
+            eager = [run() for _ in range(repeats)]
+            model.graph_capture_max_tokens = limit
+            captured = [run() for _ in range(repeats)]
+            eager_ms, captured_ms = 1000 * min(t for t, _ in eager), 1000 * min(t for t, _ in captured)
+            diff = float(np.max(np.abs(eager[-1][1] - captured[-1][1])))
+            row[name] = {'eager_ms': eager_ms, 'captured_ms': captured_ms, 'max_diff': diff}
+            print(f"  {moe:5s} {name:6s}: eager {eager_ms:6.2f} ms  captured {captured_ms:6.2f} ms "
+                  f"({eager_ms / captured_ms:.2f}x)  max |diff| {diff:.1e}")
+        results[moe] = row
+    return results
+
+def bench_profile(config: Dict[str, Any], vocab_size: int = 1000, batch_size: int = 2, seq_len: int = 128, steps: int = 3,
+                  trace_path: Optional[str] = None) -> Profiler:
+    """Per-op and per-module breakdown of training steps (forward, cross-entropy, backward)."""
+    np.random.seed(0)
+    model = VictorFractalTransformer(config, vocab_size)
+    token_ids = np.random.randint(0, vocab_size, (batch_size, seq_len))
+    targets = np.random.randint(0, vocab_size, (batch_size * seq_len,))
+
+    def train_step():
+        model.zero_grad()
+        logits = model(token_ids, causal=True)
+        cross_entropy_loss(logits.reshape(batch_size * seq_len, vocab_size), targets).backward()
+
+    train_step() # warm-up, unprofiled
+    profiler = Profiler().attach(model)
+    with profiler:
+        for _ in range(steps):
+            train_step()
+    print(f"profile: {steps} training steps, batch {batch_size} x {seq_len} tokens")
+    print(profiler.table(limit=30))
+    if trace_path:
+        profiler.save_chrome_trace(trace_path)
+        print(f"  chrome trace written to {trace_path}")
+    return profiler
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Victor-GPT5 inference benchmarks")
+    sub = parser.add_subparsers(dest='bench', required=True)
+
+    decode = sub.add_parser('decode', help="KV-cache decoding vs full recompute")
+    decode.add_argument('--d-model', type=int, default=128)
+    decode.add_argument('--n-layers', type=int, default=2)
+    decode.add_argument('--prompt-len', type=int, default=128)
+    decode.add_argument('--new-tokens', type=int, default=32)
+
+    index = sub.add_parser('vector-index', help="Flat vs IVF memory index recall and latency")
+    index.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000])
+    index.add_argument('--dim', type=int, default=512)
+    index.add_argument('--queries', type=int, default=100)
+    index.add_argument('--nlist', type=int, default=1024)
+    index.add_argument('--nprobe', type=int, default=16)
+
+    moe = sub.add_parser('moe', help="Dense vs top-k routed Mixture-of-Experts")
+    moe.add_argument('--tokens', type=int, default=1024)
+    moe.add_argument('--d-model', type=int, default=512)
+    moe.add_argument('--d-ff', type=int, default=2048)
+    moe.add_argument('--experts', type=int, default=4)
+
+    attention = sub.add_parser('attention', help="Dense vs blocked (online-softmax) causal attention")
+    attention.add_argument('--seq-lens', type=int, nargs='+', default=[512, 2048, 8192])
+    attention.add_argument('--heads', type=int, default=4)
+    attention.add_argument('--d-head', type=int, default=32)
+    attention.add_argument('--block-size', type=int, default=128)
+
+    fused = sub.add_parser('fused', help="Fused LayerNorm/softmax/cross-entropy: gradient checks and timing")
+    fused.add_argument('--rows', type=int, default=4096)
+    fused.add_argument('--width', type=int, default=512)
+    fused.add_argument('--classes', type=int, default=1000)
+    fused.add_argument('--repeats', type=int, default=5)
+
+    profile = sub.add_parser('profile', help="Per-op/per-module time, FLOPs and allocations of training steps")
+    profile.add_argument('--d-model', type=int, default=128)
+    profile.add_argument('--n-layers', type=int, default=2)
+    profile.add_argument('--batch-size', type=int, default=2)
+    profile.add_argument('--seq-len', type=int, default=128)
+    profile.add_argument('--steps', type=int, default=3)
+    profile.add_argument('--trace', default=None, help="Write a Chrome trace (chrome://tracing, Perfetto) here")
+
+    capture_cmd = sub.add_parser('capture', help="Eager vs captured-graph replay of decode steps and embeddings")
+    capture_cmd.add_argument('--d-model', type=int, default=64)
+    capture_cmd.add_argument('--n-layers', type=int, default=2)
+    capture_cmd.add_argument('--prompt-len', type=int, default=32)
+    capture_cmd.add_argument('--embed-len', type=int, default=32)
+    capture_cmd.add_argument('--steps', type=int, default=50)
+
+    args = parser.parse_args()
+    # fused and profile need autograd, so they run outside no_grad
+    if args.bench == 'fused':
+        bench_fused(args.rows, args.width, args.classes, args.repeats)
+    elif args.bench == 'profile':
+        bench_profile(small_config(args.d_model, args.n_layers), batch_size=args.batch_size, seq_len=args.seq_len,
+                      steps=args.steps, trace_path=args.trace)
+    with no_grad():
+        if args.bench == 'decode':
+            bench_decode(small_config(args.d_model, args.n_layers), prompt_len=args.prompt_len, new_tokens=args.new_tokens)
+        elif args.bench == 'vector-index':
+            bench_vector_index(args.sizes, args.dim, args.queries, nlist=args.nlist, nprobe=args.nprobe)
+        elif args.bench == 'moe':
+            bench_moe(args.d_model, args.d_ff, args.experts, args.tokens)
+        elif args.bench == 'attention':
+            bench_attention(args.seq_lens, args.heads, args.d_head, args.block_size)
+        elif args.bench == 'capture':
+            bench_capture(small_config(args.d_model, args.n_layers), prompt_len=args.prompt_len, steps=args.steps,
+                          embed_len=args.embed_len)
@@ -1,26 +1,204 @@
 import numpy as np
 import math
-from typing import List, Optional, Tuple, Callable
+import json
+import os
+import struct
+import functools
+import itertools
+import random
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple, Callable
+
+# --- Inference Mode ---
+# Grad mode is per thread, so a server worker running inference does not
+# switch off graph construction for a trainer running in another thread.
+_grad_mode = threading.local()
+
+def is_grad_enabled() -> bool:
+    return getattr(_grad_mode, 'enabled', True)
+
+@contextmanager
+def no_grad():
+    """
+    Inference mode: ops inside this block neither build `_creator` links nor
+    keep references to their inputs, so no autograd graph is retained.
+    """
+    previous = is_grad_enabled()
+    _grad_mode.enabled = False
+    try:
+        yield
+    finally:
+        _grad_mode.enabled = previous
+
+def _needs_grad(*tensors: 'OmegaTensor') -> bool:
+    return is_grad_enabled() and any(t.requires_grad for t in tensors)
+
+# --- Autograd Tape ---
+# Every op output that joins the graph gets the next position on a global tape.
+# A tensor's parents always hold earlier positions, so replaying a graph in
+# descending tape order is a valid reverse topological order.
+_tape_counter = itertools.count()
+
+# --- Precision Policy ---
+# Floating-point data of every OmegaTensor (parameters, activations and gradients)
+# is stored in the default dtype, set from `kernel.tensor_precision`. Reductions
+# that lose accuracy in half precision (matmul, softmax) accumulate in at least
+# float32 and the result is cast back to the storage dtype.
+PRECISIONS = {'float16': np.float16, 'float32': np.float32, 'float64': np.float64}
+_default_dtype = np.dtype(np.float32)
+
+def set_default_dtype(dtype):
+    """Sets the storage dtype for new tensors. Accepts a name from PRECISIONS or a numpy dtype."""
+    global _default_dtype
+    if isinstance(dtype, str):
+        if dtype not in PRECISIONS:
+            raise ValueError(f"Unsupported tensor precision '{dtype}'. Choose from {sorted(PRECISIONS)}")
+        dtype = PRECISIONS[dtype]
+    _default_dtype = np.dtype(dtype)
+
+def get_default_dtype() -> np.dtype:
+    return _default_dtype
+
+def accumulation_dtype(dtype) -> np.dtype:
+    """The dtype reductions run in for data stored as `dtype`: float32 for half precision."""
+    return np.promote_types(dtype, np.float32)
+
+def _acc(x: np.ndarray) -> np.ndarray:
+    return x.astype(accumulation_dtype(x.dtype), copy=False)
+
+def _accumulates_in_place(*arrays: np.ndarray) -> bool:
+    """True when no array needs a cast to its accumulation dtype, so results can be written straight into them."""
+    return all(a.dtype == accumulation_dtype(a.dtype) for a in arrays)
+
+# --- Call Hooks ---
+# Op and Module classes register their __call__/backward here when they are
+# defined. The wrappers are installed on the classes only while at least one
+# thread has a recorder active (a Profiler, or the tracer of `capture`), so
+# otherwise calls run the original methods at no cost. While installed, a
+# wrapper hands the call to the innermost recorder of its own thread.
+_hooked_threads = 0
+_hooks_lock = threading.Lock()
+_recorder_state = threading.local()
+_hooks: List[Tuple[type, str, Callable, Callable]] = [] # (class, attribute, original, wrapped)
+
+def register_call_hook(cls: type, attr: str, wrap: Callable):
+    """Registers cls.<attr> to be replaced by wrap(original) while a recorder is active."""
+    original = cls.__dict__[attr]
+    hook = (cls, attr, original, wrap(original))
+    with _hooks_lock:
+        _hooks.append(hook)
+        if _hooked_threads:
+            setattr(cls, attr, hook[3])
+
+def _install_hooks(enabled: bool):
+    for cls, attr, original, wrapped in _hooks:
+        setattr(cls, attr, wrapped if enabled else original)
+
+def _push_recorder(recorder):
+    global _hooked_threads
+    if not hasattr(_recorder_state, 'active'):
+        _recorder_state.active = []
+    _recorder_state.active.append(recorder)
+    with _hooks_lock:
+        if not _hooked_threads:
+            _install_hooks(True)
+        _hooked_threads += 1
+
+def _pop_recorder():
+    global _hooked_threads
+    with _hooks_lock:
+        _hooked_threads -= 1
+        if not _hooked_threads:
+            _install_hooks(False)
+    _recorder_state.active.pop()
+
+def _active_recorder():
+    active = getattr(_recorder_state, 'active', None)
+    return active[-1] if active else None
+
+def is_recording() -> bool:
+    """True while this thread is inside a Profiler or a graph capture."""
+    return _active_recorder() is not None
+
+def _owned_nbytes(arrays) -> int:
+    """Bytes of the arrays that own their memory; views (reshape, transpose, broadcast) are free."""
+    return sum(a.nbytes for a in arrays if isinstance(a, np.ndarray) and a.base is None)
+
+def _hooked_forward(call: Callable) -> Callable:
+    @functools.wraps(call)
+    def wrapper(self, *args):
+        recorder = _active_recorder()
+        if recorder is None:
+            return call(self, *args)
+        return recorder._op_forward(self, call, args)
+    return wrapper
+
+def _hooked_backward(backward: Callable) -> Callable:
+    @functools.wraps(backward)
+    def wrapper(self, grad_out):
+        recorder = _active_recorder()
+        if recorder is None:
+            return backward(self, grad_out)
+        return recorder._op_backward(self, backward, grad_out)
+    return wrapper
+
+def hooked_module_call(call: Callable) -> Callable:
+    """Wraps a Module's __call__ so an active recorder sees it: a Profiler times it, `capture` may keep it opaque."""
+    @functools.wraps(call)
+    def wrapper(self, *args, **kwargs):
+        recorder = _active_recorder()
+        if recorder is None:
+            return call(self, *args, **kwargs)
+        return recorder._module_call(self, call, args, kwargs)
+    return wrapper
 
 # --- Core Operation Class ---
 class Op:
     """Base class for an operation in the computation graph."""
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if '__call__' in cls.__dict__:
+            register_call_hook(cls, '__call__', _hooked_forward)
+        if 'backward' in cls.__dict__:
+            register_call_hook(cls, 'backward', _hooked_backward)
+
     def __call__(self, *args):
         raise NotImplementedError
 
     def backward(self, grad_out: np.ndarray) -> Tuple[Optional[np.ndarray], ...]:
         raise NotImplementedError
 
+    def flops(self, inputs: List['OmegaTensor'], out: 'OmegaTensor') -> int:
+        """Estimated floating-point operations of the forward pass, for the profiler. Default: one per output element."""
+        return out.data.size
+
+    def compile(self, inputs: List['OmegaTensor'], out: np.ndarray) -> Optional[Callable[[], None]]:
+        """
+        A step for `CapturedGraph` replay that refreshes `out`, this op's output from
+        the trace, from the current contents of its inputs' arrays; None if `out` is
+        a view that stays current by itself. Default: rerun the op and copy.
+        """
+        def step():
+            np.copyto(out, self(*inputs).data)
+        return step
+
 # --- The OmegaTensor ---
 class OmegaTensor:
     """A multi-dimensional array that supports automatic differentiation."""
     def __init__(self, data, requires_grad: bool = False, _creator: Optional[Tuple['Op', List['OmegaTensor']]] = None):
         if not isinstance(data, np.ndarray):
-            data = np.array(data, dtype=np.float32)
+            data = np.array(data, dtype=_default_dtype)
+        elif data.dtype.kind == 'f' and data.dtype != _default_dtype:
+            data = data.astype(_default_dtype)
         self.data = data
         self.requires_grad = requires_grad
         self.grad: Optional[np.ndarray] = None
-        self._creator = _creator
+        self._creator = None
+        if _creator is not None:
+            self.set_creator(_creator[0], *_creator[1])
 
         if self.requires_grad and self._creator is None:
             # For leaf nodes that require gradients
@@ -39,14 +217,37 @@ class OmegaTensor:
 
     def set_creator(self, op: Op, *parents: 'OmegaTensor'):
         self._creator = (op, list(parents))
+        self._tape_index = next(_tape_counter)
+        # Only leaves own a gradient buffer; intermediates receive theirs in backward
+        self.grad = None
 
     def zero_grad(self):
-        """Resets the gradient of the tensor to zero."""
-        self.grad = np.zeros_like(self.data)
+        """Resets the gradient of the tensor to zero, reusing its buffer when possible."""
+        if self.grad is not None and self.grad.shape == self.shape and self.grad.dtype == self.dtype and self.grad.flags.writeable:
+            self.grad.fill(0)
+        else:
+            self.grad = np.zeros_like(self.data)
+
+    def _accumulate_grad(self, grad: np.ndarray):
+        if self._creator is None:
+            # Leaf: summed in place into its own buffer, allocated once and reused by zero_grad
+            if self.grad is None or not self.grad.flags.writeable:
+                self.grad = np.zeros_like(self.data)
+            np.add(self.grad, grad, out=self.grad, casting='unsafe')
+        elif self.grad is None:
+            # Kept without a copy. It may be a view of, or shared with, another
+            # gradient, so it is never written to in place.
+            self.grad = grad.astype(self.dtype, copy=False)
+        else:
+            self.grad = (self.grad + grad).astype(self.dtype, copy=False)
 
-    def backward(self, grad_out: Optional[np.ndarray] = None):
+    def backward(self, grad_out: Optional[np.ndarray] = None, retain_graph: bool = False):
         """
         Performs backpropagation starting from this tensor.
+        The graph is walked iteratively in reverse tape order, so its depth is not
+        bounded by Python's recursion limit. Each intermediate tensor drops its
+        gradient as soon as it has been propagated to its parents, and unless
+        `retain_graph` is set also its op, and with it the activations the op saved.
         """
         if not self.requires_grad:
             raise RuntimeError("Cannot call .backward() on a tensor that does not require grad.")
@@ -57,41 +258,40 @@ class OmegaTensor:
             else:
                 raise RuntimeError("grad_out must be specified for non-scalar Tensors.")
 
-        if self.grad is None:
-            self.grad = grad_out
-        else:
-            self.grad += grad_out
-
-        # Topological sort of the graph
-        visited = set()
-        topo_order = []
-        def build_topo(v):
-            if v not in visited and v._creator is not None:
-                visited.add(v)
-                op, parents = v._creator
-                for parent in parents:
-                    build_topo(parent)
-                topo_order.append(v)
-
-        build_topo(self)
-
-        # Backpropagate through the sorted graph
-        for v in reversed(topo_order):
-            op, parents = v._creator
-
-            if v.grad is None:
-                # This can happen if a part of the graph is disconnected
-                # from the final loss. We can skip it.
+        if self._creator is not None:
+            self.grad = None # an intermediate's gradient is per pass, never accumulated across passes
+        self._accumulate_grad(np.asarray(grad_out))
+
+        # Collect the graph below this tensor with an explicit stack
+        tape = []
+        seen = {id(self)}
+        stack = [self]
+        while stack:
+            v = stack.pop()
+            if v._creator is None:
                 continue
-
-            grads = op.backward(v.grad)
-
+            tape.append(v)
+            for parent in v._creator[1]:
+                if id(parent) not in seen:
+                    seen.add(id(parent))
+                    stack.append(parent)
+        tape.sort(key=lambda v: v._tape_index)
+
+        # Replay the tape backwards; popping drops the tape's reference to each
+        # tensor once it has been processed
+        while tape:
+            v = tape.pop()
+            op, parents = v._creator
+            # v.grad is None when this part of the graph is disconnected from the output
+            grads = op.backward(v.grad) if v.grad is not None else ()
+            if v is not self:
+                v.grad = None
+            if not retain_graph:
+                v._creator = None
             for parent, grad in zip(parents, grads):
                 if parent.requires_grad and grad is not None:
-                    if parent.grad is None:
-                        parent.grad = grad
-                    else:
-                        parent.grad += grad
+                    parent._accumulate_grad(grad)
+            del op, parents, grads
 
     # --- Operator Overloading ---
     def __add__(self, other):
@@ -143,12 +343,12 @@ class OmegaTensor:
 # --- Basic Operations ---
 class Add(Op):
     def __call__(self, a: OmegaTensor, b: OmegaTensor) -> OmegaTensor:
-        requires_grad = a.requires_grad or b.requires_grad
+        requires_grad = _needs_grad(a, b)
         out = OmegaTensor(a.data + b.data, requires_grad)
         if requires_grad:
             out.set_creator(self, a, b)
-        self.a_shape = a.shape
-        self.b_shape = b.shape
+            self.a_shape = a.shape
+            self.b_shape = b.shape
         return out
 
     def backward(self, grad_out: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
@@ -170,14 +370,17 @@ class Add(Op):
                 grad = grad.sum(axis=i, keepdims=True)
         return grad
 
+    def compile(self, inputs, out):
+        return functools.partial(np.add, inputs[0].data, inputs[1].data, out=out)
+
 class Mul(Op):
     def __call__(self, a: OmegaTensor, b: OmegaTensor) -> OmegaTensor:
-        requires_grad = a.requires_grad or b.requires_grad
+        requires_grad = _needs_grad(a, b)
         out = OmegaTensor(a.data * b.data, requires_grad)
         if requires_grad:
             out.set_creator(self, a, b)
-        self.a = a
-        self.b = b
+            self.a = a
+            self.b = b
         return out
 
     def backward(self, grad_out: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
@@ -190,14 +393,17 @@ class Mul(Op):
             grad_b = Add._unbroadcast(grad_b, self.b.shape)
         return grad_a, grad_b
 
+    def compile(self, inputs, out):
+        return functools.partial(np.multiply, inputs[0].data, inputs[1].data, out=out)
+
 class Sub(Op):
     def __call__(self, a: OmegaTensor, b: OmegaTensor) -> OmegaTensor:
-        requires_grad = a.requires_grad or b.requires_grad
+        requires_grad = _needs_grad(a, b)
         out = OmegaTensor(a.data - b.data, requires_grad)
         if requires_grad:
             out.set_creator(self, a, b)
-        self.a_shape = a.shape
-        self.b_shape = b.shape
+            self.a_shape = a.shape
+            self.b_shape = b.shape
         return out
 
     def backward(self, grad_out: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
@@ -209,44 +415,94 @@ class Sub(Op):
             grad_b = Add._unbroadcast(grad_b, self.b_shape)
         return grad_a, grad_b
 
+    def compile(self, inputs, out):
+        return functools.partial(np.subtract, inputs[0].data, inputs[1].data, out=out)
+
 class Neg(Op):
     def __call__(self, a: OmegaTensor) -> OmegaTensor:
-        out = OmegaTensor(-a.data, a.requires_grad)
-        if a.requires_grad:
+        requires_grad = _needs_grad(a)
+        out = OmegaTensor(-a.data, requires_grad)
+        if requires_grad:
             out.set_creator(self, a)
         return out
 
     def backward(self, grad_out: np.ndarray) -> Tuple[np.ndarray]:
         return (-grad_out,)
 
+    def compile(self, inputs, out):
+        return functools.partial(np.negative, inputs[0].data, out=out)
+
 class Pow(Op):
     def __init__(self, power: float):
         self.power = power
 
     def __call__(self, a: OmegaTensor) -> OmegaTensor:
-        out = OmegaTensor(a.data ** self.power, a.requires_grad)
-        if a.requires_grad:
+        requires_grad = _needs_grad(a)
+        out = OmegaTensor(a.data ** self.power, requires_grad)
+        if requires_grad:
             out.set_creator(self, a)
-        self.a = a
+            self.a = a
         return out
 
     def backward(self, grad_out: np.ndarray) -> Tuple[np.ndarray]:
         grad_a = grad_out * (self.power * self.a.data ** (self.power - 1))
         return (grad_a,)
 
+    def compile(self, inputs, out):
+        return functools.partial(np.power, inputs[0].data, self.power, out=out)
+
 class MatMul(Op):
+    """
+    np.matmul semantics: batch dimensions broadcast, and 1-D operands are promoted
+    to a row (a) or column (b) vector. A stack of rows times a single matrix,
+    (..., N, C) @ (C, D), runs as one (rows, C) @ (C, D) GEMM in both directions.
+    """
     def __call__(self, a: OmegaTensor, b: OmegaTensor) -> OmegaTensor:
-        requires_grad = a.requires_grad or b.requires_grad
-        out = OmegaTensor(a.data @ b.data, requires_grad)
+        requires_grad = _needs_grad(a, b)
+        out = OmegaTensor(self._forward(_acc(a.data), _acc(b.data)), requires_grad)
         if requires_grad:
             out.set_creator(self, a, b)
-        self.a = a
-        self.b = b
+            self.a = a
+            self.b = b
         return out
 
+    def flops(self, inputs, out):
+        return 2 * out.data.size * inputs[0].shape[-1]
+
+    def compile(self, inputs, out):
+        a, b = inputs[0].data, inputs[1].data
+        if not (_accumulates_in_place(a, b, out) and out.flags.c_contiguous):
+            return super().compile(inputs, out)
+        return functools.partial(self._forward, a, b, out)
+
+    @staticmethod
+    def _forward(a: np.ndarray, b: np.ndarray, out: Optional[np.ndarray] = None) -> np.ndarray:
+        if a.ndim > 2 and b.ndim == 2:
+            rows = a.reshape(-1, a.shape[-1])
+            if out is None:
+                return (rows @ b).reshape(a.shape[:-1] + (b.shape[-1],))
+            np.matmul(rows, b, out=out.reshape(-1, b.shape[-1]))
+            return out
+        return np.matmul(a, b, out=out)
+
     def backward(self, grad_out: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
-        grad_a = grad_out @ self.b.data.T
-        grad_b = self.a.data.T @ grad_out
+        grad_out = _acc(grad_out)
+        a, b = _acc(self.a.data), _acc(self.b.data)
+        if a.ndim > 2 and b.ndim == 2:
+            rows = grad_out.reshape(-1, b.shape[-1])
+            grad_a = (rows @ b.T).reshape(a.shape)
+            grad_b = a.reshape(-1, a.shape[-1]).T @ rows
+            return grad_a, grad_b
+
+        a2 = a[None, :] if a.ndim == 1 else a
+        b2 = b[:, None] if b.ndim == 1 else b
+        batch = np.broadcast_shapes(a2.shape[:-2], b2.shape[:-2])
+        grad_out = grad_out.reshape(batch + (a2.shape[-2], b2.shape[-1]))
+        grad_a = grad_out @ b2.swapaxes(-1, -2)
+        grad_b = a2.swapaxes(-1, -2) @ grad_out
+        # Batch dimensions that were broadcast receive the sum of their gradients
+        grad_a = Add._unbroadcast(grad_a, a2.shape).reshape(a.shape)
+        grad_b = Add._unbroadcast(grad_b, b2.shape).reshape(b.shape)
         return grad_a, grad_b
 
 class Sum(Op):
@@ -255,10 +511,11 @@ class Sum(Op):
         self.keepdims = keepdims
 
     def __call__(self, a: OmegaTensor) -> OmegaTensor:
-        out = OmegaTensor(a.data.sum(axis=self.axis, keepdims=self.keepdims), a.requires_grad)
-        if a.requires_grad:
+        requires_grad = _needs_grad(a)
+        out = OmegaTensor(a.data.sum(axis=self.axis, keepdims=self.keepdims, dtype=accumulation_dtype(a.dtype)), requires_grad)
+        if requires_grad:
             out.set_creator(self, a)
-        self.a_shape = a.shape
+            self.a_shape = a.shape
         return out
 
     def backward(self, grad_out: np.ndarray) -> Tuple[np.ndarray]:
@@ -271,12 +528,23 @@ class Reshape(Op):
         self.shape = shape
 
     def __call__(self, a: OmegaTensor) -> OmegaTensor:
-        out = OmegaTensor(a.data.reshape(*self.shape), a.requires_grad)
-        if a.requires_grad:
+        requires_grad = _needs_grad(a)
+        out = OmegaTensor(a.data.reshape(*self.shape), requires_grad)
+        if requires_grad:
             out.set_creator(self, a)
-        self.a_shape = a.shape
+            self.a_shape = a.shape
         return out
 
+    def flops(self, inputs, out):
+        return 0 # data movement only
+
+    def compile(self, inputs, out):
+        a = inputs[0].data
+        if np.may_share_memory(out, a):
+            return None # a view of a's buffer, which replay refreshes in place
+        # A non-contiguous input was copied; out is contiguous, so viewing it in a's shape copies without a temporary
+        return functools.partial(np.copyto, out.reshape(a.shape), a)
+
     def backward(self, grad_out: np.ndarray) -> Tuple[np.ndarray]:
         return (grad_out.reshape(self.a_shape),)
 
@@ -285,28 +553,110 @@ class Transpose(Op):
         self.axes = axes
 
     def __call__(self, a: OmegaTensor) -> OmegaTensor:
-        out = OmegaTensor(a.data.transpose(*self.axes), a.requires_grad)
-        if a.requires_grad:
+        requires_grad = _needs_grad(a)
+        out = OmegaTensor(a.data.transpose(*self.axes), requires_grad)
+        if requires_grad:
             out.set_creator(self, a)
         return out
 
+    def flops(self, inputs, out):
+        return 0 # data movement only
+
+    def compile(self, inputs, out):
+        return None # always a view
+
     def backward(self, grad_out: np.ndarray) -> Tuple[np.ndarray]:
         # The backward of a transpose is a transpose with the inverse permutation
         inv_axes = np.argsort(self.axes)
         return (grad_out.transpose(*inv_axes),)
 
+class Take(Op):
+    """Gathers rows along the first axis: out = a[indices]."""
+    def __init__(self, indices: np.ndarray):
+        self.indices = indices
+
+    def __call__(self, a: OmegaTensor) -> OmegaTensor:
+        requires_grad = _needs_grad(a)
+        out = OmegaTensor(a.data[self.indices], requires_grad)
+        if requires_grad:
+            out.set_creator(self, a)
+            self.a_shape = a.shape
+        return out
+
+    def flops(self, inputs, out):
+        return 0 # data movement only
+
+    def compile(self, inputs, out):
+        a = inputs[0].data
+        if np.may_share_memory(out, a):
+            return None
+        # The indices were valid during the trace, so 'clip' never clips; it avoids the buffering of mode='raise'
+        return functools.partial(np.take, a, self.indices, axis=0, out=out, mode='clip')
+
+    def backward(self, grad_out: np.ndarray) -> Tuple[np.ndarray]:
+        grad_a = np.zeros(self.a_shape, dtype=grad_out.dtype)
+        np.add.at(grad_a, self.indices, grad_out)
+        return (grad_a,)
+
+class ScatterAdd(Op):
+    """Adds the rows of `a` into an all-zero tensor with `n_rows` rows: out[indices] += a."""
+    def __init__(self, indices: np.ndarray, n_rows: int):
+        self.indices = indices
+        self.n_rows = n_rows
+
+    def __call__(self, a: OmegaTensor) -> OmegaTensor:
+        data = np.zeros((self.n_rows,) + a.shape[1:], dtype=a.dtype)
+        np.add.at(data, self.indices, a.data)
+        requires_grad = _needs_grad(a)
+        out = OmegaTensor(data, requires_grad)
+        if requires_grad:
+            out.set_creator(self, a)
+        return out
+
+    def backward(self, grad_out: np.ndarray) -> Tuple[np.ndarray]:
+        return (grad_out[self.indices],)
+
+class MaskedFill(Op):
+    """
+    Sets the positions where `mask` is True to `value`. Writes into a's buffer,
+    so it is for freshly computed inputs that nothing else reads, such as
+    attention scores; the filled positions get no gradient.
+    """
+    def __init__(self, mask: np.ndarray, value: float):
+        self.mask = mask
+        self.value = value
+
+    def __call__(self, a: OmegaTensor) -> OmegaTensor:
+        np.copyto(a.data, self.value, where=self.mask)
+        requires_grad = _needs_grad(a)
+        out = OmegaTensor(a.data, requires_grad)
+        if requires_grad:
+            out.set_creator(self, a)
+        return out
+
+    def backward(self, grad_out: np.ndarray) -> Tuple[np.ndarray]:
+        return (np.where(self.mask, 0, grad_out),)
+
+    def compile(self, inputs, out):
+        return functools.partial(np.copyto, out, self.value, where=self.mask)
+
 # --- Activation Functions ---
 class ReLU(Op):
     def __call__(self, a: OmegaTensor) -> OmegaTensor:
-        self.mask = a.data > 0
-        out = OmegaTensor(a.data * self.mask, a.requires_grad)
-        if a.requires_grad:
+        requires_grad = _needs_grad(a)
+        mask = a.data > 0
+        out = OmegaTensor(a.data * mask, requires_grad)
+        if requires_grad:
             out.set_creator(self, a)
+            self.mask = mask
         return out
 
     def backward(self, grad_out: np.ndarray) -> Tuple[np.ndarray]:
         return (grad_out * self.mask,)
 
+    def compile(self, inputs, out):
+        return functools.partial(np.maximum, inputs[0].data, 0, out=out)
+
 def relu(x: OmegaTensor) -> OmegaTensor:
     return ReLU()(x)
 
@@ -315,59 +665,613 @@ class Softmax(Op):
         self.axis = axis
 
     def __call__(self, a: OmegaTensor) -> OmegaTensor:
-        # Numerically stable softmax
-        max_val = a.data.max(axis=self.axis, keepdims=True)
-        e_x = np.exp(a.data - max_val)
-        self.out_data = e_x / e_x.sum(axis=self.axis, keepdims=True)
-        out = OmegaTensor(self.out_data, a.requires_grad)
-        if a.requires_grad:
+        requires_grad = _needs_grad(a)
+        out = OmegaTensor(self._forward(_acc(a.data), self.axis), requires_grad)
+        if requires_grad:
             out.set_creator(self, a)
+            self.out_data = out.data
         return out
 
     def backward(self, grad_out: np.ndarray) -> Tuple[np.ndarray]:
-        # This is a bit more complex. For dS_i/dx_j = S_i * (delta_ij - S_j)
-        # where S is the softmax output.
-        # The Jacobian-vector product is grad_out * dS/dx.
-        s = self.out_data
-        # Reshape for broadcasting
-        s_reshaped = np.expand_dims(s, axis=-1)
-        # Jacobian
-        jacobian = np.diag_ промо(s.ravel()) - np.outer(s, s) # This is slow for large batches
-        # Simplified for common case
-        grad_a = s * (grad_out - (grad_out * s).sum(axis=self.axis, keepdims=True))
+        # dS_i/dx_j = S_i * (delta_ij - S_j), so the Jacobian-vector product is
+        # S * (g - sum(g * S)), with no Jacobian materialized
+        s = _acc(self.out_data)
+        grad_out = _acc(grad_out)
+        axis = self.axis % s.ndim
+        if axis == s.ndim - 1:
+            dot = np.einsum('...i,...i->...', grad_out, s)[..., None]
+        else:
+            dot = (grad_out * s).sum(axis=axis, keepdims=True)
+        grad_a = grad_out - dot
+        grad_a *= s
         return (grad_a,)
 
+    def flops(self, inputs, out):
+        return 5 * out.data.size # max, subtract, exp, sum, divide
+
+    def compile(self, inputs, out):
+        x = inputs[0].data
+        if not _accumulates_in_place(x, out):
+            return super().compile(inputs, out)
+        return functools.partial(self._forward, x, self.axis, out)
+
+    @staticmethod
+    def _forward(x: np.ndarray, axis: int, out: Optional[np.ndarray] = None) -> np.ndarray:
+        # Numerically stable softmax, computed in place in a single buffer
+        out = np.subtract(x, x.max(axis=axis, keepdims=True), out=out)
+        np.exp(out, out=out)
+        out /= out.sum(axis=axis, keepdims=True)
+        return out
+
 def softmax(x: OmegaTensor, axis=-1) -> OmegaTensor:
     return Softmax(axis)(x)
 
+class LayerNormOp(Op):
+    """
+    Fused layer normalization over the last axis: gamma * (x - mean) / sqrt(var + eps) + beta.
+    Forward writes into one output buffer and keeps only the per-row mean and
+    1/std; backward recomputes x_hat from them and differentiates through the
+    statistics as well: dx = rstd * (dx_hat - mean(dx_hat) - x_hat * mean(dx_hat * x_hat)).
+    """
+    def __init__(self, eps: float = 1e-5):
+        self.eps = eps
+
+    def __call__(self, x: OmegaTensor, gamma: OmegaTensor, beta: OmegaTensor) -> OmegaTensor:
+        # Statistics in at least float32, so half-precision activations do not lose them
+        out, mean, rstd = self._forward(_acc(x.data), gamma.data, beta.data, self.eps)
+        requires_grad = _needs_grad(x, gamma, beta)
+        result = OmegaTensor(out, requires_grad)
+        if requires_grad:
+            result.set_creator(self, x, gamma, beta)
+            self.x, self.gamma = x, gamma
+            self.mean, self.rstd = mean, rstd
+        return result
+
+    def backward(self, grad_out: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        grad_out = _acc(grad_out)
+        x_hat = np.subtract(_acc(self.x.data), self.mean)
+        x_hat *= self.rstd
+        n = x_hat.shape[-1]
+        grad_gamma = np.einsum('ij,ij->j', grad_out.reshape(-1, n), x_hat.reshape(-1, n))
+        grad_beta = grad_out.reshape(-1, n).sum(axis=0)
+
+        d_hat = grad_out * _acc(self.gamma.data)
+        mean_d = d_hat.mean(axis=-1, keepdims=True)
+        mean_dx = np.einsum('...i,...i->...', d_hat, x_hat)[..., None] / n
+        x_hat *= mean_dx
+        d_hat -= mean_d
+        d_hat -= x_hat
+        d_hat *= self.rstd
+        return d_hat, grad_gamma, grad_beta
+
+    def flops(self, inputs, out):
+        return 8 * out.data.size
+
+    def compile(self, inputs, out):
+        x, gamma, beta = (t.data for t in inputs)
+        if not _accumulates_in_place(x, out):
+            return super().compile(inputs, out)
+        return functools.partial(self._forward, x, gamma, beta, self.eps, out)
+
+    @staticmethod
+    def _forward(x: np.ndarray, gamma: np.ndarray, beta: np.ndarray, eps: float,
+                 out: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        mean = x.mean(axis=-1, keepdims=True)
+        out = np.subtract(x, mean, out=out)
+        rstd = np.einsum('...i,...i->...', out, out)[..., None]
+        rstd /= x.shape[-1]
+        rstd += eps
+        np.sqrt(rstd, out=rstd)
+        np.reciprocal(rstd, out=rstd)
+        out *= rstd
+        out *= gamma
+        out += beta
+        return out, mean, rstd
+
+def layer_norm(x: OmegaTensor, gamma: OmegaTensor, beta: OmegaTensor, eps: float = 1e-5) -> OmegaTensor:
+    return LayerNormOp(eps)(x, gamma, beta)
+
+class LogSoftmaxNLL(Op):
+    """
+    Mean negative log-likelihood of integer targets under softmax(logits), fused:
+    loss = mean(logsumexp(logits) - logits[target]). Forward uses one (batch, classes)
+    buffer and keeps only the per-row log-sum-exp; backward rebuilds the
+    probabilities from it directly into the gradient, (softmax - one_hot) / batch.
+    """
+    def __init__(self, targets: np.ndarray):
+        self.targets = np.asarray(targets)
+
+    def __call__(self, logits: OmegaTensor) -> OmegaTensor:
+        x = _acc(logits.data)
+        rows = np.arange(x.shape[0])
+        row_max = x.max(axis=1, keepdims=True)
+        shifted = np.subtract(x, row_max)
+        picked = shifted[rows, self.targets]
+        np.exp(shifted, out=shifted)
+        lse = np.log(shifted.sum(axis=1))
+        loss = (lse - picked).mean()
+
+        requires_grad = _needs_grad(logits)
+        out = OmegaTensor(np.asarray(loss), requires_grad)
+        if requires_grad:
+            out.set_creator(self, logits)
+            self.logits = logits
+            self.lse = lse + row_max[:, 0]
+        return out
+
+    def flops(self, inputs, out):
+        return 4 * inputs[0].data.size
+
+    def backward(self, grad_out: np.ndarray) -> Tuple[np.ndarray]:
+        batch_size = self.logits.shape[0]
+        grad = np.subtract(_acc(self.logits.data), self.lse[:, None])
+        np.exp(grad, out=grad)
+        grad[np.arange(batch_size), self.targets] -= 1
+        grad *= np.asarray(grad_out, dtype=grad.dtype) / batch_size
+        return (grad,)
+
+class BlockedAttention(Op):
+    """
+    softmax(q @ k^T * scale) @ v computed over (block_size x block_size) tiles with an
+    online softmax, so the full (Nq, Nk) score matrix is never allocated.
+    q: (B*n_heads, Nq, d), k/v: (B*n_heads, Nk, d).
+    mask: optional, broadcastable to (B, 1, Nq, Nk), zeros are masked out; it is only
+    sliced per tile. causal: query i sees keys up to q_offset + i, generated per tile,
+    and tiles entirely in the future are skipped.
+    Masked scores are filled with -1e9, exactly like the dense kernel.
+    """
+    def __init__(self, scale: float, block_size: int, n_heads: int, mask: Optional[np.ndarray] = None, causal: bool = False, q_offset: int = 0):
+        self.scale = scale
+        self.block_size = block_size
+        self.n_heads = n_heads
+        if mask is not None:
+            mask = np.asarray(mask)
+            mask = mask.reshape((1,) * (4 - mask.ndim) + mask.shape)
+        self.mask = mask
+        self.causal = causal
+        self.q_offset = q_offset
+
+    def __call__(self, q: OmegaTensor, k: OmegaTensor, v: OmegaTensor) -> OmegaTensor:
+        BH, Nq, _ = q.shape
+        Nk = k.shape[1]
+        out = np.empty(q.shape[:2] + (v.shape[2],), dtype=accumulation_dtype(np.result_type(q.dtype, v.dtype)))
+        lse = np.empty((BH, Nq), dtype=out.dtype) # log-sum-exp per query, kept for backward
+
+        for qs, qe in self._blocks(Nq):
+            q_blk = _acc(q.data[:, qs:qe]) * self.scale
+            row_max = np.full((BH, qe - qs), -np.inf, dtype=out.dtype)
+            row_sum = np.zeros((BH, qe - qs), dtype=out.dtype)
+            acc = np.zeros((BH, qe - qs, v.shape[2]), dtype=out.dtype)
+
+            for ks, ke in self._key_blocks(qs, qe, Nk):
+                scores = self._scores(q_blk, _acc(k.data[:, ks:ke]), qs, qe, ks, ke)
+                new_max = np.maximum(row_max, scores.max(axis=-1))
+                probs = np.exp(scores - new_max[..., None])
+                correction = np.exp(row_max - new_max)
+                row_sum = row_sum * correction + probs.sum(axis=-1)
+                acc = acc * correction[..., None] + probs @ _acc(v.data[:, ks:ke])
+                row_max = new_max
+
+            out[:, qs:qe] = acc / row_sum[..., None]
+            lse[:, qs:qe] = row_max + np.log(row_sum)
+
+        requires_grad = _needs_grad(q, k, v)
+        result = OmegaTensor(out, requires_grad)
+        if requires_grad:
+            result.set_creator(self, q, k, v)
+            self.q, self.k, self.v = q, k, v
+            self.out, self.lse = result.data, lse
+        return result
+
+    def backward(self, grad_out: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        q, k, v = _acc(self.q.data), _acc(self.k.data), _acc(self.v.data)
+        grad_out = _acc(grad_out)
+        Nq, Nk = q.shape[1], k.shape[1]
+        grad_q = np.zeros_like(q, dtype=grad_out.dtype)
+        grad_k = np.zeros_like(k, dtype=grad_out.dtype)
+        grad_v = np.zeros_like(v, dtype=grad_out.dtype)
+        # D_i = sum_j P_ij * dP_ij = rowsum(dO * O)
+        delta = (grad_out * self.out).sum(axis=-1)
+
+        for qs, qe in self._blocks(Nq):
+            q_blk = q[:, qs:qe] * self.scale
+            d_out = grad_out[:, qs:qe]
+            for ks, ke in self._key_blocks(qs, qe, Nk):
+                scores = self._scores(q_blk, k[:, ks:ke], qs, qe, ks, ke)
+                probs = np.exp(scores - self.lse[:, qs:qe, None])
+                grad_v[:, ks:ke] += probs.transpose(0, 2, 1) @ d_out
+                d_probs = d_out @ v[:, ks:ke].transpose(0, 2, 1)
+                d_scores = probs * (d_probs - delta[:, qs:qe, None]) * self.scale
+                grad_q[:, qs:qe] += d_scores @ k[:, ks:ke]
+                grad_k[:, ks:ke] += d_scores.transpose(0, 2, 1) @ q[:, qs:qe]
+        return grad_q, grad_k, grad_v
+
+    def flops(self, inputs, out):
+        q, k, _ = inputs
+        # Two (Nq, Nk, d) products per head; causal attention skips about half the tiles
+        total = 4 * q.shape[0] * q.shape[1] * k.shape[1] * q.shape[2]
+        return total // 2 if self.causal else total
+
+    def _blocks(self, n: int):
+        return [(s, min(s + self.block_size, n)) for s in range(0, n, self.block_size)]
+
+    def _key_blocks(self, qs: int, qe: int, Nk: int):
+        # With causal masking, keys past the last query of this tile are never visible
+        k_end = min(Nk, self.q_offset + qe) if self.causal else Nk
+        return self._blocks(k_end)
+
+    def _scores(self, q_blk: np.ndarray, k_blk: np.ndarray, qs: int, qe: int, ks: int, ke: int) -> np.ndarray:
+        scores = q_blk @ k_blk.transpose(0, 2, 1)
+        keep = None
+        if self.causal:
+            keep = (np.arange(ks, ke)[None, :] <= self.q_offset + np.arange(qs, qe)[:, None])[None]
+        if self.mask is not None:
+            # Broadcast (size-1) query/key axes are used whole rather than sliced
+            rows = slice(qs, qe) if self.mask.shape[2] > 1 else slice(None)
+            cols = slice(ks, ke) if self.mask.shape[3] > 1 else slice(None)
+            tile = np.broadcast_to(self.mask[:, :, rows, cols], (q_blk.shape[0] // self.n_heads, 1, qe - qs, ke - ks))
+            tile = np.repeat(tile, self.n_heads, axis=1).reshape(q_blk.shape[0], qe - qs, ke - ks) != 0
+            keep = tile if keep is None else keep & tile
+        if keep is not None:
+            scores = np.where(keep, scores, -1e9)
+        return scores
+
 def cross_entropy_loss(y_pred: OmegaTensor, y_true: np.ndarray) -> OmegaTensor:
     """
     y_pred: OmegaTensor of shape (batch_size, num_classes) with raw logits
     y_true: numpy array of shape (batch_size,) with integer class labels
+    Returns the mean loss as a scalar tensor. Training in reduced precision passes
+    the loss scale to `backward` as grad_out.
     """
-    batch_size, num_classes = y_pred.shape
+    return LogSoftmaxNLL(y_true)(y_pred)
 
-    # Log-softmax for numerical stability
-    log_probs = y_pred - y_pred.data.max(axis=1, keepdims=True)
-    log_probs = log_probs - OmegaTensor(np.log(np.exp(log_probs.data).sum(axis=1, keepdims=True)))
 
-    # Gather the log probabilities of the true classes
-    # This is equivalent to `log_probs[range(batch_size), y_true]`
-    true_log_probs = log_probs.data[range(batch_size), y_true]
+# --- Profiler ---
+class Profiler:
+    """
+    Call counts, wall time, estimated FLOPs and bytes allocated per Op class and per
+    Module, for forward and backward. Module times are inclusive; a module's
+    backward is the backward time of the ops it ran. Only the thread inside the
+    profiler is recorded.
+
+        profiler = Profiler().attach(model)   # attach() names modules by attribute path
+        with profiler:
+            loss = cross_entropy_loss(...); loss.backward()
+        print(profiler.table()); profiler.save_chrome_trace('trace.json')
+
+    For production, `with profiler.sample():` profiles a random `sample_rate`
+    fraction of the blocks it wraps and runs the rest unprofiled.
+    """
+    def __init__(self, sample_rate: float = 1.0, max_trace_events: int = 100000):
+        self.sample_rate = sample_rate
+        self.samples = 0
+        self.stats: Dict[Tuple[str, str, str], List[float]] = {} # (kind, name, phase) -> [calls, seconds, flops, bytes]
+        self.trace = deque(maxlen=max_trace_events) # most recent events only
+        self._module_names: Dict[int, str] = {}
+        self._lock = threading.Lock()
+        self._local = threading.local() # per-thread stack of open module frames
+        self._origin = time.perf_counter()
+
+    def attach(self, model) -> 'Profiler':
+        """Names `model` and its submodules by their dotted attribute paths."""
+        root = type(model).__name__
+        for name, module in model.named_modules():
+            self._module_names[id(module)] = f"{root}.{name}" if name else root
+        return self
+
+    def module_name(self, module) -> str:
+        return self._module_names.get(id(module), type(module).__name__)
+
+    # --- Activation ---
+    def __enter__(self):
+        _push_recorder(self)
+        with self._lock:
+            self.samples += 1
+        return self
+
+    def __exit__(self, *exc):
+        _pop_recorder()
+
+    @contextmanager
+    def sample(self):
+        if self.sample_rate > 0 and random.random() < self.sample_rate:
+            with self:
+                yield True
+        else:
+            yield False
+
+    def reset(self):
+        with self._lock:
+            self.stats.clear()
+            self.trace.clear()
+            self.samples = 0
+
+    # --- Recording (called by the hooks) ---
+    def _op_forward(self, op: 'Op', call: Callable, args: tuple) -> 'OmegaTensor':
+        start = time.perf_counter()
+        out = call(op, *args)
+        end = time.perf_counter()
+        flops = op.flops([a for a in args if isinstance(a, OmegaTensor)], out)
+        # Remembered for backward, which runs after the module scopes have closed
+        op._profile_flops = flops
+        op._profile_modules = tuple(frame[0] for frame in self._frames())
+        self._record_op(type(op).__name__, 'forward', start, end, flops, _owned_nbytes([out.data]), op._profile_modules)
+        return out
 
-    # Compute the negative log likelihood
-    loss = -OmegaTensor(true_log_probs).sum() / batch_size
+    def _op_backward(self, op: 'Op', backward: Callable, grad_out: np.ndarray):
+        start = time.perf_counter()
+        grads = backward(op, grad_out)
+        end = time.perf_counter()
+        # An op-specific backward estimate would need every op's gradient formula; 2x
+        # forward is exact for matmul, which dominates
+        flops = 2 * getattr(op, '_profile_flops', 0)
+        self._record_op(type(op).__name__, 'backward', start, end, flops, _owned_nbytes(grads), getattr(op, '_profile_modules', ()))
+        return grads
+
+    def _module_call(self, module, call: Callable, args: tuple, kwargs: dict):
+        frames = self._frames()
+        frame = [self.module_name(module), 0, 0] # name, flops, bytes of the ops inside
+        frames.append(frame)
+        start = time.perf_counter()
+        try:
+            return call(module, *args, **kwargs)
+        finally:
+            frames.pop()
+            self._record('module', frame[0], 'forward', start, time.perf_counter(), frame[1], frame[2])
+
+    def _frames(self) -> List[list]:
+        if not hasattr(self._local, 'frames'):
+            self._local.frames = []
+        return self._local.frames
+
+    def _record_op(self, name: str, phase: str, start: float, end: float, flops: int, nbytes: int, modules: Tuple[str, ...]):
+        self._record('op', name, phase, start, end, flops, nbytes)
+        if phase == 'forward':
+            for frame in self._frames():
+                frame[1] += flops
+                frame[2] += nbytes
+        else:
+            # Not a call of the module, so only time, FLOPs and bytes are added
+            for module in modules:
+                self._add(('module', module, 'backward'), end - start, flops, nbytes, calls=0)
+
+    def _record(self, kind: str, name: str, phase: str, start: float, end: float, flops: int, nbytes: int):
+        self._add((kind, name, phase), end - start, flops, nbytes)
+        with self._lock:
+            self.trace.append((kind, name, phase, start, end, flops, nbytes, threading.get_ident()))
+
+    def _add(self, key: Tuple[str, str, str], seconds: float, flops: int, nbytes: int, calls: int = 1):
+        with self._lock:
+            entry = self.stats.get(key)
+            if entry is None:
+                entry = self.stats[key] = [0, 0.0, 0, 0]
+            entry[0] += calls
+            entry[1] += seconds
+            entry[2] += flops
+            entry[3] += nbytes
+
+    # --- Reports ---
+    def rows(self, sort_by: str = 'time') -> List[Dict[str, float]]:
+        columns = {'calls': 0, 'time': 1, 'flops': 2, 'bytes': 3}
+        with self._lock:
+            items = sorted(self.stats.items(), key=lambda kv: -kv[1][columns[sort_by]])
+        return [{'kind': kind, 'name': name, 'phase': phase, 'calls': calls, 'seconds': seconds, 'flops': flops, 'bytes': nbytes}
+                for (kind, name, phase), (calls, seconds, flops, nbytes) in items]
+
+    def table(self, sort_by: str = 'time', limit: Optional[int] = None) -> str:
+        """Text table of every op and module, sorted by total time (or 'calls', 'flops', 'bytes')."""
+        lines = [f"{'name':52s} {'phase':8s} {'calls':>7s} {'total ms':>10s} {'avg us':>10s} {'GFLOP':>9s} {'GFLOP/s':>8s} {'alloc MB':>9s}"]
+        for row in self.rows(sort_by)[:limit]:
+            rate = row['flops'] / row['seconds'] / 1e9 if row['seconds'] > 0 else 0.0
+            calls, avg = (f"{row['calls']:7d}", f"{1e6 * row['seconds'] / row['calls']:10.1f}") if row['calls'] else (f"{'-':>7s}", f"{'-':>10s}")
+            lines.append(f"{row['kind'] + ':' + row['name']:52s} {row['phase']:8s} {calls} {1000 * row['seconds']:10.2f} "
+                         f"{avg} {row['flops'] / 1e9:9.3f} {rate:8.2f} {row['bytes'] / 2**20:9.1f}")
+        return "\n".join(lines)
+
+    def chrome_trace(self) -> Dict[str, object]:
+        """The recorded events in Chrome trace format (chrome://tracing, Perfetto)."""
+        pid = os.getpid()
+        with self._lock:
+            events = list(self.trace)
+        return {
+            'displayTimeUnit': 'ms',
+            'traceEvents': [{
+                'name': name, 'cat': f"{kind},{phase}", 'ph': 'X', 'pid': pid, 'tid': tid,
+                'ts': 1e6 * (start - self._origin), 'dur': 1e6 * (end - start),
+                'args': {'phase': phase, 'flops': flops, 'bytes': nbytes},
+            } for kind, name, phase, start, end, flops, nbytes, tid in events],
+        }
+
+    def save_chrome_trace(self, path: str):
+        with open(path, 'w') as f:
+            json.dump(self.chrome_trace(), f)
+
+
+# --- Graph Capture ---
+class _Tracer:
+    """Recorder for `capture`: keeps each op call, and each opaque module call as a single step."""
+    def __init__(self):
+        self.records: List[tuple] = [] # (op or module, args, kwargs, output)
+        self._opaque = 0 # depth inside opaque module calls, whose ops are not recorded
+
+    def _op_forward(self, op: 'Op', call: Callable, args: tuple) -> 'OmegaTensor':
+        out = call(op, *args)
+        if not self._opaque:
+            self.records.append((op, args, None, out))
+        return out
 
-    # Monkey-patch backward for this specific loss function for efficiency
-    def _backward_fn():
-        # The gradient of cross-entropy w.r.t logits is (softmax(logits) - y_one_hot)
-        probs = np.exp(log_probs.data)
-        grad = probs
-        grad[range(batch_size), y_true] -= 1
-        grad /= batch_size
-        y_pred.backward(grad)
+    def _op_backward(self, op: 'Op', backward: Callable, grad_out: np.ndarray):
+        return backward(op, grad_out)
+
+    def _module_call(self, module, call: Callable, args: tuple, kwargs: dict):
+        if self._opaque or module.capturable(*args, **kwargs):
+            return call(module, *args, **kwargs)
+        self._opaque += 1
+        try:
+            out = call(module, *args, **kwargs)
+        finally:
+            self._opaque -= 1
+        self.records.append((module, args, kwargs, out))
+        return out
 
-    loss._creator = (None, []) # Mark as a root for custom backward
-    loss.backward = _backward_fn # Override default backward
+def _opaque_step(module, args: tuple, kwargs: dict, out: np.ndarray) -> Callable[[], None]:
+    def step():
+        np.copyto(out, module(*args, **kwargs).data)
+    return step
 
-    return loss
+class CapturedGraph:
+    """
+    A forward pass recorded once by `capture` and replayed as a flat list of NumPy
+    calls, without dispatching through Op.__call__ or creating OmegaTensors. Each
+    op writes into the array it produced during the trace (`out=`), so replay
+    allocates almost nothing, and views taken during the trace stay valid since
+    the buffers never move. Module calls that are not `capturable` run eagerly
+    and are copied into their buffer.
+
+    A graph only fits the input shapes it was captured with, and only while the
+    tensors it read still hold the same arrays (`is_valid`); reassigning a
+    parameter's .data invalidates it, in-place updates do not. Its buffers are
+    shared, so one graph must not be replayed by two threads at once.
+    """
+    def __init__(self, inputs: List[np.ndarray], output: np.ndarray, steps: List[Callable[[], None]],
+                 leaves: List[Tuple['OmegaTensor', np.ndarray]]):
+        self.inputs = inputs
+        self.output = output
+        self.steps = steps
+        self._leaves = leaves # tensors read but not produced by the graph, with the array each held
+
+    def is_valid(self) -> bool:
+        return all(t.data is data for t, data in self._leaves)
+
+    def __call__(self, *arrays: np.ndarray) -> np.ndarray:
+        """Replays on new inputs. Returns the graph's output buffer, which the next replay overwrites."""
+        for buf, a in zip(self.inputs, arrays):
+            np.copyto(buf, a)
+        with no_grad(): # steps that rerun an op must not link it to the parameters
+            for step in self.steps:
+                step()
+        return self.output
+
+def capture(fn: Callable[..., 'OmegaTensor'], *inputs: np.ndarray) -> Tuple[CapturedGraph, 'OmegaTensor']:
+    """
+    Runs fn(*tensors) once under no_grad, recording the ops it calls, and returns
+    the compiled graph together with this run's output. fn must be static for the
+    input shapes: arrays it builds outside of ops may only depend on the shapes
+    (masks, constants) or be views of op outputs. Work that depends on the input
+    values belongs in a module whose capturable(...) returns False, which the
+    graph then calls eagerly.
+    """
+    tensors = [OmegaTensor(np.array(x)) for x in inputs]
+    tracer = _Tracer()
+    with no_grad():
+        _push_recorder(tracer)
+        try:
+            out = fn(*tensors)
+        finally:
+            _pop_recorder()
+
+    steps, leaves = [], []
+    produced = {id(t) for t in tensors}
+    for obj, args, kwargs, result in tracer.records:
+        for a in itertools.chain(args, (kwargs or {}).values()):
+            if isinstance(a, OmegaTensor) and id(a) not in produced:
+                leaves.append((a, a.data))
+                produced.add(id(a))
+        step = obj.compile(list(args), result.data) if kwargs is None else _opaque_step(obj, args, kwargs, result.data)
+        if step is not None:
+            steps.append(step)
+        produced.add(id(result))
+    return CapturedGraph([t.data for t in tensors], out.data, steps, leaves), out
+
+# --- Int8 Weight Quantization ---
+# Weight-only, symmetric, per output channel: w[:, j] ~= q[:, j] * scale[j] with q in [-127, 127].
+# Activations stay in floating point; since each column has one scale,
+# x @ w ~= (x @ q) * scale, so the scale is applied to the output instead of the weight.
+def quantize_int8(weight: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Quantizes a (in_features, out_features) weight to int8 with one float32 scale per output column."""
+    max_abs = np.abs(weight).max(axis=0)
+    scale = np.where(max_abs > 0, max_abs / 127.0, 1.0).astype(np.float32)
+    q = np.clip(np.rint(weight / scale), -127, 127).astype(np.int8)
+    return q, scale
+
+def dequantize_int8(q: np.ndarray, scale: np.ndarray) -> np.ndarray:
+    return q.astype(np.float32) * scale
+
+def int8_matmul(x: np.ndarray, q: np.ndarray, scale: np.ndarray, chunk_size: int = 1024) -> np.ndarray:
+    """
+    x @ dequantize_int8(q, scale), converting at most `chunk_size` weight columns to
+    floating point at a time, so the full-precision weight never exists in memory.
+    """
+    dtype = np.result_type(x.dtype, np.float32)
+    out = np.empty(x.shape[:-1] + (q.shape[1],), dtype=dtype)
+    for cs in range(0, q.shape[1], chunk_size):
+        ce = min(cs + chunk_size, q.shape[1])
+        np.matmul(x, q[:, cs:ce].astype(dtype), out=out[..., cs:ce])
+        out[..., cs:ce] *= scale[cs:ce]
+    return out
+
+# --- Named Tensor File Format ---
+# Layout: magic | uint64 header length | JSON header | padding | aligned raw buffers.
+# The header maps each tensor name to its dtype, shape, byte offset and size, with
+# offsets relative to the start of the (aligned) data region.
+TENSOR_FILE_MAGIC = b"VICTORW1"
+TENSOR_FILE_ALIGNMENT = 64
+
+def _align(n: int, alignment: int = TENSOR_FILE_ALIGNMENT) -> int:
+    return (n + alignment - 1) // alignment * alignment
+
+def is_tensor_file(path: str) -> bool:
+    with open(path, 'rb') as f:
+        return f.read(len(TENSOR_FILE_MAGIC)) == TENSOR_FILE_MAGIC
+
+def save_tensors(path: str, tensors: Dict[str, np.ndarray]):
+    """Writes named arrays in the aligned tensor file format, atomically replacing `path`."""
+    header = {}
+    offset = 0
+    for name, array in tensors.items():
+        array = np.asarray(array)
+        header[name] = {
+            'dtype': array.dtype.str,
+            'shape': list(array.shape),
+            'offset': offset,
+            'nbytes': array.nbytes,
+        }
+        offset = _align(offset + array.nbytes)
+
+    header_bytes = json.dumps({'alignment': TENSOR_FILE_ALIGNMENT, 'tensors': header}).encode('utf-8')
+    data_start = _align(len(TENSOR_FILE_MAGIC) + 8 + len(header_bytes))
+
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(TENSOR_FILE_MAGIC)
+        f.write(struct.pack('<Q', len(header_bytes)))
+        f.write(header_bytes)
+        for name, array in tensors.items():
+            f.seek(data_start + header[name]['offset'])
+            f.write(np.ascontiguousarray(array).tobytes())
+        f.truncate(data_start + offset)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+def load_tensors(path: str, mmap: bool = True) -> Dict[str, np.ndarray]:
+    """
+    Reads a tensor file. With mmap=True every array is a read-only view into one
+    shared memory map, so nothing is copied and the OS page cache is shared by all
+    processes that load the same file. With mmap=False private, writable copies are returned.
+    """
+    with open(path, 'rb') as f:
+        if f.read(len(TENSOR_FILE_MAGIC)) != TENSOR_FILE_MAGIC:
+            raise ValueError(f"{path} is not a Victor tensor file")
+        (header_len,) = struct.unpack('<Q', f.read(8))
+        header = json.loads(f.read(header_len).decode('utf-8'))
+
+    data_start = _align(len(TENSOR_FILE_MAGIC) + 8 + header_len, header['alignment'])
+    buffer = np.memmap(path, dtype=np.uint8, mode='r')
+
+    tensors = {}
+    for name, info in header['tensors'].items():
+        start = data_start + info['offset']
+        array = buffer[start:start + info['nbytes']].view(np.dtype(info['dtype'])).reshape(info['shape'])
+        tensors[name] = array if mmap else np.array(array)
+    return tensors
@@ -2,42 +2,548 @@ import numpy as np
 import pickle
 import os
 import re
+import shutil
 import hashlib
-from collections import deque
+import json
+import struct
+import threading
+import zlib
+from collections import OrderedDict, deque
 from datetime import datetime
-from typing import Dict, Any, List, Tuple
+from typing import Dict, Any, List, Optional, Tuple
+
+# --- Vector Indexes ---
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the k largest scores, best first, in O(n + k log k)."""
+    k = min(k, len(scores))
+    if k == 0:
+        return np.zeros(0, dtype=np.int64)
+    if k < len(scores):
+        candidates = np.argpartition(scores, -k)[-k:]
+    else:
+        candidates = np.arange(len(scores))
+    return candidates[np.argsort(scores[candidates])[::-1]]
+
+class _GrowableArray:
+    """A row store with capacity doubling, so appends are amortized O(rows added)."""
+    def __init__(self, row_shape: Tuple[int, ...] = (), dtype=np.float32, capacity: int = 64):
+        self._buffer = np.empty((capacity,) + tuple(row_shape), dtype=dtype)
+        self.size = 0
+
+    def append(self, rows: np.ndarray):
+        needed = self.size + len(rows)
+        if needed > len(self._buffer):
+            grown = np.empty((max(needed, 2 * len(self._buffer)),) + self._buffer.shape[1:], dtype=self._buffer.dtype)
+            grown[:self.size] = self._buffer[:self.size]
+            self._buffer = grown
+        self._buffer[self.size:needed] = rows
+        self.size = needed
+
+    @property
+    def data(self) -> np.ndarray:
+        return self._buffer[:self.size]
+
+class FlatIndex:
+    """Exact cosine search. Vectors are normalized once on insert, not on every query."""
+    def __init__(self, dim: int):
+        self.dim = dim
+        self._vectors = _GrowableArray((dim,))
+
+    def __len__(self) -> int:
+        return self._vectors.size
+
+    def add(self, vectors: np.ndarray):
+        self._vectors.append(_normalize(vectors))
+
+    def search(self, query_vector: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        similarities = self._vectors.data @ _normalize(query_vector)
+        top_k_indices = _top_k(similarities, k)
+        return top_k_indices, similarities[top_k_indices]
+
+    @property
+    def vectors(self) -> np.ndarray:
+        return self._vectors.data
+
+class IVFIndex:
+    """
+    Approximate cosine search with an inverted file: vectors are bucketed by their
+    nearest of `nlist` spherical k-means centroids, and a query only scans the
+    `nprobe` closest buckets. Until `train_size` vectors have arrived it behaves as a FlatIndex.
+    """
+    def __init__(self, dim: int, nlist: int = 1024, nprobe: int = 16, train_size: Optional[int] = None, kmeans_iters: int = 10):
+        self.dim = dim
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.train_size = train_size or nlist * 39
+        self.kmeans_iters = kmeans_iters
+        self.centroids: Optional[np.ndarray] = None
+        self._flat = FlatIndex(dim)
+        self._lists: List[_GrowableArray] = []
+        self._list_ids: List[_GrowableArray] = []
+        self._count = 0
+
+    def __len__(self) -> int:
+        return self._count
+
+    @property
+    def is_trained(self) -> bool:
+        return self.centroids is not None
+
+    def add(self, vectors: np.ndarray):
+        if not self.is_trained:
+            self._flat.add(vectors)
+            self._count += len(vectors)
+            if self._count >= self.train_size:
+                self._train()
+            return
+        self._assign(_normalize(vectors), np.arange(self._count, self._count + len(vectors)))
+        self._count += len(vectors)
+
+    def search(self, query_vector: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        if not self.is_trained:
+            return self._flat.search(query_vector, k)
+
+        query = _normalize(query_vector)
+        probes = _top_k(self.centroids @ query, self.nprobe)
+        ids = np.concatenate([self._list_ids[c].data for c in probes])
+        similarities = np.concatenate([self._lists[c].data @ query for c in probes])
+        best = _top_k(similarities, k)
+        return ids[best], similarities[best]
+
+    @property
+    def vectors(self) -> np.ndarray:
+        if not self.is_trained:
+            return self._flat.vectors
+        vectors = np.empty((self._count, self.dim), dtype=np.float32)
+        for bucket, ids in zip(self._lists, self._list_ids):
+            vectors[ids.data] = bucket.data
+        return vectors
+
+    def _train(self):
+        data = self._flat.vectors
+        rng = np.random.default_rng(0)
+        sample = data[rng.choice(len(data), size=min(len(data), self.nlist * 256), replace=False)]
+        centroids = sample[rng.choice(len(sample), size=self.nlist, replace=False)].copy()
+
+        for _ in range(self.kmeans_iters):
+            assignment = self._nearest(sample, centroids)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignment, sample)
+            empty = ~sums.any(axis=1)
+            # Re-seed empty clusters from random points
+            sums[empty] = sample[rng.choice(len(sample), size=int(empty.sum()))]
+            centroids = _normalize(sums)
+
+        self.centroids = centroids
+        self._lists = [_GrowableArray((self.dim,)) for _ in range(self.nlist)]
+        self._list_ids = [_GrowableArray(dtype=np.int64) for _ in range(self.nlist)]
+        self._assign(data, np.arange(len(data)))
+        self._flat = FlatIndex(self.dim)
+
+    @staticmethod
+    def _nearest(vectors: np.ndarray, centroids: np.ndarray, chunk: int = 65536) -> np.ndarray:
+        return np.concatenate([
+            np.argmax(vectors[i:i + chunk] @ centroids.T, axis=1)
+            for i in range(0, len(vectors), chunk)
+        ])
+
+    def _assign(self, vectors: np.ndarray, ids: np.ndarray):
+        assignment = self._nearest(vectors, self.centroids)
+        order = np.argsort(assignment, kind='stable')
+        buckets, starts = np.unique(assignment[order], return_index=True)
+        for bucket, rows in zip(buckets, np.split(order, starts[1:])):
+            self._lists[bucket].append(vectors[rows])
+            self._list_ids[bucket].append(ids[rows])
+
+VECTOR_INDEXES = {
+    'flat': FlatIndex,
+    'ivf': IVFIndex,
+}
 
 # --- Vector Store (FAISS replacement for simplicity) ---
 class SimpleVectorStore:
-    """A simple, numpy-based vector store."""
-    def __init__(self, dim: int):
+    """A numpy-based vector store over a pluggable index (see VECTOR_INDEXES)."""
+    def __init__(self, dim: int, index: str = 'flat', **index_params):
         self.dim = dim
-        self.vectors = np.zeros((0, dim), dtype=np.float32)
+        self.index_type = index
+        self.index_params = index_params
+        self.index = VECTOR_INDEXES[index](dim, **index_params)
         self.metadata = []
 
     def add(self, vectors: np.ndarray, metadata: List[Dict]):
-        if self.vectors.shape[0] == 0:
-            self.vectors = vectors
-        else:
-            self.vectors = np.vstack([self.vectors, vectors])
+        self.index.add(np.asarray(vectors, dtype=np.float32).reshape(-1, self.dim))
         self.metadata.extend(metadata)
 
     def search(self, query_vector: np.ndarray, k: int) -> List[Tuple[Dict, float]]:
-        if self.vectors.shape[0] == 0:
+        if len(self.index) == 0:
             return []
         # Cosine similarity
-        norm_query = query_vector / np.linalg.norm(query_vector)
-        norm_db = self.vectors / np.linalg.norm(self.vectors, axis=1, keepdims=True)
-        similarities = norm_db @ norm_query.T
+        top_k_indices, similarities = self.index.search(np.asarray(query_vector, dtype=np.float32).ravel(), k)
+        return [(self.metadata[i], float(score)) for i, score in zip(top_k_indices, similarities)]
+
+    @property
+    def vectors(self) -> np.ndarray:
+        """All stored vectors in insertion order (unit-normalized)."""
+        return self.index.vectors
+
+    @vectors.setter
+    def vectors(self, vectors: np.ndarray):
+        self.index = VECTOR_INDEXES[self.index_type](self.dim, **self.index_params)
+        if len(vectors):
+            self.index.add(np.asarray(vectors, dtype=np.float32).reshape(-1, self.dim))
 
-        # Get top k results
-        # Handle case where k > number of items
-        num_items = len(similarities)
-        k = min(k, num_items)
+# --- Graph Index ---
+class GraphIndex:
+    """
+    Directed graph over integer node ids (0..n_nodes-1) with CSR adjacency in both
+    directions. Node payloads are kept by the caller, indexed by the same ids.
+    New edges collect in a small buffer and are merged into the CSR arrays once it
+    holds `merge_threshold` edges, so neighbour lookups are array slices plus a
+    scan of at most that many recent edges.
+    """
+    def __init__(self, merge_threshold: int = 1024):
+        self.n_nodes = 0
+        self.merge_threshold = merge_threshold
+        self._src = _GrowableArray((), np.int64)
+        self._dst = _GrowableArray((), np.int64)
+        self._merged = 0 # edges [0, _merged) are in the CSR arrays
+        empty = (np.zeros(1, dtype=np.int64), np.zeros(0, dtype=np.int64))
+        self._csr = {'out': empty, 'in': empty}
 
-        top_k_indices = np.argsort(similarities)[-k:][::-1]
+    @property
+    def n_edges(self) -> int:
+        return self._src.size
+
+    def add_nodes(self, n: int = 1) -> np.ndarray:
+        """Allocates n new node ids and returns them."""
+        ids = np.arange(self.n_nodes, self.n_nodes + n)
+        self.n_nodes += n
+        return ids
+
+    def add_edges(self, src, dst):
+        self._src.append(np.atleast_1d(np.asarray(src, dtype=np.int64)))
+        self._dst.append(np.atleast_1d(np.asarray(dst, dtype=np.int64)))
+        if self.n_edges - self._merged >= self.merge_threshold:
+            self._merge()
+
+    def neighbors(self, node: int, direction: str = 'both') -> np.ndarray:
+        """Ids of nodes reachable over one edge: 'out' follows edges, 'in' reverses them, 'both' does either."""
+        if direction == 'both':
+            return np.concatenate([self.neighbors(node, 'out'), self.neighbors(node, 'in')])
+        found = []
+        indptr, indices = self._csr[direction]
+        if node < len(indptr) - 1:
+            found.append(indices[indptr[node]:indptr[node + 1]])
+        # Recent edges not merged yet
+        src, dst = self._src.data[self._merged:], self._dst.data[self._merged:]
+        if direction == 'in':
+            src, dst = dst, src
+        found.append(dst[src == node])
+        return np.concatenate(found)
+
+    def expand(self, seeds, hops: int = 1, max_nodes: Optional[int] = None, direction: str = 'both') -> List[Tuple[int, int]]:
+        """
+        Breadth-first expansion from `seeds`, up to `hops` edges away. Returns
+        (node, distance) pairs for nodes other than the seeds, nearest first,
+        stopping once `max_nodes` have been found.
+        """
+        seen = set(int(s) for s in seeds)
+        frontier = list(seen)
+        found = []
+        for hop in range(1, hops + 1):
+            next_frontier = []
+            for node in frontier:
+                for nbr in self.neighbors(node, direction).tolist():
+                    if nbr in seen:
+                        continue
+                    seen.add(nbr)
+                    found.append((nbr, hop))
+                    next_frontier.append(nbr)
+                    if max_nodes is not None and len(found) >= max_nodes:
+                        return found
+            frontier = next_frontier
+            if not frontier:
+                break
+        return found
+
+    def _merge(self):
+        """Rebuilds both CSR arrays from every edge (counting sort by source/target)."""
+        src, dst = self._src.data, self._dst.data
+        for direction, (keys, values) in (('out', (src, dst)), ('in', (dst, src))):
+            order = np.argsort(keys, kind='stable')
+            counts = np.bincount(keys, minlength=self.n_nodes)
+            indptr = np.zeros(len(counts) + 1, dtype=np.int64)
+            np.cumsum(counts, out=indptr[1:])
+            self._csr[direction] = (indptr, values[order])
+        self._merged = len(src)
+
+# --- Embedding Cache ---
+class EmbeddingCache:
+    """
+    LRU cache of embeddings keyed by a hash of the embedded token ids, so the
+    same text is only run through the model once.
+    """
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(token_ids: List[int]) -> str:
+        return hashlib.blake2b(np.asarray(token_ids, dtype=np.int64).tobytes(), digest_size=16).hexdigest()
+
+    def get(self, token_ids: List[int]) -> Optional[np.ndarray]:
+        key = self.key(token_ids)
+        with self._lock:
+            embedding = self._entries.get(key)
+            if embedding is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return embedding
+
+    def put(self, token_ids: List[int], embedding: np.ndarray):
+        if self.max_entries <= 0:
+            return
+        embedding = np.array(embedding)
+        embedding.flags.writeable = False # shared by every caller that hits this entry
+        key = self.key(token_ids)
+        with self._lock:
+            self._entries[key] = embedding
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
 
-        return [(self.metadata[i], similarities[i]) for i in top_k_indices]
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+# --- Append-Only Memory Log ---
+# Long-term memory lives in a directory of numbered segments. Segment i holds:
+#   vectors-i.f32  raw float32 embeddings, one row per record (memory-mappable)
+#   records-i.log  metadata records, each framed as uint32 length | uint32 crc32 | JSON
+#   edges-i.log    graph edges [from_id, to_id], framed the same way
+# MANIFEST.json lists the live segments and is replaced atomically, so a crash during
+# compaction leaves either the old or the new segments. Files of a segment the manifest
+# does not list yet are leftovers of such a crash: compaction replaces them wholesale and
+# a segment roll deletes them before appending. A torn tail left by a crash
+# mid-append is detected by its length/crc and truncated on load.
+_RECORD_HEADER = struct.Struct('<II')
+
+def _frame(obj) -> bytes:
+    payload = json.dumps(obj).encode('utf-8')
+    return _RECORD_HEADER.pack(len(payload), zlib.crc32(payload)) + payload
+
+def _read_frames(path: str) -> Tuple[List[Any], List[int]]:
+    """All intact records of a log file, and the byte offset just past each one."""
+    records, ends = [], []
+    if not os.path.exists(path):
+        return records, ends
+    with open(path, 'rb') as f:
+        data = f.read()
+    pos = 0
+    while pos + _RECORD_HEADER.size <= len(data):
+        length, crc = _RECORD_HEADER.unpack_from(data, pos)
+        payload = data[pos + _RECORD_HEADER.size:pos + _RECORD_HEADER.size + length]
+        if len(payload) < length or zlib.crc32(payload) != crc:
+            break
+        records.append(json.loads(payload))
+        pos += _RECORD_HEADER.size + length
+        ends.append(pos)
+    return records, ends
+
+def _truncate(path: str, size: int):
+    if os.path.exists(path) and os.path.getsize(path) > size:
+        with open(path, 'r+b') as f:
+            f.truncate(size)
+
+def _file_size(path: str) -> int:
+    return os.path.getsize(path) if os.path.exists(path) else 0
+
+def _append_fsync(path: str, data: bytes):
+    with open(path, 'ab') as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+
+def _write_fsync(path: str, data: bytes):
+    """Replaces `path` with `data` atomically, via a fsynced temp file."""
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+class MemoryLog:
+    """
+    Append-only, segment-based persistence for VictorMemory. `append`/`append_edge`
+    only queue entries in memory; `flush` writes everything queued since the last
+    flush with one write and one fsync per file, so saving costs O(delta). When more
+    than `max_segments` segments exist, `flush` compacts them into one.
+    """
+    def __init__(self, path: str, dim: int, segment_max_rows: int = 65536, max_segments: int = 8):
+        self.path = path
+        self.dim = dim
+        self.segment_max_rows = segment_max_rows
+        self.max_segments = max_segments
+        self.segments: List[int] = []
+        self._active_rows = 0
+        self._pending_vectors: List[np.ndarray] = []
+        self._pending_records: List[bytes] = []
+        self._pending_edges: List[bytes] = []
+        self._lock = threading.Lock()
+
+    # --- Writing ---
+    def append(self, record: Dict[str, Any], vector: np.ndarray):
+        vector = np.asarray(vector, dtype=np.float32).reshape(1, self.dim)
+        with self._lock:
+            self._pending_vectors.append(vector)
+            self._pending_records.append(_frame(record))
+
+    def append_edge(self, from_id: str, to_id: str):
+        with self._lock:
+            self._pending_edges.append(_frame([from_id, to_id]))
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending_records) + len(self._pending_edges)
+
+    def flush(self):
+        """
+        Persists queued entries to the active segment (fsynced), rolling and compacting
+        as needed. If a write fails, the segment is truncated back to its size before
+        the flush, the entries stay queued for the next flush, and the error is raised.
+        """
+        with self._lock:
+            vectors, records, edges = self._pending_vectors, self._pending_records, self._pending_edges
+            self._pending_vectors, self._pending_records, self._pending_edges = [], [], []
+            if not (records or edges):
+                return
+            os.makedirs(self.path, exist_ok=True)
+            if not self.segments or self._active_rows >= self.segment_max_rows:
+                self.segments.append(self.segments[-1] + 1 if self.segments else 0)
+                self._remove_segment(self.segments[-1])
+                self._active_rows = 0
+                self._write_manifest()
+            seg = self.segments[-1]
+            sizes = {kind: _file_size(self._file(kind, seg)) for kind in ('vectors', 'records', 'edges')}
+            try:
+                # Vectors before records: on load, a record without its vector row is dropped
+                if vectors:
+                    _append_fsync(self._file('vectors', seg), np.concatenate(vectors).tobytes())
+                    _append_fsync(self._file('records', seg), b''.join(records))
+                if edges:
+                    _append_fsync(self._file('edges', seg), b''.join(edges))
+            except Exception:
+                # Undo the partial write, so no vector row is left without its record,
+                # and queue the entries again ahead of anything appended meanwhile
+                for kind, size in sizes.items():
+                    _truncate(self._file(kind, seg), size)
+                self._pending_vectors[:0] = vectors
+                self._pending_records[:0] = records
+                self._pending_edges[:0] = edges
+                raise
+            self._active_rows += len(records)
+            if len(self.segments) > self.max_segments:
+                self._compact()
+
+    def compact(self):
+        """Rewrites all segments into a single one."""
+        with self._lock:
+            if self.segments:
+                self._compact()
+
+    # --- Reading ---
+    def load(self) -> Tuple[np.ndarray, List[Dict[str, Any]], List[Tuple[str, str]]]:
+        """Reads every segment and returns (vectors, records, edges), repairing torn tails."""
+        with self._lock:
+            self.segments = self._read_manifest()
+            all_vectors, all_records, all_edges = [], [], []
+            for seg in self.segments:
+                vectors, records, edges = self._load_segment(seg)
+                all_vectors.append(vectors)
+                all_records.extend(records)
+                all_edges.extend(edges)
+            self._active_rows = len(all_vectors[-1]) if all_vectors else 0
+        vectors = np.concatenate(all_vectors) if all_vectors else np.zeros((0, self.dim), dtype=np.float32)
+        return vectors, all_records, all_edges
+
+    def _load_segment(self, seg: int) -> Tuple[np.ndarray, List[Dict[str, Any]], List[Tuple[str, str]]]:
+        records, ends = _read_frames(self._file('records', seg))
+        vector_path = self._file('vectors', seg)
+        row_bytes = 4 * self.dim
+        n_rows = os.path.getsize(vector_path) // row_bytes if os.path.exists(vector_path) else 0
+        n = min(n_rows, len(records))
+        # Drop anything beyond the last complete (vector, record) pair
+        _truncate(vector_path, n * row_bytes)
+        _truncate(self._file('records', seg), ends[n - 1] if n else 0)
+        edges, edge_ends = _read_frames(self._file('edges', seg))
+        _truncate(self._file('edges', seg), edge_ends[-1] if edge_ends else 0)
+
+        vectors = np.memmap(vector_path, dtype=np.float32, mode='r', shape=(n, self.dim)) if n else np.zeros((0, self.dim), dtype=np.float32)
+        return vectors, records[:n], [tuple(e) for e in edges]
+
+    # --- Segment files ---
+    def _file(self, kind: str, seg: int) -> str:
+        ext = 'f32' if kind == 'vectors' else 'log'
+        return os.path.join(self.path, f"{kind}-{seg:06d}.{ext}")
+
+    def _remove_segment(self, seg: int):
+        for kind in ('vectors', 'records', 'edges'):
+            if os.path.exists(self._file(kind, seg)):
+                os.remove(self._file(kind, seg))
+
+    def _read_manifest(self) -> List[int]:
+        manifest_path = os.path.join(self.path, 'MANIFEST.json')
+        if not os.path.exists(manifest_path):
+            return []
+        with open(manifest_path, 'r') as f:
+            manifest = json.load(f)
+        if manifest['dim'] != self.dim:
+            raise ValueError(f"Memory log at {self.path} has dim {manifest['dim']}, expected {self.dim}")
+        return manifest['segments']
+
+    def _write_manifest(self):
+        manifest_path = os.path.join(self.path, 'MANIFEST.json')
+        tmp_path = manifest_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump({'dim': self.dim, 'segments': self.segments}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, manifest_path)
+
+    def _compact(self):
+        old_segments = list(self.segments)
+        vectors, records, edges = [], [], []
+        for seg in old_segments:
+            seg_vectors, seg_records, seg_edges = self._load_segment(seg)
+            vectors.append(np.array(seg_vectors))
+            records.extend(seg_records)
+            edges.extend(seg_edges)
+
+        new_seg = old_segments[-1] + 1
+        for kind, data in (
+            ('vectors', np.concatenate(vectors).tobytes()),
+            ('records', b''.join(_frame(r) for r in records)),
+            ('edges', b''.join(_frame(list(e)) for e in edges)),
+        ):
+            _write_fsync(self._file(kind, new_seg), data)
+        self.segments = [new_seg]
+        self._active_rows = len(records)
+        self._write_manifest()
+
+        for seg in old_segments:
+            self._remove_segment(seg)
+        print(f"[Memory] Compacted {len(old_segments)} segments into segment {new_seg}")
 
 # --- Main Memory System ---
 class VictorMemory:
@@ -50,14 +556,36 @@ class VictorMemory:
         self.timeline = deque(maxlen=self.config['short_term_max_size'])
 
         # 2. Long-term semantic "vector" memory
-        self.vector_store = SimpleVectorStore(dim=self.config['vector_dim'])
+        index_config = dict(self.config.get('vector_index', {'type': 'flat'}))
+        self.vector_store = SimpleVectorStore(
+            dim=self.config['vector_dim'],
+            index=index_config.pop('type', 'flat'),
+            **index_config
+        )
 
-        # 3. Causal "graph" memory (conceptual, simple implementation)
-        self.graph = {} # node_id -> {content: {}, connections: []}
+        # 3. Causal "graph" memory. Node i is the i-th stored memory, whose entry
+        # is vector_store.metadata[i]; edges link each interaction to the next one.
+        self.graph = GraphIndex()
+        self._node_ids: Dict[str, int] = {} # memory id -> graph node
+        self.graph_hops = self.config.get('graph_hops', 1)
 
+        # Persistence: an append-only segment log, flushed in the background
         self.autosave_path = self.config['long_term_db_path']
+        self.store = MemoryLog(
+            self.autosave_path,
+            self.config['vector_dim'],
+            segment_max_rows=self.config.get('segment_max_rows', 65536),
+            max_segments=self.config.get('max_segments', 8),
+        )
         self.load()
 
+        self._stop_autosave = threading.Event()
+        self._autosave_thread = None
+        interval = self.config.get('autosave_interval_seconds', 0)
+        if interval:
+            self._autosave_thread = threading.Thread(target=self._autosave_loop, args=(interval,), name="victor-memory-autosave", daemon=True)
+            self._autosave_thread.start()
+
     def add_interaction(self, user_input: str, ai_response: str, embedding: np.ndarray):
         """Adds a full user-AI interaction to memory."""
         timestamp = datetime.utcnow().isoformat()
@@ -74,12 +602,12 @@ class VictorMemory:
             'timestamp': timestamp,
             'user_input': scrubbed_user,
             'ai_response': scrubbed_ai,
-            'embedding': embedding
         }
 
         # Add to all memory systems
         self.timeline.append(memory_entry)
         self.vector_store.add(embedding.reshape(1, -1), [memory_entry])
+        self.store.append(memory_entry, embedding)
         self._add_to_graph(memory_entry)
 
         print(f"[Memory] Added interaction {interaction_id}")
@@ -87,19 +615,31 @@ class VictorMemory:
     def _add_to_graph(self, entry: Dict):
         """Adds an entry to the graph, trying to link it to recent events."""
         node_id = entry['id']
-        self.graph[node_id] = {'content': entry, 'connections': []}
+        self._node_ids[node_id] = int(self.graph.add_nodes(1)[0])
 
         # Naive causal link: connect to the previous timeline event
         if len(self.timeline) > 1:
-            prev_entry = self.timeline[-2]
-            prev_id = prev_entry['id']
-            if prev_id in self.graph:
-                self.graph[prev_id]['connections'].append(node_id)
+            prev_id = self.timeline[-2]['id']
+            if prev_id in self._node_ids:
+                self.graph.add_edges(self._node_ids[prev_id], self._node_ids[node_id])
+                self.store.append_edge(prev_id, node_id)
 
-    def retrieve_relevant_memories(self, query_embedding: np.ndarray, k: int = 5) -> List[Dict]:
-        """Retrieves memories relevant to a query from the vector store."""
+    def retrieve_relevant_memories(self, query_embedding: np.ndarray, k: int = 5, hops: Optional[int] = None,
+                                   max_neighbors: Optional[int] = None) -> List[Dict]:
+        """
+        Retrieves memories relevant to a query from the vector store, followed by
+        their causal neighbours up to `hops` graph edges away (at most `max_neighbors`,
+        default k). hops=0 returns the vector hits only.
+        """
         results = self.vector_store.search(query_embedding, k)
-        return [meta for meta, score in results]
+        hits = [meta for meta, score in results]
+        hops = self.graph_hops if hops is None else hops
+        if not hits or hops <= 0:
+            return hits
+
+        seeds = [self._node_ids[meta['id']] for meta in hits]
+        neighbors = self.graph.expand(seeds, hops, max_nodes=k if max_neighbors is None else max_neighbors)
+        return hits + [self.vector_store.metadata[node] for node, _ in neighbors]
 
     def get_short_term_context(self, num_recent: int = 5) -> str:
         """Constructs a context string from recent interactions."""
@@ -110,32 +650,80 @@ class VictorMemory:
         return context.strip()
 
     def save(self):
-        """Saves the long-term memory systems to disk."""
-        try:
-            os.makedirs(os.path.dirname(self.autosave_path), exist_ok=True)
-            memory_state = {
-                'vector_store_vectors': self.vector_store.vectors,
-                'vector_store_metadata': self.vector_store.metadata,
-                'graph': self.graph
-            }
-            with open(self.autosave_path, 'wb') as f:
-                pickle.dump(memory_state, f)
-            print(f"[Memory] Saved long-term memory to {self.autosave_path}")
-        except Exception as e:
-            print(f"Error saving memory: {e}")
+        """Persists interactions added since the last save (see MemoryLog.flush)."""
+        pending = self.store.pending
+        if not pending:
+            return
+        self.store.flush()
+        print(f"[Memory] Saved {pending} new entries to {self.autosave_path}")
 
     def load(self):
         """Loads long-term memory from disk."""
-        if not os.path.exists(self.autosave_path):
+        migrate_path = self.autosave_path + '.migrating'
+        if not os.path.exists(self.autosave_path) and os.path.isdir(migrate_path) and os.path.isfile(self.autosave_path + '.legacy'):
+            # A migration stopped between moving the pickle aside and the log into place
+            os.replace(migrate_path, self.autosave_path)
+        if os.path.isfile(self.autosave_path):
+            self._migrate_pickle()
+            return
+        if not os.path.isdir(self.autosave_path):
             print("[Memory] No existing memory file found. Starting fresh.")
             return
         try:
-            with open(self.autosave_path, 'rb') as f:
-                memory_state = pickle.load(f)
-            self.vector_store.vectors = memory_state['vector_store_vectors']
-            self.vector_store.metadata = memory_state['vector_store_metadata']
-            self.graph = memory_state['graph']
-            print(f"[Memory] Loaded long-term memory from {self.autosave_path}")
+            vectors, records, edges = self.store.load()
         except Exception as e:
             print(f"Error loading memory: {e}. Starting fresh.")
-            self.__init__(self.config, self.privacy_core) # Re-initialize
+            return
+
+        # Node ids follow row order, so they stay aligned with vectors and metadata
+        for i, entry in enumerate(records):
+            self._node_ids[entry['id']] = i
+        self.graph.add_nodes(len(records))
+        edges = [(self._node_ids[a], self._node_ids[b]) for a, b in edges if a in self._node_ids and b in self._node_ids]
+        if edges:
+            src, dst = np.array(edges, dtype=np.int64).T
+            self.graph.add_edges(src, dst)
+        self.vector_store.vectors = vectors
+        self.vector_store.metadata = records
+        print(f"[Memory] Loaded {len(records)} memories from {self.autosave_path}")
+
+    def _migrate_pickle(self):
+        """Converts the old single-file pickle at long_term_db_path into the segment log."""
+        legacy_path = self.autosave_path + '.legacy'
+        with open(self.autosave_path, 'rb') as f:
+            memory_state = pickle.load(f)
+
+        # The log is written beside the pickle and swapped in only once it is complete,
+        # so a failure or crash here leaves the pickle in place to migrate again
+        migrate_path = self.autosave_path + '.migrating'
+        shutil.rmtree(migrate_path, ignore_errors=True)
+        self.store.path = migrate_path
+        for entry in memory_state['vector_store_metadata']:
+            self.store.append({key: value for key, value in entry.items() if key != 'embedding'}, entry['embedding'])
+        for node_id, node in memory_state['graph'].items():
+            for to_id in node['connections']:
+                self.store.append_edge(node_id, to_id)
+        try:
+            self.store.flush()
+        finally:
+            self.store.path = self.autosave_path
+        os.replace(self.autosave_path, legacy_path)
+        os.replace(migrate_path, self.autosave_path)
+        self.load()
+        print(f"[Memory] Migrated {len(self.vector_store.metadata)} memories from {legacy_path} to {self.autosave_path}")
+
+    def close(self):
+        """Stops the background flusher and persists anything still pending."""
+        self._stop_autosave.set()
+        if self._autosave_thread is not None:
+            self._autosave_thread.join()
+            self._autosave_thread = None
+        self.save()
+
+    def _autosave_loop(self, interval: float):
+        while not self._stop_autosave.wait(interval):
+            try:
+                self.save()
+            except Exception as e:
+                # The entries stay queued, so the next interval (or close) retries them
+                print(f"[Memory] Autosave failed, will retry: {e}")
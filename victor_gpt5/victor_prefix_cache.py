@@ -0,0 +1,198 @@
+import heapq
+import itertools
+import threading
+import numpy as np
+from typing import Dict, Any, List, Optional, Tuple
+
+from victor_transformer import KVCache
+
+class _RadixNode:
+    """An edge of the radix tree: a run of tokens and their per-layer keys/values."""
+    def __init__(self, tokens: Tuple[int, ...], kv: List[Tuple[np.ndarray, np.ndarray]], parent: Optional['_RadixNode']):
+        self.tokens = tokens
+        self.kv = kv # one (k, v) pair per layer, each (n_heads, len(tokens), d_k)
+        self.parent = parent
+        self.children: Dict[int, '_RadixNode'] = {}
+        self.last_access = 0
+
+    @property
+    def nbytes(self) -> int:
+        return sum(k.nbytes + v.nbytes for k, v in self.kv)
+
+class PrefixCache:
+    """
+    Key/value states of previously prefilled prompts, shared across requests.
+    Prompts are stored in a radix tree over token ids, so `lookup` finds the longest
+    cached prefix of a new prompt and only the remaining suffix needs a forward pass.
+    Keys/values of a causal model at position i depend only on tokens 0..i, which is
+    what makes a cached prefix reusable under any continuation.
+    Memory is bounded by `max_bytes`: least recently used leaves are evicted first.
+    """
+    def __init__(self, n_layers: int, max_bytes: int = 256 * 2**20):
+        self.n_layers = n_layers
+        self.max_bytes = max_bytes
+        self._root = _RadixNode((), [], None)
+        self._bytes = 0
+        self._clock = 0
+        self._lock = threading.Lock()
+        # Eviction candidates: (last_access, seq, node) for leaves. An entry goes stale
+        # when its node is touched again, gains a child or is evicted; stale entries are
+        # skipped when popped and dropped whenever the heap is rebuilt.
+        self._leaf_heap: List[Tuple[int, int, _RadixNode]] = []
+        self._seq = itertools.count()
+        self._n_nodes = 0
+
+        # Hit-rate counters
+        self.lookups = 0
+        self.hits = 0
+        self.lookup_tokens = 0
+        self.reused_tokens = 0
+        self.evictions = 0
+
+    def lookup(self, token_ids: List[int]) -> Tuple[KVCache, int]:
+        """
+        Returns a fresh KVCache seeded with the longest cached prefix of `token_ids`,
+        and that prefix's length. At least one token is always left uncached, so the
+        caller's forward pass over the rest still produces next-token logits.
+        """
+        cache = KVCache(self.n_layers)
+        limit = len(token_ids) - 1
+        with self._lock:
+            self._clock += 1
+            node, pos = self._root, 0
+            while pos < limit:
+                child = node.children.get(token_ids[pos])
+                if child is None:
+                    break
+                m = self._common_length(child.tokens, token_ids[pos:limit])
+                for layer_cache, (k, v) in zip(cache.layers, child.kv):
+                    layer_cache.append(k[:, :m], v[:, :m])
+                self._touch(child)
+                pos += m
+                if m < len(child.tokens):
+                    break
+                node = child
+
+            self.lookups += 1
+            self.lookup_tokens += len(token_ids)
+            self.reused_tokens += pos
+            if pos > 0:
+                self.hits += 1
+        return cache, pos
+
+    def insert(self, token_ids: List[int], cache: KVCache):
+        """Stores the keys/values of `token_ids`, which must be the first tokens held by `cache`."""
+        n = len(token_ids)
+        assert cache.seq_len >= n, "The cache does not cover all of the given tokens"
+        if n == 0:
+            return
+        with self._lock:
+            self._clock += 1
+            node, pos = self._root, 0
+            while pos < n:
+                child = node.children.get(token_ids[pos])
+                if child is None:
+                    kv = [(layer.k[:, pos:n].copy(), layer.v[:, pos:n].copy()) for layer in cache.layers]
+                    child = _RadixNode(tuple(token_ids[pos:n]), kv, node)
+                    node.children[token_ids[pos]] = child
+                    self._bytes += child.nbytes
+                    self._n_nodes += 1
+                    pos = n
+                else:
+                    m = self._common_length(child.tokens, token_ids[pos:n])
+                    if m < len(child.tokens):
+                        child = self._split(child, m)
+                    pos += m
+                self._touch(child)
+                node = child
+            self._evict()
+
+    def clear(self):
+        """Drops every entry, e.g. after the model weights changed."""
+        with self._lock:
+            self._root.children.clear()
+            self._bytes = 0
+            self._leaf_heap = []
+            self._n_nodes = 0
+
+    @property
+    def nbytes(self) -> int:
+        return self._bytes
+
+    @property
+    def hit_rate(self) -> float:
+        """Fraction of lookups that reused at least one cached token."""
+        return self.hits / self.lookups if self.lookups else 0.0
+
+    @property
+    def token_hit_rate(self) -> float:
+        """Fraction of looked-up prompt tokens whose keys/values came from the cache."""
+        return self.reused_tokens / self.lookup_tokens if self.lookup_tokens else 0.0
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'lookups': self.lookups,
+            'hits': self.hits,
+            'hit_rate': self.hit_rate,
+            'token_hit_rate': self.token_hit_rate,
+            'reused_tokens': self.reused_tokens,
+            'evictions': self.evictions,
+            'bytes': self._bytes,
+            'max_bytes': self.max_bytes,
+        }
+
+    # --- Tree maintenance (callers hold the lock) ---
+    @staticmethod
+    def _common_length(a, b) -> int:
+        m = min(len(a), len(b))
+        for i in range(m):
+            if a[i] != b[i]:
+                return i
+        return m
+
+    def _split(self, node: _RadixNode, m: int) -> _RadixNode:
+        """Splits `node` after its first m tokens and returns the new upper half."""
+        # Both halves are copied so that evicting one actually frees its memory
+        upper = _RadixNode(node.tokens[:m], [(k[:, :m].copy(), v[:, :m].copy()) for k, v in node.kv], node.parent)
+        upper.last_access = node.last_access
+        upper.children[node.tokens[m]] = node
+        node.parent.children[node.tokens[0]] = upper
+        node.tokens = node.tokens[m:]
+        node.kv = [(k[:, m:].copy(), v[:, m:].copy()) for k, v in node.kv]
+        node.parent = upper
+        self._n_nodes += 1
+        return upper
+
+    def _touch(self, node: _RadixNode):
+        node.last_access = self._clock
+        if not node.children:
+            self._push_leaf(node)
+
+    def _push_leaf(self, node: _RadixNode):
+        heapq.heappush(self._leaf_heap, (node.last_access, next(self._seq), node))
+        if len(self._leaf_heap) > 2 * self._n_nodes + 64:
+            # Mostly stale entries: rebuild from the live leaves
+            self._leaf_heap = [(n.last_access, next(self._seq), n) for n in self._iter_nodes() if not n.children]
+            heapq.heapify(self._leaf_heap)
+
+    def _evict(self):
+        """Evicts least recently used leaves until the cache fits in max_bytes."""
+        while self._bytes > self.max_bytes and self._leaf_heap:
+            access, _, victim = heapq.heappop(self._leaf_heap)
+            if victim.parent is None or victim.children or victim.last_access != access:
+                continue # stale entry
+            parent = victim.parent
+            del parent.children[victim.tokens[0]]
+            victim.parent = None
+            self._bytes -= victim.nbytes
+            self._n_nodes -= 1
+            self.evictions += 1
+            if parent is not self._root and not parent.children:
+                self._push_leaf(parent)
+
+    def _iter_nodes(self):
+        stack = list(self._root.children.values())
+        while stack:
+            node = stack.pop()
+            yield node
+            stack.extend(node.children.values())
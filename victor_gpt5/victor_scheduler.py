@@ -0,0 +1,263 @@
+import asyncio
+import queue
+import threading
+import uuid
+import numpy as np
+from typing import Dict, Any, AsyncIterator, List, Optional, Callable, Awaitable
+
+from victor_kernel import no_grad, Profiler
+from victor_transformer import KVCache
+from victor_tokenizer import IncrementalDecoder
+
+class SchedulerOverloaded(Exception):
+    """Raised when the request queue is full. The API maps it to HTTP 503."""
+
+class GenerationCancelled(Exception):
+    """Raised to the caller awaiting a request that was cancelled before finishing."""
+
+class GenerationRequest:
+    """One prompt travelling through the scheduler, from queue to finished response."""
+    def __init__(self, prompt: str, loop: asyncio.AbstractEventLoop, stream: bool = False):
+        self.id = uuid.uuid4().hex
+        self.prompt = prompt
+        self.loop = loop
+        self.future: asyncio.Future = loop.create_future()
+        self.cancelled = False
+        # Streaming requests receive text pieces here; None marks the end
+        self.pieces: Optional[asyncio.Queue] = asyncio.Queue() if stream else None
+        self.decoder: Optional[IncrementalDecoder] = None
+
+        # Decoding state, owned by the worker thread
+        self.prompt_ids: List[int] = []
+        self.generated_ids: List[int] = []
+        self.cache: Optional[KVCache] = None
+        self.next_token_id: Optional[int] = None
+
+    def cancel(self):
+        """Asks the worker to drop this request at its next step."""
+        self.cancelled = True
+
+class GenerationScheduler:
+    """
+    Continuous batching for the API server. Prompts wait in a bounded queue, and a
+    single worker thread (off the event loop) admits them, prefills each one, then
+    advances every active request by one token per batched `decode_batch` forward.
+    Requests join and leave the batch independently, so a long generation never
+    blocks short ones behind it.
+    """
+    def __init__(self, agi, config: Dict[str, Any]):
+        self.agi = agi
+        self.model = agi.agents['general_purpose']
+        self.config = config.get('scheduler', {})
+        self.max_batch_size = self.config.get('max_batch_size', 8)
+        self.max_active_tokens = self.config.get('max_active_tokens', 32768)
+        # Profiles a random fraction of prefills and decode steps; 0 leaves the kernel unhooked
+        self.profiler = Profiler(sample_rate=config.get('kernel', {}).get('profile_sample_rate', 0.0)).attach(self.model)
+
+        self._queue: "queue.Queue[GenerationRequest]" = queue.Queue(maxsize=self.config.get('max_queue_size', 64))
+        self._requests: Dict[str, GenerationRequest] = {}
+        self._active: List[GenerationRequest] = []
+        self._running = False
+        self._worker: Optional[threading.Thread] = None
+
+    # --- Event-loop side ---
+    def start(self):
+        self._running = True
+        self._worker = threading.Thread(target=self._run, name="victor-scheduler", daemon=True)
+        self._worker.start()
+
+    def stop(self):
+        """Stops the worker and cancels every request it has not finished."""
+        self._running = False
+        if self._worker is not None:
+            self._worker.join()
+            self._worker = None
+        for request in self._active:
+            self._finish(request)
+        self._active = []
+        while True:
+            try:
+                self._finish(self._queue.get_nowait())
+            except queue.Empty:
+                break
+
+    def submit(self, prompt: str, stream: bool = False) -> GenerationRequest:
+        """Queues a prompt. Must be called from the event loop that awaits the result."""
+        request = GenerationRequest(prompt, asyncio.get_running_loop(), stream)
+        self._requests[request.id] = request
+        try:
+            self._queue.put_nowait(request)
+        except queue.Full:
+            del self._requests[request.id]
+            raise SchedulerOverloaded(f"Request queue is full ({self._queue.maxsize} waiting)")
+        return request
+
+    def cancel(self, request_id: str) -> bool:
+        request = self._requests.get(request_id)
+        if request is None:
+            return False
+        request.cancel()
+        return True
+
+    async def generate(self, prompt: str, is_disconnected: Optional[Callable[[], Awaitable[bool]]] = None) -> str:
+        """
+        Submits a prompt and waits for its response. If `is_disconnected` reports
+        that the client went away, or the awaiting task is cancelled, the request
+        is cancelled so it stops occupying a batch slot.
+        """
+        request = self.submit(prompt)
+        try:
+            while True:
+                done, _ = await asyncio.wait({request.future}, timeout=0.5)
+                if done:
+                    if request.future.cancelled():
+                        raise GenerationCancelled(request.id)
+                    return request.future.result()
+                if is_disconnected is not None and await is_disconnected():
+                    request.cancel()
+                    raise GenerationCancelled(request.id)
+        except asyncio.CancelledError:
+            request.cancel()
+            raise
+
+    async def iter_pieces(self, request: GenerationRequest) -> AsyncIterator[str]:
+        """
+        Yields a streaming request's response text as it is decoded. If the consumer
+        stops early (client disconnect, task cancellation) the request is cancelled.
+        """
+        try:
+            while True:
+                piece = await request.pieces.get()
+                if piece is None:
+                    break
+                yield piece
+        finally:
+            if not request.future.done():
+                request.cancel()
+        if request.future.cancelled():
+            raise GenerationCancelled(request.id)
+
+    # --- Worker side ---
+    def _run(self):
+        with no_grad():
+            while self._running:
+                try:
+                    self._admit()
+                    if self._active:
+                        self._step()
+                except Exception as e:
+                    # The worker must outlive any failure: answer the batch and keep serving
+                    for request in self._active:
+                        self._fail(request, e)
+                    self._active = []
+
+    def _admit(self):
+        """Moves queued requests into the batch while slots and KV budget remain."""
+        # Block briefly only when idle, so active requests are never delayed
+        block = not self._active
+        while len(self._active) < self.max_batch_size and self._active_tokens() < self.max_active_tokens:
+            try:
+                request = self._queue.get(timeout=0.1) if block else self._queue.get_nowait()
+            except queue.Empty:
+                return
+            block = False
+            if request.cancelled:
+                self._finish(request)
+                continue
+            try:
+                self._prefill(request)
+            except Exception as e:
+                self._fail(request, e)
+                continue
+            self._active.append(request)
+
+    def _prefill(self, request: GenerationRequest):
+        request.prompt_ids = self.agi.prepare_prompt(request.prompt)
+        if request.pieces is not None:
+            request.decoder = IncrementalDecoder(self.agi.tokenizer)
+        with self.profiler.sample():
+            request.cache, logits = self.agi.prefill(request.prompt_ids)
+        request.next_token_id = int(np.argmax(logits.data[0, -1, :]))
+
+    def _step(self):
+        """Retires finished requests, then decodes one token for all others in one forward."""
+        still_active = []
+        for request in self._active:
+            try:
+                if self._advance(request):
+                    still_active.append(request)
+            except Exception as e:
+                self._fail(request, e)
+
+        self._active = still_active
+        if not still_active:
+            return
+
+        token_ids = np.array([[r.generated_ids[-1]] for r in still_active])
+        try:
+            with self.profiler.sample():
+                logits = self.model.decode_batch(token_ids, [r.cache for r in still_active])
+        except Exception as e:
+            for request in still_active:
+                self._fail(request, e)
+            self._active = []
+            return
+        for request, row in zip(still_active, logits.data[:, -1, :]):
+            request.next_token_id = int(np.argmax(row))
+
+    def _advance(self, request: GenerationRequest) -> bool:
+        """Takes the request's next token; returns False once the request has left the batch."""
+        if request.cancelled:
+            self._finish(request)
+            return False
+        if request.next_token_id == self.agi.eos_token_id:
+            self._complete(request)
+            return False
+        request.generated_ids.append(request.next_token_id)
+        if request.decoder is not None:
+            self._emit(request, request.decoder.push(request.next_token_id))
+        if len(request.generated_ids) >= self.agi.max_new_tokens or request.cache.seq_len >= self.model.context_window:
+            self._complete(request)
+            return False
+        return True
+
+    def _active_tokens(self) -> int:
+        return sum(r.cache.seq_len for r in self._active)
+
+    def _emit(self, request: GenerationRequest, piece: str):
+        if piece:
+            request.loop.call_soon_threadsafe(request.pieces.put_nowait, piece)
+
+    def _complete(self, request: GenerationRequest):
+        try:
+            if request.decoder is not None:
+                self._emit(request, request.decoder.flush())
+            result = self.agi.finish_response(request.prompt, request.generated_ids)
+        except Exception as e:
+            self._fail(request, e)
+            return
+        self._finish(request, result=result)
+
+    def _fail(self, request: GenerationRequest, e: Exception):
+        """Answers with the router's error reply, streamed as the final piece if streaming."""
+        result = self.agi.error_response(e)
+        if request.pieces is not None:
+            self._emit(request, result)
+        self._finish(request, result=result)
+
+    def _finish(self, request: GenerationRequest, result: Optional[str] = None):
+        """Resolves the request's future with `result`, or cancels it when result is None."""
+        self._requests.pop(request.id, None)
+        request.cache = None
+
+        def resolve():
+            if request.future.done():
+                return
+            if result is None:
+                request.future.cancel()
+            else:
+                request.future.set_result(result)
+            if request.pieces is not None:
+                request.pieces.put_nowait(None)
+
+        request.loop.call_soon_threadsafe(resolve)
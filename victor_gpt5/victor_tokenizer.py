@@ -128,6 +128,37 @@ class VictorTokenizer:
     def id_to_token_map(self):
         return self.id_to_token
 
+class IncrementalDecoder:
+    """
+    Turns a growing sequence of token ids into text deltas for streaming.
+    Each step re-decodes a small window that starts one piece before the unread
+    tokens, so word-boundary spaces come out right. Text ending in an incomplete
+    multi-byte character (U+FFFD) is held back until the next token completes it.
+    """
+    def __init__(self, tokenizer: VictorTokenizer):
+        self.tokenizer = tokenizer
+        self.token_ids: List[int] = []
+        self.prefix_offset = 0 # start of the context window
+        self.read_offset = 0   # first token whose text has not been emitted
+
+    def push(self, token_id: int) -> str:
+        """Adds one token and returns the newly completed text (possibly empty)."""
+        self.token_ids.append(token_id)
+        prefix_text = self.tokenizer.decode(self.token_ids[self.prefix_offset:self.read_offset])
+        new_text = self.tokenizer.decode(self.token_ids[self.prefix_offset:])
+        if len(new_text) > len(prefix_text) and not new_text.endswith("\ufffd"):
+            self.prefix_offset = self.read_offset
+            self.read_offset = len(self.token_ids)
+            return new_text[len(prefix_text):]
+        return ""
+
+    def flush(self) -> str:
+        """Returns whatever text is still held back once generation has ended."""
+        prefix_text = self.tokenizer.decode(self.token_ids[self.prefix_offset:self.read_offset])
+        new_text = self.tokenizer.decode(self.token_ids[self.prefix_offset:])
+        self.prefix_offset = self.read_offset = len(self.token_ids)
+        return new_text[len(prefix_text):]
+
 # Example Usage (self-contained test)
 if __name__ == '__main__':
     # Create dummy config and corpus for demonstration
@@ -160,4 +191,9 @@ if __name__ == '__main__':
     print(f"Decoded: {decoded}")
 
     assert decoded == text
+
+    decoder = IncrementalDecoder(tokenizer)
+    streamed = "".join(decoder.push(token_id) for token_id in encoded) + decoder.flush()
+    print(f"Streamed: {streamed}")
+    assert streamed == decoded
     print("\nVictorTokenizer self-test PASSED.")
@@ -3,7 +3,7 @@ from typing import Dict, Any, List, Tuple
 
 # Local imports
 from victor_kernel import OmegaTensor, cross_entropy_loss
-from victor_transformer import VictorFractalTransformer, LoraLayer # LoraLayer conceptual
+from victor_transformer import VictorFractalTransformer, Module
 from victor_tokenizer import VictorTokenizer
 
 # Conceptual LoRA Layer to be injected
@@ -26,6 +26,8 @@ class LoraLayer(Module):
         return [self.lora_A, self.lora_B]
 
 
+MAX_LOSS_SCALE = 2.0 ** 15
+
 class VictorTrainer:
     """Handles the training loop for pre-training or fine-tuning."""
     def __init__(self, model: VictorFractalTransformer, tokenizer: VictorTokenizer, config: Dict[str, Any]):
@@ -33,6 +35,13 @@ class VictorTrainer:
         self.tokenizer = tokenizer
         self.config = config['trainer']
         self.lr = self.config['learning_rate']
+        # Loss scaling for float16 training: the scale halves whenever gradients
+        # overflow (that step is skipped) and doubles after a run of clean steps.
+        # The seed gradient is float16 itself, so the scale stays below its max of 65504.
+        self.initial_loss_scale = min(float(self.config.get('initial_loss_scale', 2.0 ** 15)), MAX_LOSS_SCALE)
+        self.loss_scale_growth_interval = self.config.get('loss_scale_growth_interval', 2000)
+        self.loss_scale = 1.0
+        self._clean_steps = 0
 
     def _prepare_batch(self, texts: List[str]) -> Tuple[np.ndarray, np.ndarray]:
         """Prepares a batch of texts for training."""
@@ -50,6 +59,30 @@ class VictorTrainer:
 
         return x, y
 
+    def _apply_gradients(self, params: List[OmegaTensor], master: List[np.ndarray], half: bool) -> bool:
+        """SGD step on the master weights. Returns False when scaled float16 gradients overflowed."""
+        if not half:
+            for p in params:
+                if p.grad is not None:
+                    p.data -= self.lr * p.grad
+            return True
+
+        grads = [None if p.grad is None else p.grad.astype(np.float32) / self.loss_scale for p in params]
+        if not all(g is None or np.isfinite(g).all() for g in grads):
+            self.loss_scale /= 2
+            self._clean_steps = 0
+            return False
+
+        for p, m, g in zip(params, master, grads):
+            if g is not None:
+                m -= self.lr * g
+                p.data = m.astype(p.data.dtype)
+
+        self._clean_steps += 1
+        if self._clean_steps % self.loss_scale_growth_interval == 0:
+            self.loss_scale = min(self.loss_scale * 2, MAX_LOSS_SCALE)
+        return True
+
     def train(self, corpus_path: str):
         """
         Runs a full training loop on a given text corpus.
@@ -65,10 +98,26 @@ class VictorTrainer:
 
         # --- Optimizer (Simple SGD) ---
         params = self.model.parameters()
+        if any(p.data.dtype == np.int8 for p in params):
+            raise ValueError("Quantized int8 weights are inference-only. Train from full-precision weights.")
+        self.model.train()
+
+        # Memory-mapped weights are read-only; training updates need private copies
+        for p in params:
+            if not p.data.flags.writeable:
+                p.data = np.array(p.data)
+
+        # Half-precision parameters are updated through float32 master copies,
+        # since small steps would round away in float16
+        half = any(p.data.dtype == np.float16 for p in params)
+        master = [p.data.astype(np.float32) if p.data.dtype == np.float16 else p.data for p in params]
+        self.loss_scale = self.initial_loss_scale if half else 1.0
+        self._clean_steps = 0
 
         for epoch in range(epochs):
             print(f"\n--- Epoch {epoch+1}/{epochs} ---")
             total_loss = 0
+            applied_steps = 0
 
             # Simple batching
             for i in range(0, len(lines), batch_size):
@@ -78,7 +127,7 @@ class VictorTrainer:
                 # --- Forward Pass ---
                 self.model.zero_grad()
                 x, y_true = self._prepare_batch(batch_texts)
-                logits = self.model(x) # (B, N, V)
+                logits = self.model(x, causal=True) # (B, N, V)
 
                 # --- Calculate Loss ---
                 # Reshape for cross entropy: (B*N, V) and (B*N,)
@@ -89,19 +138,23 @@ class VictorTrainer:
                 loss = cross_entropy_loss(logits_flat, y_true_flat)
 
                 # --- Backward Pass ---
-                loss.backward()
+                loss.backward(self.loss_scale if half else None)
 
                 # --- Update Weights (SGD) ---
-                for p in params:
-                    if p.grad is not None:
-                        p.data -= self.lr * p.grad
+                if not self._apply_gradients(params, master, half):
+                    print(f"  Batch {i//batch_size + 1}: gradient overflow, skipped. Loss scale -> {self.loss_scale:g}")
+                    continue
 
                 batch_loss = loss.data.item()
                 total_loss += batch_loss
+                applied_steps += 1
                 print(f"  Batch {i//batch_size + 1}, Loss: {batch_loss:.4f}")
 
-            avg_loss = total_loss / (len(lines) // batch_size)
-            print(f"--- End of Epoch {epoch+1}, Average Loss: {avg_loss:.4f} ---")
+            # Averaged over applied steps only; skipped overflow steps carry no update
+            if applied_steps:
+                print(f"--- End of Epoch {epoch+1}, Average Loss: {total_loss / applied_steps:.4f} ---")
+            else:
+                print(f"--- End of Epoch {epoch+1}, no steps applied (every batch overflowed) ---")
 
         print("\n--- [TRAINER] Self-Improvement Cycle Complete. New knowledge integrated. ---")
         # Save the newly trained weights
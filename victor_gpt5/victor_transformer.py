@@ -1,14 +1,25 @@
 import numpy as np
-from typing import Dict, Any, List, Optional
+import os
+import pickle
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Callable, List, Optional, Tuple, Union
 
 # Assumes victor_kernel.py is in the same path
-from victor_kernel import OmegaTensor, relu, softmax, MatMul, Add, Mul, Sum, Reshape
+from victor_kernel import OmegaTensor, relu, softmax, layer_norm, BlockedAttention, MatMul, Add, Mul, Sum, Reshape, Take, ScatterAdd, MaskedFill, capture, is_grad_enabled, is_recording, save_tensors, load_tensors, is_tensor_file, quantize_int8, int8_matmul, register_call_hook, hooked_module_call
 
 # --- Base Module Class ---
 class Module:
     """Base class for all neural network modules."""
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        # Lets an active kernel Profiler attribute time to this module, and graph capture see it
+        if '__call__' in cls.__dict__:
+            register_call_hook(cls, '__call__', hooked_module_call)
+
     def __init__(self):
         self._parameters: Dict[str, OmegaTensor] = {}
+        self.is_training = True
 
     def parameters(self) -> List[OmegaTensor]:
         params = []
@@ -22,6 +33,27 @@ class Module:
                 params.extend(attr.parameters())
         return params
 
+    def named_parameters(self, prefix: str = '') -> List[Tuple[str, OmegaTensor]]:
+        """Same traversal as `parameters()`, with dotted attribute paths as names."""
+        params = []
+        for name, param in self._parameters.items():
+            params.append((prefix + name, param))
+
+        for attr_name in self.__dict__:
+            attr = self.__dict__[attr_name]
+            if isinstance(attr, Module):
+                params.extend(attr.named_parameters(f"{prefix}{attr_name}."))
+        return params
+
+    def named_modules(self, prefix: str = '') -> List[Tuple[str, 'Module']]:
+        """This module and all submodules, named by dotted attribute path ('' for self)."""
+        modules = [(prefix.rstrip('.'), self)]
+        for attr_name in self.__dict__:
+            attr = self.__dict__[attr_name]
+            if isinstance(attr, Module):
+                modules.extend(attr.named_modules(f"{prefix}{attr_name}."))
+        return modules
+
     def __setattr__(self, key, value):
         if isinstance(value, OmegaTensor):
             self._parameters[key] = value
@@ -34,9 +66,31 @@ class Module:
         for p in self.parameters():
             p.zero_grad()
 
+    def capturable(self, *args, **kwargs) -> bool:
+        """
+        Whether graph capture may record this call op by op (see `capture`). Modules
+        whose work depends on input values or on state outside their arguments
+        return False and are called eagerly on replay.
+        """
+        return True
+
+    def train(self, mode: bool = True):
+        """Switches this module and its children (including Dropout) between training and inference."""
+        self.is_training = mode
+        for attr in self.__dict__.values():
+            if isinstance(attr, (Module, Dropout)):
+                attr.train(mode)
+        return self
+
+    def eval(self):
+        return self.train(False)
+
 # --- Core Building Blocks ---
 class Linear(Module):
-    """A standard fully-connected layer."""
+    """
+    A standard fully-connected layer. After `quantize()` the weight is stored as
+    per-channel int8 with a float32 `weight_scale`, and the layer is inference-only.
+    """
     def __init__(self, in_features: int, out_features: int, bias: bool = True):
         super().__init__()
         # Kaiming He initialization
@@ -48,9 +102,31 @@ class Linear(Module):
             self.bias = OmegaTensor(np.zeros(out_features), requires_grad=True)
         else:
             self.bias = None
+        self.weight_scale = None
+
+    def quantize(self):
+        """Converts the weight to int8 with one scale per output column (see `quantize_int8`)."""
+        if self.weight_scale is None:
+            q, scale = quantize_int8(self.weight.data)
+            self.weight = OmegaTensor(q)
+            self.weight_scale = OmegaTensor(scale)
+        return self
+
+    @property
+    def is_quantized(self) -> bool:
+        return self.weight_scale is not None
+
+    def capturable(self, x: OmegaTensor) -> bool:
+        return not self.is_quantized # the int8 product runs outside the op graph
 
     def __call__(self, x: OmegaTensor) -> OmegaTensor:
-        output = x.matmul(self.weight)
+        if self.is_quantized:
+            # (B, N, C) is folded into (B*N, C) so each weight chunk is one large GEMM
+            rows = x.data.reshape(-1, x.shape[-1])
+            output = OmegaTensor(int8_matmul(rows, self.weight.data, self.weight_scale.data).reshape(x.shape[:-1] + (-1,)))
+        else:
+            # MatMul folds the leading dimensions into one GEMM, forward and backward
+            output = x.matmul(self.weight)
         if self.bias is not None:
             output = output + self.bias
         return output
@@ -65,11 +141,7 @@ class LayerNorm(Module):
         self.beta = OmegaTensor(np.zeros(normalized_shape), requires_grad=True)
 
     def __call__(self, x: OmegaTensor) -> OmegaTensor:
-        mean = x.data.mean(axis=-1, keepdims=True)
-        var = x.data.var(axis=-1, keepdims=True)
-
-        x_norm = (x - OmegaTensor(mean)) * OmegaTensor((var + self.eps) ** -0.5)
-        return self.gamma * x_norm + self.beta
+        return layer_norm(x, self.gamma, self.beta, self.eps)
 
 class Dropout:
     """Dropout layer."""
@@ -83,46 +155,156 @@ class Dropout:
         mask = (np.random.rand(*x.shape) > self.p) / (1.0 - self.p)
         return x * OmegaTensor(mask)
 
+    def train(self, mode: bool = True):
+        self.is_training = mode
+        return self
+
+# --- Key/Value Cache for Incremental Decoding ---
+class LayerKVCache:
+    """
+    Keys and values of one attention layer for every token seen so far.
+    Storage grows by doubling, so appending one token per decode step is amortized O(1).
+    """
+    def __init__(self):
+        self.k: Optional[np.ndarray] = None # (B*n_heads, capacity, d_k)
+        self.v: Optional[np.ndarray] = None
+        self.length = 0
+
+    def append(self, k: np.ndarray, v: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Appends new keys/values and returns views over the full cached sequence."""
+        n_new = k.shape[1]
+        needed = self.length + n_new
+        if self.k is None:
+            capacity = max(16, needed)
+            self.k = np.empty((k.shape[0], capacity, k.shape[2]), dtype=k.dtype)
+            self.v = np.empty((v.shape[0], capacity, v.shape[2]), dtype=v.dtype)
+        elif needed > self.k.shape[1]:
+            capacity = max(needed, 2 * self.k.shape[1])
+            grown_k = np.empty((self.k.shape[0], capacity, self.k.shape[2]), dtype=self.k.dtype)
+            grown_v = np.empty((self.v.shape[0], capacity, self.v.shape[2]), dtype=self.v.dtype)
+            grown_k[:, :self.length] = self.k[:, :self.length]
+            grown_v[:, :self.length] = self.v[:, :self.length]
+            self.k, self.v = grown_k, grown_v
+
+        self.k[:, self.length:needed] = k
+        self.v[:, self.length:needed] = v
+        self.length = needed
+        return self.k[:, :self.length], self.v[:, :self.length]
+
+class _CacheSlot:
+    """Stands in for a LayerKVCache inside a captured graph; each replay points it at that call's cache."""
+    def __init__(self):
+        self.target: Optional[LayerKVCache] = None
+
+    def __getattr__(self, name):
+        if name == 'target': # not yet set, e.g. while unpickling
+            raise AttributeError(name)
+        return getattr(self.target, name)
+
+def _cache_slots(caches: list) -> list:
+    return [_cache_slots(c) if isinstance(c, list) else _CacheSlot() for c in caches]
+
+def _bind_cache_slots(slots: list, caches: Optional[list]):
+    for i, slot in enumerate(slots):
+        cache = None if caches is None else caches[i]
+        if isinstance(slot, list):
+            _bind_cache_slots(slot, cache)
+        else:
+            slot.target = cache
+
+class KVCache:
+    """Per-layer key/value caches for one decoding session of VictorFractalTransformer."""
+    def __init__(self, n_layers: int):
+        self.layers = [LayerKVCache() for _ in range(n_layers)]
+
+    @property
+    def seq_len(self) -> int:
+        return self.layers[0].length if self.layers else 0
+
+def causal_mask(n_new: int, n_past: int = 0) -> np.ndarray:
+    """
+    Builds a (1, 1, n_new, n_past + n_new) mask where query i may only attend
+    to keys up to and including its own absolute position n_past + i.
+    """
+    q_pos = np.arange(n_new)[:, None] + n_past
+    k_pos = np.arange(n_past + n_new)[None, :]
+    return (k_pos <= q_pos)[None, None, :, :]
+
 # --- The Fractal Attention Mechanism ---
 class FractalSelfAttention(Module):
     """
     A recursive, fractal self-attention mechanism.
     This implementation simplifies the fractal concept into a recursive refinement loop.
     A true fractal would involve hierarchical partitioning of the sequence.
+    attention_impl selects the kernel: 'dense' materializes the (N, N) scores,
+    'blocked' tiles them with an online softmax (see BlockedAttention) for long contexts.
     """
-    def __init__(self, d_model: int, n_heads: int, fractal_depth: int):
+    def __init__(self, d_model: int, n_heads: int, fractal_depth: int, attention_impl: str = 'dense', block_size: int = 128):
         super().__init__()
         assert d_model % n_heads == 0, "d_model must be divisible by n_heads"
+        assert attention_impl in ('dense', 'blocked'), f"Unknown attention implementation '{attention_impl}'"
         self.d_model = d_model
         self.n_heads = n_heads
         self.d_k = d_model // n_heads
         self.fractal_depth = fractal_depth
+        self.attention_impl = attention_impl
+        self.block_size = block_size
 
         self.qkv_proj = Linear(d_model, d_model * 3)
         self.out_proj = Linear(d_model, d_model)
 
-    def __call__(self, x: OmegaTensor, mask: Optional[np.ndarray] = None) -> OmegaTensor:
+    def capturable(self, x: OmegaTensor, mask: Optional[np.ndarray] = None, cache=None, causal: bool = False) -> bool:
+        return cache is None # cached keys/values are read and extended outside the op graph
+
+    def __call__(self, x: OmegaTensor, mask: Optional[np.ndarray] = None, cache: Optional[Union[LayerKVCache, List[LayerKVCache]]] = None,
+                 causal: bool = False) -> OmegaTensor:
+        """
+        x: (B, N, C). mask: broadcastable to (B, 1, N, N_keys), zeros are masked out.
+        causal: each token only attends to itself and earlier tokens.
+        When a cache is given, x holds only the new tokens: their keys/values are
+        appended to the cache and their queries attend causally over the whole cached sequence.
+        A list of caches holds one independent sequence per batch row (continuous batching).
+        """
         # Initial projection
         B, N, C = x.shape
-        qkv = self.qkv_proj(x).reshape(B, N, 3, self.n_heads, self.d_k)
-        q, k, v = qkv.data.transpose(2, 0, 1, 3, 4) # 3, B, N, n_heads, d_k
-
-        q = OmegaTensor(q.transpose(0, 2, 1, 3).reshape(B*self.n_heads, N, self.d_k))
-        k = OmegaTensor(k.transpose(0, 2, 1, 3).reshape(B*self.n_heads, N, self.d_k))
-        v = OmegaTensor(v.transpose(0, 2, 1, 3).reshape(B*self.n_heads, N, self.d_k))
+        qkv = self.qkv_proj(x).reshape(B, N, 3, self.n_heads, self.d_k).transpose(2, 0, 3, 1, 4) # 3, B, n_heads, N, d_k
+        # Split through graph ops so gradients reach the projection
+        q, k, v = (Take(np.array(i))(qkv).reshape(B*self.n_heads, N, self.d_k) for i in range(3))
+
+        n_past = 0
+        if isinstance(cache, list):
+            # Row-wise causal masking is part of the batch mask
+            k, v, batch_mask = self._append_to_caches(cache, k.data, v.data)
+            k, v = OmegaTensor(k), OmegaTensor(v)
+            mask = batch_mask if mask is None else (mask != 0) & batch_mask
+        elif cache is not None:
+            n_past = cache.length
+            k, v = (OmegaTensor(t) for t in cache.append(k.data, v.data))
+            causal = True
+        n_keys = k.shape[1]
+
+        head_mask = None
+        if self.attention_impl == 'dense':
+            if causal:
+                mask = causal_mask(N, n_past) if mask is None else (mask != 0) & causal_mask(N, n_past)
+            if mask is not None:
+                # (B, 1, N, N_keys) -> (B*n_heads, N, N_keys), expanded once for all iterations
+                head_mask = np.broadcast_to(mask, (B, 1, N, n_keys))
+                head_mask = np.repeat(head_mask, self.n_heads, axis=1).reshape(B*self.n_heads, N, n_keys) == 0
 
         # Recursive/Iterative Refinement
         for _ in range(self.fractal_depth):
-            attn_scores = q.matmul(k.transpose(0, 2, 1)) * (self.d_k ** -0.5)
+            if self.attention_impl == 'blocked':
+                context = BlockedAttention(self.d_k ** -0.5, self.block_size, self.n_heads, mask, causal, n_past)(q, k, v)
+            else:
+                attn_scores = q.matmul(k.transpose(0, 2, 1)) * (self.d_k ** -0.5)
 
-            if mask is not None:
-                # attn_scores is (B*n_heads, N, N)
-                # mask is (B, 1, N, N) -> need to expand for heads
-                head_mask = np.repeat(mask, self.n_heads, axis=0)
-                attn_scores.data[head_mask == 0] = -1e9
+                if head_mask is not None:
+                    # -1e9 is out of float16 range, so clamp to the dtype's lowest finite value
+                    attn_scores = MaskedFill(head_mask, max(-1e9, float(np.finfo(attn_scores.dtype).min)))(attn_scores)
 
-            attn_probs = softmax(attn_scores, axis=-1)
-            context = attn_probs.matmul(v)
+                attn_probs = softmax(attn_scores, axis=-1)
+                context = attn_probs.matmul(v)
 
             # For the next iteration, refine Q with the context
             # This is a simplified refinement step
@@ -133,12 +315,43 @@ class FractalSelfAttention(Module):
 
         return self.out_proj(context)
 
+    def _append_to_caches(self, caches: List[LayerKVCache], k: np.ndarray, v: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Appends each batch row's keys/values to its own cache and right-pads the
+        sequences to a common length. The returned (B, 1, N, N_keys) mask hides
+        padding and keeps every row causal at its own position.
+        """
+        N = k.shape[1]
+        h = self.n_heads
+        n_past = np.array([c.length for c in caches])
+        cached = [c.append(k[b*h:(b+1)*h], v[b*h:(b+1)*h]) for b, c in enumerate(caches)]
+
+        n_keys = int(n_past.max()) + N
+        keys = np.zeros((k.shape[0], n_keys, self.d_k), dtype=k.dtype)
+        values = np.zeros((v.shape[0], n_keys, self.d_k), dtype=v.dtype)
+        for b, (kb, vb) in enumerate(cached):
+            keys[b*h:(b+1)*h, :kb.shape[1]] = kb
+            values[b*h:(b+1)*h, :vb.shape[1]] = vb
+
+        q_pos = n_past[:, None, None, None] + np.arange(N)[None, None, :, None]
+        k_pos = np.arange(n_keys)[None, None, None, :]
+        return keys, values, k_pos <= q_pos
+
 # --- Mixture of Experts ---
 class MoeLayer(Module):
-    """A simple Mixture-of-Experts layer."""
-    def __init__(self, d_model: int, d_ff: int, n_experts: int):
+    """
+    A Mixture-of-Experts layer. With top_k=None every expert runs on every token
+    (dense mixture). With top_k=1 or 2 each token is routed to its k highest-gated
+    experts: each expert gathers only its tokens, and the weighted results are
+    scatter-added back. While training, an expert accepts at most
+    ceil(capacity_factor * tokens * top_k / n_experts) tokens; overflow tokens
+    skip that expert and only keep the residual path.
+    """
+    def __init__(self, d_model: int, d_ff: int, n_experts: int, top_k: Optional[int] = None, capacity_factor: float = 1.25):
         super().__init__()
         self.n_experts = n_experts
+        self.top_k = top_k
+        self.capacity_factor = capacity_factor
         self.gate = Linear(d_model, n_experts)
         self.experts = [
             Linear(d_model, d_ff) for _ in range(n_experts)
@@ -152,12 +365,62 @@ class MoeLayer(Module):
         for i, expert_out in enumerate(self.expert_outputs):
             self.__setattr__(f"expert_fc2_{i}", expert_out)
 
+        # Routing statistics of the last forward pass
+        self.last_aux_loss = 0.0
+        self.last_expert_load = np.zeros(n_experts, dtype=np.int64)
+        self.last_dropped_tokens = 0
+
+    def capturable(self, x: OmegaTensor) -> bool:
+        # Top-k routing picks tokens by gate value. The dense mixture is static, but
+        # replays leave the routing statistics below at their captured values.
+        return self.top_k is None
 
     def __call__(self, x: OmegaTensor) -> OmegaTensor:
         B, N, C = x.shape
         gate_logits = self.gate(x)
         gate_probs = softmax(gate_logits, axis=-1) # (B, N, n_experts)
 
+        if self.top_k is None:
+            self._record_load_balance(gate_probs.data.reshape(B * N, -1), np.argmax(gate_probs.data, axis=-1).ravel())
+            return self._dense(x, gate_probs)
+
+        x_flat = x.reshape(B * N, C)
+        probs = gate_probs.data.reshape(B * N, self.n_experts)
+        probs_flat = gate_probs.reshape(B * N * self.n_experts)
+        top_experts = self._route(probs)
+        self._record_load_balance(probs, top_experts[:, 0])
+
+        n_tokens = B * N
+        capacity = int(np.ceil(self.capacity_factor * n_tokens * self.top_k / self.n_experts)) if self.is_training else n_tokens
+        self.last_dropped_tokens = 0
+
+        final_output = None
+        for i in range(self.n_experts):
+            token_idx, slot = np.nonzero(top_experts == i)
+            if len(token_idx) == 0:
+                continue
+            # First choices claim capacity before second choices
+            order = np.lexsort((token_idx, slot))[:capacity]
+            self.last_dropped_tokens += len(token_idx) - len(order)
+            token_idx, slot = token_idx[order], slot[order]
+
+            expert_in = relu(self.experts[i](Take(token_idx)(x_flat)))
+            expert_out = self.expert_outputs[i](expert_in)
+            # Combine weights are gathered from the gate tensor, so the router keeps learning
+            gate_weight = Take(token_idx * self.n_experts + i)(probs_flat)
+            if self.top_k > 1:
+                chosen = token_idx[:, None] * self.n_experts + top_experts[token_idx]
+                gate_weight = gate_weight / Take(chosen)(probs_flat).sum(axis=1)
+            weighted = expert_out * gate_weight.reshape(len(token_idx), 1)
+            contribution = ScatterAdd(token_idx, n_tokens)(weighted)
+            final_output = contribution if final_output is None else final_output + contribution
+
+        if final_output is None:
+            return OmegaTensor(np.zeros_like(x.data))
+        return final_output.reshape(B, N, C)
+
+    def _dense(self, x: OmegaTensor, gate_probs: OmegaTensor) -> OmegaTensor:
+        B, N, C = x.shape
         final_output = OmegaTensor(np.zeros_like(x.data))
 
         # This is a simplified, non-parallel version.
@@ -172,20 +435,40 @@ class MoeLayer(Module):
 
         return final_output
 
+    def _route(self, probs: np.ndarray) -> np.ndarray:
+        """Returns each token's top_k experts, best first."""
+        top_experts = np.argpartition(-probs, self.top_k - 1, axis=-1)[:, :self.top_k]
+        top_weights = np.take_along_axis(probs, top_experts, axis=-1)
+        order = np.argsort(-top_weights, axis=-1)
+        return np.take_along_axis(top_experts, order, axis=-1)
+
+    def _record_load_balance(self, probs: np.ndarray, first_choice: np.ndarray):
+        """
+        Switch-Transformer balance statistic: n_experts * sum_i(f_i * P_i), where f_i is
+        the fraction of tokens whose first choice is expert i and P_i its mean gate
+        probability. It is 1.0 when routing is perfectly uniform.
+        """
+        self.last_expert_load = np.bincount(first_choice, minlength=self.n_experts)
+        fraction = self.last_expert_load / len(first_choice)
+        self.last_aux_loss = float(self.n_experts * np.sum(fraction * probs.mean(axis=0)))
+
 # --- The Transformer Block ---
 class TransformerBlock(Module):
     """A single block of the Victor Fractal Transformer."""
-    def __init__(self, d_model: int, n_heads: int, d_ff: int, fractal_depth: int, n_experts:int, dropout: float):
+    def __init__(self, d_model: int, n_heads: int, d_ff: int, fractal_depth: int, n_experts:int, dropout: float,
+                 moe_top_k: Optional[int] = None, moe_capacity_factor: float = 1.25,
+                 attention_impl: str = 'dense', attention_block_size: int = 128):
         super().__init__()
-        self.attention = FractalSelfAttention(d_model, n_heads, fractal_depth)
+        self.attention = FractalSelfAttention(d_model, n_heads, fractal_depth, attention_impl, attention_block_size)
         self.norm1 = LayerNorm(d_model)
         self.norm2 = LayerNorm(d_model)
-        self.moe = MoeLayer(d_model, d_ff, n_experts)
+        self.moe = MoeLayer(d_model, d_ff, n_experts, moe_top_k, moe_capacity_factor)
         self.dropout = Dropout(dropout)
 
-    def __call__(self, x: OmegaTensor, mask: Optional[np.ndarray] = None) -> OmegaTensor:
+    def __call__(self, x: OmegaTensor, mask: Optional[np.ndarray] = None, cache: Optional[Union[LayerKVCache, List[LayerKVCache]]] = None,
+                 causal: bool = False) -> OmegaTensor:
         # Attention -> Add & Norm
-        attn_out = self.attention(x, mask)
+        attn_out = self.attention(x, mask, cache, causal)
         x = self.norm1(x + self.dropout(attn_out))
 
         # MoE -> Add & Norm
@@ -207,6 +490,10 @@ class VictorFractalTransformer(Module):
         d_ff = self.config['d_ff']
         fractal_depth = self.config['fractal_depth']
         n_experts = self.config['moe_experts']
+        moe_top_k = self.config.get('moe_top_k') or None # 0/None: dense mixture
+        moe_capacity_factor = self.config.get('moe_capacity_factor', 1.25)
+        attention_impl = self.config.get('attention', 'dense')
+        attention_block_size = self.config.get('attention_block_size', 128)
         dropout = self.config['dropout']
         self.context_window = self.config['context_window']
 
@@ -220,7 +507,8 @@ class VictorFractalTransformer(Module):
         )
 
         self.layers = [
-            TransformerBlock(d_model, n_heads, d_ff, fractal_depth, n_experts, dropout)
+            TransformerBlock(d_model, n_heads, d_ff, fractal_depth, n_experts, dropout, moe_top_k, moe_capacity_factor,
+                             attention_impl, attention_block_size)
             for _ in range(n_layers)
         ]
         # Add layers to parameters
@@ -230,42 +518,223 @@ class VictorFractalTransformer(Module):
         self.output_norm = LayerNorm(d_model)
         self.output_head = Linear(d_model, vocab_size)
 
-    def __call__(self, token_ids: np.ndarray, mask: Optional[np.ndarray] = None) -> OmegaTensor:
+        # Inference forwards of up to this many tokens (B*N) replay a graph captured
+        # for their (B, N) shape (see `capture`); each graph keeps the activations of
+        # one forward as its buffers, so longer inputs, where per-op dispatch is
+        # negligible anyway, always run eagerly. 0 disables capture.
+        self.graph_capture_max_tokens = self.config.get('graph_capture_max_tokens', 256)
+        self.max_captured_graphs = self.config.get('max_captured_graphs', 32)
+        # key -> idle (graph, cache slots) pairs, LRU order. A call checks a pair out,
+        # so concurrent calls on one shape each replay (or capture) their own buffers.
+        self._graphs: 'OrderedDict[tuple, List[Tuple[Any, list]]]' = OrderedDict()
+        self._graph_lock = threading.Lock() # guards _graphs only, never held across a forward
+
+    def __call__(self, token_ids: np.ndarray, mask: Optional[np.ndarray] = None, causal: bool = False) -> OmegaTensor:
         B, N = token_ids.shape
         assert N <= self.context_window, "Input sequence exceeds context window"
 
-        # Embeddings
-        tok_embed = OmegaTensor(self.token_embedding.data[token_ids])
-        pos_embed = OmegaTensor(self.position_embedding.data[:N])
-        x = tok_embed + pos_embed
+        x = self._embed(token_ids, 0)
+        if mask is None and self._use_graphs(B * N):
+            return self._run_graph(('forward', B, N, causal), x, lambda x: self._forward_layers(x, causal=causal))
+        return self._forward_layers(x, mask, causal)
 
-        # Transformer Blocks
+    def _forward_layers(self, x: OmegaTensor, mask: Optional[np.ndarray] = None, causal: bool = False) -> OmegaTensor:
+        for layer in self.layers:
+            x = layer(x, mask, causal=causal)
+        return self._head(x)
+
+    def embed(self, token_ids: np.ndarray, mask: Optional[np.ndarray] = None) -> OmegaTensor:
+        """
+        Sequence embeddings for memory retrieval: the mean of the final hidden states
+        (after output_norm), shape (B, d_model). Stops before the vocabulary projection.
+        """
+        B, N = token_ids.shape
+        assert N <= self.context_window, "Input sequence exceeds context window"
+
+        x = self._embed(token_ids, 0)
+        if mask is None and self._use_graphs(B * N):
+            hidden = self._run_graph(('embed', B, N), x, self._embed_layers)
+        else:
+            hidden = self._embed_layers(x, mask)
+        return OmegaTensor(hidden.data.mean(axis=1))
+
+    def _embed_layers(self, x: OmegaTensor, mask: Optional[np.ndarray] = None) -> OmegaTensor:
         for layer in self.layers:
             x = layer(x, mask)
+        return self.output_norm(x)
+
+    def init_cache(self) -> KVCache:
+        """Creates an empty key/value cache for step-wise decoding with `decode_step`."""
+        return KVCache(len(self.layers))
+
+    def decode_step(self, token_ids: np.ndarray, cache: KVCache) -> OmegaTensor:
+        """
+        Runs only the tokens the cache has not seen yet and returns their logits.
+        Call it once with the whole prompt (prefill), then once per generated token.
+        Equivalent to a full forward pass with `causal_mask`, at O(N) cost per token.
+        """
+        B, N = token_ids.shape
+        n_past = cache.seq_len
+        assert n_past + N <= self.context_window, "Input sequence exceeds context window"
+
+        x = self._embed(token_ids, n_past)
+        if self._use_graphs(B * N):
+            return self._run_graph(('decode', B, N), x, self._decode_layers, cache.layers)
+        return self._decode_layers(x, cache.layers)
+
+    def decode_batch(self, token_ids: np.ndarray, caches: List[KVCache]) -> OmegaTensor:
+        """
+        Like `decode_step`, but row b of `token_ids` continues its own sequence in
+        caches[b]. Sequences may have different lengths, so requests at different
+        points of their generation share one (B, N) forward pass.
+        """
+        B, N = token_ids.shape
+        assert len(caches) == B, "One cache per batch row is required"
+        n_past = np.array([c.seq_len for c in caches])
+        assert (n_past + N <= self.context_window).all(), "Input sequence exceeds context window"
+
+        x = self._embed(token_ids, n_past)
+        layer_caches = [[c.layers[i] for c in caches] for i in range(len(self.layers))]
+        if self._use_graphs(B * N):
+            return self._run_graph(('decode_batch', B, N), x, self._decode_layers, layer_caches)
+        return self._decode_layers(x, layer_caches)
+
+    def _decode_layers(self, x: OmegaTensor, layer_caches: list) -> OmegaTensor:
+        for layer, layer_cache in zip(self.layers, layer_caches):
+            x = layer(x, cache=layer_cache)
+        return self._head(x)
+
+    # --- Captured Graphs ---
+    def _use_graphs(self, n_tokens: int) -> bool:
+        # Only plain inference: training needs the autograd graph and fresh dropout
+        # masks, and a profiler should see the individual ops
+        return (n_tokens <= self.graph_capture_max_tokens and not self.is_training
+                and not is_grad_enabled() and not is_recording())
+
+    def _run_graph(self, key: tuple, x: OmegaTensor, fn: Callable, caches: Optional[list] = None) -> OmegaTensor:
+        """
+        fn(x) or fn(x, caches), replayed from the graph captured for `key`. A shape
+        is captured the second time it is seen, since one-off shapes (most prompt
+        lengths) would never repay a graph's buffers. Inside the graph, caches are
+        reached through slots that each replay binds to the caches of the call.
+        """
+        with self._graph_lock:
+            idle = self._graphs.pop(key, None)
+            seen = idle is not None
+            graph, slots = idle.pop() if idle else (None, None)
+            self._remember_graph(key, idle if seen else [])
+        if not seen:
+            return fn(x) if caches is None else fn(x, caches)
+
+        if caches is not None:
+            slots = slots or _cache_slots(caches)
+            _bind_cache_slots(slots, caches)
+        try:
+            if graph is not None and graph.is_valid():
+                out = graph(x.data)
+            else:
+                # The capturing run is itself this call's forward
+                graph, result = capture(lambda x: fn(x) if slots is None else fn(x, slots), x.data)
+                out = result.data
+            # The graph's buffers are overwritten by its next replay
+            out = out.copy()
+        finally:
+            if slots is not None:
+                _bind_cache_slots(slots, None) # do not keep the caller's caches alive
+
+        with self._graph_lock:
+            idle = self._graphs.get(key)
+            if idle is not None: # dropped if the key was evicted or the graphs cleared meanwhile
+                idle.append((graph, slots))
+        return OmegaTensor(out)
+
+    def _remember_graph(self, key: tuple, idle: list):
+        self._graphs[key] = idle
+        while len(self._graphs) > self.max_captured_graphs:
+            self._graphs.popitem(last=False)
+
+    def _embed(self, token_ids: np.ndarray, start_pos: Union[int, np.ndarray]) -> OmegaTensor:
+        N = token_ids.shape[1]
+        tok_embed = OmegaTensor(self.token_embedding.data[token_ids])
+        if np.ndim(start_pos) == 0:
+            pos_embed = OmegaTensor(self.position_embedding.data[start_pos:start_pos + N])
+        else:
+            # Per-row start positions: (B, 1) + (N,) -> (B, N)
+            positions = np.asarray(start_pos)[:, None] + np.arange(N)
+            pos_embed = OmegaTensor(self.position_embedding.data[positions])
+        return tok_embed + pos_embed
 
-        # Output Head
+    def _head(self, x: OmegaTensor) -> OmegaTensor:
         x = self.output_norm(x)
-        logits = self.output_head(x)
-        return logits
+        return self.output_head(x)
+
+    def quantize(self):
+        """
+        Converts the attention, MoE expert and output head Linear weights to int8
+        for inference. MoE gates stay in full precision: they are tiny, and rounding
+        them can flip expert choices.
+        """
+        for name, module in self.named_modules():
+            if isinstance(module, Linear) and not name.endswith('.gate'):
+                module.quantize()
+        self._graphs.clear()
+        return self.eval()
 
     def save_weights(self, path: str):
-        """Saves all model parameters to a file."""
-        with open(path, 'wb') as f:
-            pickle.dump([p.data for p in self.parameters()], f)
+        """Saves all model parameters as named tensors (see `save_tensors`)."""
+        save_tensors(path, {name: p.data for name, p in self.named_parameters()})
         print(f"Model weights saved to {path}")
 
-    def load_weights(self, path: str):
-        """Loads model parameters from a file."""
+    def load_weights(self, path: str, mmap: bool = True):
+        """
+        Loads model parameters by name, validating names and shapes.
+        With mmap=True parameters are read-only views of the page-cached file,
+        shared by every process serving the same weights.
+        """
         if not os.path.exists(path):
             print(f"Warning: Weight file not found at {path}. Initializing with random weights.")
             return
+        self._graphs.clear()
+
+        if not is_tensor_file(path):
+            self._load_legacy_weights(path, self.parameters())
+            return
+
+        weights = load_tensors(path, mmap=mmap)
+        # Files saved after `quantize()` hold int8 weights with per-channel scales
+        modules = dict(self.named_modules())
+        for name in weights:
+            module = modules.get(name[:-len('.weight_scale')]) if name.endswith('.weight_scale') else None
+            if isinstance(module, Linear):
+                module.quantize()
+
+        params = self.named_parameters()
+        expected = {name for name, _ in params}
+        missing = sorted(expected - weights.keys())
+        unexpected = sorted(weights.keys() - expected)
+        if missing or unexpected:
+            raise ValueError(f"Mismatched parameter names. Missing: {missing}, unexpected: {unexpected}")
+
+        mismatched = [
+            f"{name}: expected {p.shape}, got {weights[name].shape}"
+            for name, p in params if weights[name].shape != p.shape
+        ]
+        if mismatched:
+            raise ValueError(f"Mismatched parameter shapes. {'; '.join(mismatched)}")
+
+        for name, p in params:
+            # Through OmegaTensor so floating weights follow the precision policy
+            p.data = OmegaTensor(weights[name]).data
+        print(f"Model weights loaded from {path}")
+
+    def _load_legacy_weights(self, path: str, params: List[OmegaTensor]):
+        """Loads the old pickled, positional weight list. Re-save to convert."""
         with open(path, 'rb') as f:
             weights = pickle.load(f)
 
-        params = self.parameters()
         if len(weights) != len(params):
             raise ValueError(f"Mismatched number of parameters. Expected {len(params)}, got {len(weights)}")
 
         for p, w in zip(params, weights):
-            p.data = w
-        print(f"Model weights loaded from {path}")
+            p.data = OmegaTensor(w).data
+        print(f"Model weights loaded from legacy pickle {path}. Call save_weights to convert it.")
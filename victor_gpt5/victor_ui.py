@@ -1,21 +1,25 @@
+import os
 import sys
+import json
 import threading
 import time
 import yaml
 import uvicorn
 import typer
-from fastapi import FastAPI, WebSocket
-from fastapi.responses import HTMLResponse
+from fastapi import FastAPI, HTTPException, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import HTMLResponse, StreamingResponse
 from pydantic import BaseModel
 
 # Add parent directory to path to allow local imports
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 from victor_gpt5.victor_agi import VictorAGIRouter
+from victor_gpt5.victor_scheduler import GenerationScheduler, GenerationCancelled, SchedulerOverloaded
 
 # --- Globals ---
 CONFIG = None
 AGI_INSTANCE = None
+SCHEDULER = None
 CLI_APP = typer.Typer()
 
 # --- FastAPI Setup ---
@@ -36,20 +40,35 @@ class PromptResponse(BaseModel):
 
 @api_app.on_event("startup")
 def load_agi():
-    global AGI_INSTANCE, CONFIG
+    global AGI_INSTANCE, CONFIG, SCHEDULER
     print("Loading GODCORE into API server...")
     with open("./victor_gpt5/configs/gpt5_victor.yaml", 'r') as f:
         CONFIG = yaml.safe_load(f)
     AGI_INSTANCE = VictorAGIRouter(CONFIG)
+    # All model work for the API runs on the scheduler's worker thread, never on the event loop
+    SCHEDULER = GenerationScheduler(AGI_INSTANCE, CONFIG)
+    SCHEDULER.start()
     print("GODCORE is online and integrated with the API.")
 
+@api_app.on_event("shutdown")
+def stop_scheduler():
+    if SCHEDULER:
+        SCHEDULER.stop()
+    if AGI_INSTANCE:
+        AGI_INSTANCE.memory.close()
+
 @api_app.post("/prompt", response_model=PromptResponse)
-async def handle_prompt(request: PromptRequest):
+async def handle_prompt(request: PromptRequest, http_request: Request):
     """Receives a prompt and returns the AGI's response."""
-    if not AGI_INSTANCE:
-        return {"error": "AGI not initialized"}, 503
+    if not SCHEDULER:
+        raise HTTPException(status_code=503, detail="AGI not initialized")
 
-    response_text = AGI_INSTANCE.route(request.prompt)
+    try:
+        response_text = await SCHEDULER.generate(request.prompt, is_disconnected=http_request.is_disconnected)
+    except SchedulerOverloaded as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+    except GenerationCancelled:
+        raise HTTPException(status_code=499, detail="Client closed request")
 
     return PromptResponse(
         response=response_text,
@@ -57,24 +76,84 @@ async def handle_prompt(request: PromptRequest):
         timestamp=time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
     )
 
+@api_app.post("/prompt/stream")
+async def handle_prompt_stream(request: PromptRequest):
+    """
+    Streams the AGI's response as Server-Sent Events: one `data: {"token": ...}`
+    event per decoded text piece, then `event: done` with the full response.
+    """
+    if not SCHEDULER:
+        raise HTTPException(status_code=503, detail="AGI not initialized")
+
+    try:
+        generation = SCHEDULER.submit(request.prompt, stream=True)
+    except SchedulerOverloaded as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+
+    async def event_stream():
+        async for piece in SCHEDULER.iter_pieces(generation):
+            yield f"data: {json.dumps({'token': piece})}\n\n"
+        done = {
+            'response': generation.future.result(),
+            'user_id': request.user_id,
+            'timestamp': time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+        }
+        yield f"event: done\ndata: {json.dumps(done)}\n\n"
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
+
 @api_app.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
+    """
+    Each prompt is answered with JSON frames: {"type": "token", "text": ...} per
+    decoded piece, then {"type": "done", "response": ...}.
+    """
     await websocket.accept()
-    if not AGI_INSTANCE:
+    if not SCHEDULER:
         await websocket.send_text("Error: AGI not initialized.")
         await websocket.close()
         return
 
     await websocket.send_text("Victor-GPT5 WebSocket connection established. Awaiting prompt.")
+    generation = None
     while True:
         try:
             prompt = await websocket.receive_text()
-            response = AGI_INSTANCE.route(prompt)
-            await websocket.send_text(response)
+            generation = SCHEDULER.submit(prompt, stream=True)
+            async for piece in SCHEDULER.iter_pieces(generation):
+                await websocket.send_text(json.dumps({'type': 'token', 'text': piece}))
+            await websocket.send_text(json.dumps({'type': 'done', 'response': generation.future.result()}))
+        except SchedulerOverloaded as e:
+            await websocket.send_text(json.dumps({'type': 'error', 'error': f"Server overloaded, try again shortly: {e}"}))
+        except WebSocketDisconnect:
+            # Stop decoding for a client that is gone
+            if generation is not None:
+                generation.cancel()
+            break
         except Exception as e:
+            if generation is not None:
+                generation.cancel()
             await websocket.send_text(f"Connection closed or error: {e}")
             break
 
+@api_app.get("/profile")
+async def profile(sort_by: str = "time", limit: int = 50):
+    """Per-op and per-module totals from the sampled profiler (kernel.profile_sample_rate)."""
+    if SCHEDULER is None:
+        raise HTTPException(status_code=503, detail="Scheduler not running")
+    if sort_by not in ("time", "calls", "flops", "bytes"):
+        raise HTTPException(status_code=400, detail="sort_by must be one of time, calls, flops, bytes")
+    profiler = SCHEDULER.profiler
+    return {"sample_rate": profiler.sample_rate, "samples": profiler.samples, "rows": profiler.rows(sort_by)[:limit],
+            "table": profiler.table(sort_by, limit)}
+
+@api_app.get("/profile/trace")
+async def profile_trace():
+    """The most recent profiled events in Chrome trace format (load in chrome://tracing or Perfetto)."""
+    if SCHEDULER is None:
+        raise HTTPException(status_code=503, detail="Scheduler not running")
+    return SCHEDULER.profiler.chrome_trace()
+
 @api_app.get("/", response_class=HTMLResponse)
 async def root():
     # Simple HTML interface for testing
@@ -109,7 +188,7 @@ def interact():
         prompt = input("You: ")
         if prompt.lower() in ['exit', 'quit']:
             print("Victor: Goodbye. Saving memory state.")
-            AGI_INSTANCE.memory.save()
+            AGI_INSTANCE.memory.close()
             break
         response = AGI_INSTANCE.route(prompt)
         print(f"Victor: {response}")